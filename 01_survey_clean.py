@@ -10,6 +10,8 @@ import csv
 
 ### LOCAL IMPORT ###
 from config import config_reader
+from stats_sink import StatsSink
+from utilities import df_save_csv_cached, csv_read_options
 
 ### GLOBALS ###
 yaml_config = config_reader.config_read_yaml("config.yml", "config")
@@ -21,13 +23,14 @@ survey_file_clean = str(yaml_config["SURVEY_GOOGLE_FILE_CLEAN"]) # output
 survey_file_clean_map = str(yaml_config["SURVEY_GOOGLE_FILE_CLEAN_MAP"]) # output
 survey_key_col = str(yaml_config["SURVEY_GOOGLE_KEY_COLUMN"]) 
 survey_file_stats = str(yaml_config["SURVEY_GOOGLE_FILE_STATS"]) 
+schemas = yaml_config["SCHEMAS"] # schemas of the input files
 
 ### FUNCTIONS ###
 
 def survey_read_and_rename_columns(df:pd.DataFrame, key_col:str) -> pd.DataFrame:
     """
     Reads a CSV file, removes rows where the 'Form blueprint' column is empty, truncates it up to the 'Form blueprint' column inclusive, renames the first column (post-truncation) to 'sessionID', the next column to 'eventTimestamp' (survey timestamp), and the remaining columns sequentially from 1. 
-    Additionally, it converts the timestamp from the format 'YYYY/MM/DD HH:MM:SS AM/PM TZ' to 'YYYY-MM-DD HH:MM:SS'.
+    Additionally, it converts the timestamp from the format 'YYYY/MM/DD HH:MM:SS AM/PM TZ' to a datetime (Italian local time).
     Finally, it returns a mapping of the original column names (questions) mapped in Q_i.
 
     Parameters:
@@ -68,21 +71,8 @@ def survey_read_and_rename_columns(df:pd.DataFrame, key_col:str) -> pd.DataFrame
     column_order = ['sessionID'] + [col for col in df.columns if col != 'sessionID']
     df = df[column_order]
 
-    # Convert 'eventTimestamp' from 'YYYY/MM/DD HH:MM:SS AM/PM EET' to 'YYYY-MM-DD HH:MM:SS'
-    # Remove the timezone information from 'SurveyTimestamp' and convert it
-    
-    # Remove the "EET" suffix from the string as it is not compatible with the datetime format
-    df['SurveyTimestamp'] = df['SurveyTimestamp'].str.replace(' EET', '', regex=False)
-
-    # Convert the string to datetime format, specifying the original timezone as "Europe/Helsinki"
-    df['SurveyTimestamp'] = pd.to_datetime(df['SurveyTimestamp'], format='%Y/%m/%d %I:%M:%S %p')
-    df['SurveyTimestamp'] = df['SurveyTimestamp'].dt.tz_localize('Europe/Helsinki')
-
-    # Convert the timestamp to the Italian timezone "Europe/Rome" (handles daylight saving time automatically)
-    df['SurveyTimestamp'] = df['SurveyTimestamp'].dt.tz_convert('Europe/Rome')
-
-    # Convert the timestamp back to a string in the desired format
-    df['SurveyTimestamp'] = df['SurveyTimestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    # Convert 'eventTimestamp' from 'YYYY/MM/DD HH:MM:SS AM/PM EET' to a datetime (saved as 'YYYY-MM-DD HH:MM:SS')
+    df['SurveyTimestamp'] = survey_parse_timestamps(df['SurveyTimestamp'])
 
     # Converts all float columns to int inserting -1 for missing values
     for col in df.select_dtypes(include=['float64']).columns:
@@ -100,77 +90,97 @@ def survey_read_and_rename_columns(df:pd.DataFrame, key_col:str) -> pd.DataFrame
     # Returns the new dataframe [sessionID, SurveyTimestamp, Q_i] and the mapped Q_i
     return df, columns_map_df
 
-def get_unique_values(df:pd.DataFrame, prefix:str="Q_", start:int=1, end:int=28):
+def survey_parse_timestamps(timestamps: pd.Series) -> pd.Series:
+    """
+    Parses the survey timestamps from the format 'YYYY/MM/DD HH:MM:SS AM/PM EET' (Europe/Helsinki) to datetimes in the Italian local time (Europe/Rome, without timezone).
+
+    Parameters:
+        timestamps (pd.Series): The survey timestamps as strings.
+
+    Returns:
+        pd.Series: The survey timestamps as datetimes.
+    """
+    # Remove the "EET" suffix from the string as it is not compatible with the datetime format
+    timestamps = timestamps.str.replace(' EET', '', regex=False)
+
+    # Convert the string to datetime format, specifying the original timezone as "Europe/Helsinki"
+    timestamps = pd.to_datetime(timestamps, format='%Y/%m/%d %I:%M:%S %p').dt.tz_localize('Europe/Helsinki')
+
+    # Convert the timestamp to the Italian timezone "Europe/Rome" (handles daylight saving time automatically) and remove the timezone
+    timestamps = timestamps.dt.tz_convert('Europe/Rome').dt.tz_localize(None)
+
+    return timestamps
+
+def calculate_answer_distribution(df: pd.DataFrame, question_prefix: str) -> pd.DataFrame:
+    """
+    Calculate the distribution of the answers of all the questions in a single grouped pass over the answers in long format.
+
+    Parameters:
+        df (pd.DataFrame): DataFrame containing survey data with question columns.
+        question_prefix (str): The prefix used to identify question columns (e.g., 'Q_').
+
+    Returns:
+        pd.DataFrame: A DataFrame with the question, answer value, sum of answers, and answer ratio, ordered by question (as in df) and answer value.
+    """
+
+    # Identify question columns by filtering for columns that start with the specified prefix
+    question_columns = [col for col in df.columns if col.startswith(question_prefix)]
+
+    # Answers in long format: one row for each (session, question)
+    df_long = df[question_columns].melt(var_name='question_no', value_name='answer_value')
+    df_long['question_no'] = pd.Categorical(df_long['question_no'], categories=question_columns)
+
+    # Count occurrences of each answer value of each question
+    df_answers = df_long.groupby(['question_no', 'answer_value'], observed=True).size().reset_index(name='answer_sum')
+
+    # Calculate the ratio over the total number of responses of each question
+    total_responses = df_answers.groupby('question_no', observed=True)['answer_sum'].transform('sum')
+    df_answers['answer_ratio'] = (df_answers['answer_sum'] / total_responses).round(3)
+    df_answers['question_no'] = df_answers['question_no'].astype(str)
+
+    return df_answers
+
+def get_unique_values(df_answers:pd.DataFrame, prefix:str="Q_", start:int=1, end:int=28):
     """
-    Retrieves unique values from a series of columns in a DataFrame that follow a specific naming pattern.
+    Retrieves unique values from a series of questions that follow a specific naming pattern.
 
     Parameters:
-        df (pd.DataFrame): The DataFrame to process.
+        df_answers (pd.DataFrame): The distribution of the answers (see calculate_answer_distribution).
         prefix (str): The common prefix of the column names to be checked (default is "Q_").
         start (int): The starting index of the column names (inclusive).
         end (int): The ending index of the column names (inclusive).
 
     Returns:
-        dict: A dictionary with each key as the column name and the associated value as an array of unique values.
+        dict: A dictionary with each key as the column name and the associated value as a sorted list of unique values.
     """
+    # The answer values are already sorted within each question
+    answer_values = df_answers.groupby('question_no', sort=False)['answer_value'].agg(list).to_dict()
+
     unique_values = {}
 
     # Iterate through each column from start to end index
     for i in range(start, end + 1):
         col_name = f"{prefix}{i}"
-        # Check if the column exists in the DataFrame
-        if col_name in df.columns:
-            # Get unique values, sort them, and add them to the dictionary
-            unique_values[col_name] = sorted(df[col_name].dropna().unique())
+        # Check if the question exists in the answers
+        if col_name in answer_values:
+            unique_values[col_name] = answer_values[col_name]
 
     return unique_values
 
-def calculate_question_statistics(df: pd.DataFrame, question_texts_df: pd.DataFrame, question_prefix: str) -> pd.DataFrame:
+def calculate_question_statistics(df_answers: pd.DataFrame, question_texts_df: pd.DataFrame) -> pd.DataFrame:
     """
     Calculate the sum and percentage of distinct values for each question relative to all sessionIDs.
 
     Parameters:
-        df (pd.DataFrame): DataFrame containing survey data with columns 'sessionID', 'SurveyTimestamp', and question columns.
+        df_answers (pd.DataFrame): The distribution of the answers (see calculate_answer_distribution).
         question_texts_df (pd.DataFrame): DataFrame containing survey questions.
-        question_prefix (str): The prefix used to identify question columns (e.g., 'Q_').
 
     Returns:
         pd.DataFrame: A DataFrame with the question, question_value, sum of answers, and answer ratio.
     """
-    
-    # Identify question columns by filtering for columns that start with the specified prefix
-    question_columns = [col for col in df.columns if col.startswith(question_prefix)]
-
-    # List to collect output data
-    output_data = []
-
-    # Iterate over each question column
-    for question in question_columns:
-        # Group by question value, and count occurrences across all sessions
-        grouped = df.groupby(question).size().reset_index(name='count')
-        
-        # Calculate the total number of responses across all sessions
-        total_responses = df[question].count()
-        
-        # Calculate the sum and ratio for each distinct value of the question
-        grouped['answer_sum'] = grouped['count']
-        grouped['answer_ratio'] = (grouped['count'] / total_responses).round(3)
-        
-        # Add a column for the current question
-        grouped['question_no'] = question
-        
-        # Rename the question value column for clarity
-        grouped = grouped.rename(columns={question: 'answer_value'})
-        
-        # Select the desired columns and append to output list
-        final = grouped[['question_no', 'answer_value', 'answer_sum', 'answer_ratio']]
-        output_data.append(final)
-
-    # Concatenate all results
-    final_output = pd.concat(output_data, ignore_index=True)
 
     # Merge with the question texts DataFrame
-    final_output_merged = pd.merge(final_output, question_texts_df, left_on="question_no", right_on="question_num", how="left")
+    final_output_merged = pd.merge(df_answers, question_texts_df, left_on="question_no", right_on="question_num", how="left")
     # print(final_output_merged.columns) # debug
         
     # Select and reorder columns for the final output
@@ -194,7 +204,7 @@ def main():
     print()
     path_survey = Path(data_dir) / survey_file
     print("Input file:", path_survey)
-    df_survey = pd.read_csv(path_survey, sep=';')
+    df_survey = pd.read_csv(path_survey, **csv_read_options(schemas["survey_google"]))
     print("Raw data preview")
     print(df_survey.head())
     print()
@@ -212,7 +222,7 @@ def main():
     path_out = Path(data_dir) / survey_file_clean
     print()
     print("Saving Survey data clean to:", path_survey)
-    df_survey_clean.to_csv(path_out, sep=";", index=False,quoting=csv.QUOTE_NONNUMERIC)
+    df_save_csv_cached(df_survey_clean, path_out, ";", quoting=csv.QUOTE_NONNUMERIC) # with the typed cache for 03_csv_to_log.py
     print()
     path_out = Path(data_dir) / survey_file_clean_map
     print("Saving Survey data clean to:", path_survey)
@@ -223,7 +233,8 @@ def main():
     print()
     print("Unique Session ID:", df_survey_clean["sessionID"].nunique())
     print()
-    unique_values = get_unique_values(df_survey_clean, "Q_", 1, 28)
+    df_answers = calculate_answer_distribution(df_survey_clean, "Q_")
+    unique_values = get_unique_values(df_answers, "Q_", 1, 28)
     for key, value in unique_values.items():
         print(f"Unique values in column {key}: {value}")
     print()
@@ -232,17 +243,13 @@ def main():
     print()
     print("Unique Session ID:", df_survey_clean["sessionID"].nunique())
     print()
-    df_survey_stats = calculate_question_statistics(df_survey_clean, columns_map_df, "Q_")
+    df_survey_stats = calculate_question_statistics(df_answers, columns_map_df)
     print(df_survey_stats.head())
     print()
-    path_out = Path(stats_dir) / survey_file_stats
-    print("Saving Survey stats in CSV:", path_out)
-    df_survey_stats.to_csv(path_out, sep=";", index=False, quoting=csv.QUOTE_NONNUMERIC)
-    # saving in XLSX
-    survey_file_stats_xlsx = f"{Path(survey_file_stats).stem}.xlsx"
-    path_out = Path(stats_dir) / survey_file_stats_xlsx
-    print("Saving Survey stats in XLSX:", path_out)
-    df_survey_stats.to_excel(path_out, index=False, sheet_name=f"{Path(survey_file_stats).stem}")
+    print("Saving Survey stats (CSV and XLSX)")
+    stats_sink = StatsSink(stats_dir, f"{Path(survey_file_stats).stem}.xlsx")
+    stats_sink.add(df_survey_stats, Path(survey_file_stats).stem, csv=True, quoting=csv.QUOTE_NONNUMERIC)
+    stats_sink.save()
 
     # program END
     end_time = datetime.now().replace(microsecond=0)
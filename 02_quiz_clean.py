@@ -11,15 +11,19 @@ import pandas as pd
 
 ### LOCAL IMPORT ###
 from config import config_reader
-from utilities import df_read_csv_data
+from utilities import input_files, df_read_csv_files
+from stats_sink import StatsSink
 
 ### GLOBALS ###
 yaml_config = config_reader.config_read_yaml("config.yml", "config")
 # print(yaml_config) # debug
 data_dir = str(yaml_config["DATA_DIR"])
 stats_dir = str(yaml_config["STATS_DIR"])
-quiz_file = str(yaml_config["QUIZ_FILE"]) # input
+quiz_file = str(yaml_config["QUIZ_FILE"]) # input: a file, a directory or a glob pattern (e.g. the daily exports of each project)
 quiz_stats_file = str(yaml_config["QUIZ_STATS_FILE"]) # output
+timestamp_format = str(yaml_config["TIMESTAMP_FORMAT"])
+schemas = yaml_config["SCHEMAS"] # schemas of the input files
+input_workers = 4 # threads reading the quiz files (with more files, the answers delivered in more files, same idEvent, are kept once)
 
 ### FUNCTIONS ###
 def quiz_correct_ratio(df: pd.DataFrame, key_column: str, filter_list: list) -> pd.DataFrame:
@@ -89,10 +93,10 @@ def main():
 
     # Quiz
     print(">> Reading Quiz data")
-    path_quiz = Path(data_dir) / quiz_file
-    print("Path:", str(path_quiz))
+    paths_quiz = input_files(data_dir, quiz_file)
+    print("Path:", str(paths_quiz[0]) if len(paths_quiz) == 1 else f"{len(paths_quiz)} files ({quiz_file})")
     col_list = ["sessionID","lang","pageName","pageTitle","menu","pageOrder","answer","answerCorrect","lastUpdate"]
-    df_quiz = df_read_csv_data(path_quiz, col_list)
+    df_quiz = df_read_csv_files(paths_quiz, col_list, schemas["quiz"], timestamp_format, n_workers=input_workers)
     
     # Quiz group by sessionID
     print("> Getting Quiz ratio totals")
@@ -101,14 +105,9 @@ def main():
     print()
 
     print("> Saving Quiz ratio totals")
-    path_out = Path(stats_dir) / quiz_stats_file
-    # CSV
-    print("Path (CSV):", path_out)
-    df_quiz_ratio.to_csv(path_out, sep=";", index=False)
-    # XLS
-    path_out = Path(stats_dir) / f"{Path(quiz_stats_file).stem}.xlsx"
-    print("Path (XLSX):", path_out)
-    df_quiz_ratio.to_excel(path_out, sheet_name=f"{Path(quiz_stats_file).stem}", index=False)
+    stats_sink = StatsSink(stats_dir, f"{Path(quiz_stats_file).stem}.xlsx")
+    stats_sink.add(df_quiz_ratio, Path(quiz_stats_file).stem, csv=True) # CSV read by 03_csv_to_log.py
+    stats_sink.save()
 
     # program END
     end_time = datetime.now().replace(microsecond=0)
@@ -5,13 +5,23 @@
 ### IMPORT ###
 from pathlib import Path
 from datetime import datetime, time
+from functools import partial
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
 
 ### LOCAL IMPORT ###
 from config import config_reader
-from utilities import df_read_csv_data, df_get_unique_values, df_show_data, df_retain_columns, df_rename_columns, dict_with_formatting, df_remove_rows_with_substring 
+from stats_sink import StatsSink
+from log_writer import LogWriter, write_csv
+from log_boundaries import add_boundary_rows
+from session_keys import SessionDictionary
+from log_partitions import session_partitions, write_csv_partitioned
+from log_validation import validate_event_log, drop_invalid_cases
+from log_index import log_build_index, log_read_case_filters, log_split_cases_multi
+from log_duckdb import duckdb_connect, duckdb_close, duckdb_read_csv, duckdb_replace_values, duckdb_fill_round, duckdb_create_level_log, duckdb_attach_sessions, duckdb_add_survey_end_rows, duckdb_set_integer_columns, duckdb_materialize, duckdb_add_total_time, duckdb_add_class, duckdb_label_terciles, duckdb_save_event_log
+from utilities import df_read_csv_data, input_files, df_read_csv_files, df_get_unique_values, df_show_data, df_retain_columns, df_rename_columns, dict_with_formatting, df_remove_rows_with_substring, df_apply_partitioned, df_read_csv_cached, df_to_datetime, df_combine_by_key, df_attach_by_key, df_sort_values_once, translations_merge, df_translate_columns
 
 ### GLOBALS ###
 yaml_config = config_reader.config_read_yaml("config.yml", "config")
@@ -21,35 +31,67 @@ log_dir = str(yaml_config["LOG_DIR"])
 stats_dir = str(yaml_config["STATS_DIR"])
 plots_dir = str(yaml_config["PLOTS_DIR"])
 
-events_file = str(yaml_config["EVENTS_FILE"]) # input
+events_file = str(yaml_config["EVENTS_FILE"]) # input: a file, a directory or a glob pattern (e.g. the daily exports of each project)
 quiz_stats_file = str(yaml_config["QUIZ_STATS_FILE"]) # input
 survey_file_clean = str(yaml_config["SURVEY_GOOGLE_FILE_CLEAN"]) # input
 sus_file = str(yaml_config["SUS_FILE"]) # input
 case_len_threshold = int(yaml_config["CASE_LEN_THRESHOLD"])
 case_time_threshold = int(yaml_config["CASE_TIME_THRESHOLD"])
-disco_cases = str(yaml_config["DISCO_CASES_FILE"]) # input
+disco_cases = yaml_config["DISCO_CASES_FILE"] # input: a file, or more files as a dictionary (name of the filter: file)
+if not isinstance(disco_cases, dict):
+    disco_cases = {"DISCO": str(disco_cases)}
+timestamp_format = str(yaml_config["TIMESTAMP_FORMAT"])
+schemas = yaml_config["SCHEMAS"] # schemas of the input files (separators, types, date columns)
+stats_workbook = "edu_event_log_stats.xlsx" # output: all the stats of this script
 id_column = "Case ID" # Final trace identifier
 activity_column = "Activity"
 timestamp_column = "Complete Timestamp"
 
-# Filter data based on list of cases already filtered in DISCO
+# Filter data based on list of cases already filtered in DISCO (each filter saves the files *_raw_filtered_<name>_ter.csv and *_excluded_<name>_ter.csv)
 filter_disco_cases = 1 # 1 = yes, 0 = no
 
-# Dictionary of pageTitle ITA to ENU
-dic_en_pageTitle = {'Introduzione':'INTRO', 'Introduzione-Quiz':'INTRO-Q', 'Primo programma':'PROG', 
-                    'Primo programma-Quiz': 'PROG-Q', 'Variabili':'VARS', 'Variabili-Quiz':'VARS-Q',
-                    'Istruzione if':'IF_ELSE', 'Istruzione if-Quiz':'IF_ELSE-Q', 'Ciclo for':'FOR',
-                    'Ciclo for-Quiz':'FOR-Q', 'Tipi di dato':'TYPES', 'Tipi di dato-Quiz':'TYPES-Q',
-                    'Conversioni':'CONV', 'Conversioni-Quiz':'CONV-Q', 'Liste':'LISTS', 'Liste-Quiz':'LISTS-Q',
-                    'Dizionari':'DICTS', 'Dizionari-Quiz':'DICTS-Q', 'Funzioni':'FUNCT', 
-                    'Funzioni-Quiz':'FUNCT-Q', 'Survey':'SURVEY-START'}
+# Validation of the final event logs (log_validation.py): duplicated timestamps, Class 'NA', events after SURVEY-END,
+# cases not longer than CASE_LEN_THRESHOLD events or lasting CASE_TIME_THRESHOLD hours or more; the violations of each case are saved in the stats
+validate_logs = 1 # 1 = yes, 0 = no (pandas backend)
+drop_invalid = 0 # 1 = the cases with violations are removed from the event logs, 0 = only reported
 
-# Dictionary of event ITA to ENU
-dic_en_event = {'ingressoPagina':'PageIN', 'mouseover':'MouseIN', 'mouseout':'MouseOUT', 'mouseenter':'MouseENT',
-                'uscitaPagina':'PageOUT', 'click':'CLICK', 'dbclick':'DBCLICK'}
+# Parallel execution of the per-session steps (the events are partitioned by hash of sessionID)
+n_workers = 1 # number of worker processes (1 = single process)
+
+# Output writer: threads formatting and writing the output files in parallel
+output_workers = 2 # number of threads
+output_compression = None # compression of the filtered / excluded event logs: None, "gzip" or "zstd" (requires the zstandard package, see requirements-optional.txt)
+
+# Input files: with more events files (directory or glob pattern in EVENTS_FILE), the files are read in parallel and the events delivered in more files (same idEvent) are kept once
+input_workers = 4 # number of threads
+
+# Partitioned output: the raw event logs are also saved split by project and date of the session (Hive-style directories, log_partitions.py);
+# only the partitions whose content changes are rewritten
+output_partitions = 0 # 1 = yes, 0 = no (pandas backend)
+partitions_dir = "partitions" # root directory of the partitions (in log_dir)
+
+# Backend of the event log steps: "pandas" (in memory) or "duckdb" (out-of-core query plan that spills to disk, see log_duckdb.py; requires the duckdb package, see requirements-optional.txt)
+backend = "pandas"
+duckdb_memory_limit = None # memory limit of the DuckDB backend (e.g. "4GB"; None = DuckDB default)
+
+# Translation tables of the events columns (pageTitle, event), ITA to ENU
+translations = translations_merge(yaml_config["TRANSLATIONS"])
 
 clik_event_list = ['CLICK', 'DBCLICK'] # Frequency events per sessionID
 
+# Columns read from the input files
+col_list_events = ["sessionID","lang","pageName","pageTitle","menu","pageOrder","pagePara","event","duration","lastUpdate"]
+col_list_quiz = ["sessionID", "QuizSessionCount", "QuizAnswerCorrectTotal", "QuizAnswerWrongTotal", "QuizAnswerCorrectRatioOverCount", "QuizAnswerCorrectRatioOverAll", "QuizSessionCount_P3","QuizAnswerCorrectTotal_P3","QuizAnswerWrongTotal_P3","QuizAnswerCorrectRatioOverCount_P3","QuizAnswerCorrectRatioOverAll_P3"]
+col_list_sus = ["sessionID", "SUS", "Apprendimento percepito", "UEQ - Pragmatic", "UEQ - Hedonic", "UEQ - Overall"]
+
+# Final list of columns in the event log
+columns_to_keep = ['sessionID', 'pageTitle', 'menu', 'pageOrder', 'pagePara', 'eventPage','eventTimestamp', 'eventPara', 'click_num', 'dbclick_num',
+                'QuizSessionCount', 'QuizAnswerCorrectTotal', 'QuizAnswerWrongTotal',  'QuizAnswerCorrectRatioOverCount', 'QuizAnswerCorrectRatioOverAll', 'QuizSessionCount_P3','QuizAnswerCorrectTotal_P3','QuizAnswerWrongTotal_P3','QuizAnswerCorrectRatioOverCount_P3','QuizAnswerCorrectRatioOverAll_P3',
+                'Q_1', 'Q_2', 'Q_3', 'Q_4', 'Q_5', 'Q_6', 'Q_7', 'Q_8', 'Q_9', 'Q_10', 'Q_11', 'Q_12', 'Q_13', 'Q_14', 'Q_15', 
+                'Q_16', 'Q_17', 'Q_18', 'Q_19', 'Q_20', 'Q_21', 'Q_22', 'Q_23', 'Q_24', 'Q_25', 'Q_26', 'Q_27', 'Q_28'] + col_list_sus[1:]
+columns_to_convert = ['click_num', 'dbclick_num','QuizSessionCount','QuizAnswerCorrectTotal','QuizAnswerWrongTotal'] # integer columns
+list_col_t = ["SUS", "Apprendimento percepito", "UEQ - Overall", "QuizAnswerCorrectRatioOverAll"] # Columns on which to calculate the tertile
+
 # Criteria "Class" structure
 criteria = [
     {'date': datetime(2024, 3, 7).date(), 'start_time': time(0, 0), 'end_time': time(23, 59), 'class': 'SAA'},
@@ -72,20 +114,6 @@ Data;Ora;Classe
 """
 
 ### FUNCTIONS ###
-def replace_page_titles(df: pd.DataFrame, mapping_dict: dict) -> pd.DataFrame:
-    """
-    Replaces the values in the 'pageTitle' column of the dataframe df with the values defined in the mapping_dict dictionary.
-    
-    Parameters:
-        df (pd.DataFrame): The dataframe containing the 'pageTitle' column.
-        mapping_dict (dict): The dictionary with the mapping of values.
-    
-    Returns:
-        pd.DataFrame: The dataframe with the 'pageTitle' column values replaced.
-    """
-    df['pageTitle'] = df['pageTitle'].replace(mapping_dict)
-    return df
-
 def add_event_para_column(df: pd.DataFrame) -> pd.DataFrame:
     """
     Adds a new column 'eventPara' to the DataFrame by concatenating 'pageTitle', 'event', and 'pagePara'.
@@ -109,7 +137,7 @@ def add_event_para_column(df: pd.DataFrame) -> pd.DataFrame:
 
     # Concatenate the strings in the desired format
     # df['eventPara'] = df['pageTitle'] + '_' + df['event'] + '_' + df['formattedPagePara']
-    df['eventPara'] = df['pageTitle'] + '_' + df['event'] + '_' + df['pagePara'].astype(str)
+    df['eventPara'] = df['pageTitle'].astype(object) + '_' + df['event'].astype(object) + '_' + df['pagePara'].astype(str)
 
     # Remove the temporary 'formattedPagePara' column
     # df.drop(columns=['formattedPagePara'], inplace=True)
@@ -119,7 +147,8 @@ def add_event_para_column(df: pd.DataFrame) -> pd.DataFrame:
 def find_and_fix_ts_duplicates(df_input: pd.DataFrame) -> pd.DataFrame:
     """
     Adds 1 second to equal timestamps for sessionID.
-    Instead of sorting on the initial three columns, sort the DataFrame by "sessionID" and "eventTimestamp". This ensures that any duplicates are adjacent to each other. 
+    Instead of sorting on the initial three columns, sort the DataFrame by "sessionID" and "eventTimestamp" (only if not already in order, see df_sort_values_once). This ensures that any duplicates are adjacent to each other. 
+    Each row is compared with the previous one after its correction, so only the rows equal to the previous one or 1 second after it (within the session) are checked.
 
     Parameters:
         df_input (pd.DataFrame): The dataframe containing the data.
@@ -130,21 +159,30 @@ def find_and_fix_ts_duplicates(df_input: pd.DataFrame) -> pd.DataFrame:
     
     df_input_len = len(df_input)
 
-    df_sorted = df_input.sort_values(by=['sessionID', 'eventTimestamp']).reset_index(drop=True)
+    df_sorted = df_sort_values_once(df_input, ['sessionID', 'eventTimestamp']).reset_index(drop=True)
 
     count_duplicates = 0
 
+    session_codes = pd.factorize(df_sorted['sessionID'])[0]
+    timestamps = df_sorted['eventTimestamp'].to_numpy().copy()
+    one_second = np.timedelta64(1, 's')
+    # A row can only become equal to the previous one if it is equal to it or 1 second after it (the previous row may have been moved by 1 second)
+    same_session = session_codes[1:] == session_codes[:-1]
+    delta = timestamps[1:] - timestamps[:-1]
+    candidates = np.flatnonzero(same_session & ((delta == np.timedelta64(0, 's')) | (delta == one_second))) + 1
+
     # Identify and modify duplicates
-    for i in range(1, len(df_input)):
+    for i in candidates:
         # If the current row has the same 'sessionID' and 'eventTimestamp' as the previous row, modify the 'eventTimestamp'
         # of the current row (i) to be one second later than the row before it (i-1)
-        if (df_sorted.iloc[i]['sessionID'] == df_sorted.iloc[i - 1]['sessionID']) and (df_sorted.iloc[i]['eventTimestamp'] == df_sorted.iloc[i - 1]['eventTimestamp']):
+        if timestamps[i] == timestamps[i - 1]:
             # Increment the 'eventTimestamp' by 1 second from the previous row
             count_duplicates += 1
             # print(f"Duplicated found at sessionID {df_sorted.iloc[i]['sessionID']}") # debug
-            # print("Old value (duplicate):", df_sorted.iloc[i]['eventTimestamp'], "=", df_sorted.iloc[i-1]['eventTimestamp']) # debug
-            df_sorted.iloc[i, df_sorted.columns.get_loc('eventTimestamp')] += pd.Timedelta(seconds=1)
-            # print("New value for row:", i, ":", df_sorted.iloc[i, df_sorted.columns.get_loc('eventTimestamp')]) # debug
+            # print("Old value (duplicate):", timestamps[i], "=", timestamps[i - 1]) # debug
+            timestamps[i] += one_second
+            # print("New value for row:", i, ":", timestamps[i]) # debug
+    df_sorted['eventTimestamp'] = timestamps
 
     print(f"Duplicates corrected: {count_duplicates} / {df_input_len}")
     print()
@@ -174,7 +212,7 @@ def count_distinct_sessions_by_title(df: pd.DataFrame, keyword:str) -> int:
 
 def add_survey_end_rows(df: pd.DataFrame, columns_to_keep: list) -> pd.DataFrame:
     """
-    Adds a new row for each distinct sessionID where a SurveyTimestamp is present.
+    Adds a new row for each distinct sessionID where a SurveyTimestamp is present (a boundary event, see add_boundary_rows).
     The new row will have eventPage set to "PageIN", eventPara set to "SURVEY-END_PageIN_0",
     pageTitle set to "SURVEY-END", and eventTimestamp set to the value of SurveyTimestamp.
     The SurveyTimestamp column is then dropped.
@@ -184,37 +222,11 @@ def add_survey_end_rows(df: pd.DataFrame, columns_to_keep: list) -> pd.DataFrame
         columns_to_keep (list): List of column names to retain in the resulting DataFrame.
 
     Returns:
-        pd.DataFrame: The modified DataFrame with additional "SURVEY-END" rows and without the SurveyTimestamp column, ordered by.
+        pd.DataFrame: The modified DataFrame with additional "SURVEY-END" rows and without the SurveyTimestamp column, ordered by sessionID and eventTimestamp.
     """
+    survey_end_values = {'eventPage': 'PageIN', 'eventPara': 'SURVEY-END_PageIN_0', 'pageTitle': 'SURVEY-END'}
 
-    # Create a copy of the original DataFrame
-    df_copy = df.copy()
-
-    # Filter rows where SurveyTimestamp is not null
-    survey_rows = df_copy[df_copy['SurveyTimestamp'].notna()]
-
-    # Group by sessionID and take the first occurrence of each sessionID
-    survey_rows = survey_rows.drop_duplicates(subset='sessionID')
-
-    # Create new rows with 'SURVEY-END' values
-    new_rows = survey_rows.copy()
-    new_rows['eventPage'] = 'PageIN'
-    new_rows['eventPara'] = 'SURVEY-END_PageIN_0'
-    new_rows['pageTitle'] = 'SURVEY-END'
-    new_rows['eventTimestamp'] = new_rows['SurveyTimestamp']
-
-    # Concatenate the new rows with the original DataFrame
-    df_combined = pd.concat([df_copy, new_rows], ignore_index=True)
-
-    # Drop the SurveyTimestamp column
-    df_combined = df_combined.drop(columns=['SurveyTimestamp'])
-
-    # Reorder columns to match the original order, if a specific order is provided
-    df_combined = df_combined[columns_to_keep]
-
-    df_combined = df_combined.sort_values(by = ["sessionID", "eventTimestamp"])
-
-    return df_combined
+    return add_boundary_rows(df, "sessionID", "eventTimestamp", "SurveyTimestamp", survey_end_values, columns_to_keep)
 
 def add_event_counts(df:pd.DataFrame, event_list:list) -> pd.DataFrame:
     """
@@ -236,6 +248,27 @@ def add_event_counts(df:pd.DataFrame, event_list:list) -> pd.DataFrame:
     
     return df
 
+def process_session_events(df: pd.DataFrame, event_list: list) -> pd.DataFrame:
+    """
+    Runs the per-session steps common to the PAGE and PARA levels: fixes duplicated timestamps, adds the count of the events in event_list for each sessionID and removes those events.
+    Every step only depends on the rows of the same sessionID, so the function can be applied to partitions of sessions (see df_apply_partitioned).
+
+    Parameters:
+        df (pd.DataFrame): The event log with 'sessionID', 'eventPage' and 'eventTimestamp' (datetime) columns.
+        event_list (list): A list of event names to count and remove (e.g. clicks).
+
+    Returns:
+        pd.DataFrame: The processed event log.
+    """
+    print("> Fix duplicated timestamp")
+    df = find_and_fix_ts_duplicates(df)
+    # Adds the number of clicks and double clicks for each sessionID
+    df = add_event_counts(df, event_list)
+    # Removes click/dbclick events
+    df = df_remove_rows_with_substring(df, event_list, ["eventPage", "eventPara"])
+
+    return df
+
 def calculate_total_time(df: pd.DataFrame, key_col:str, timestamp_col:str) -> pd.DataFrame:
     """
     Calculate the total time elapsed in hours and days for each CaseID.
@@ -249,10 +282,10 @@ def calculate_total_time(df: pd.DataFrame, key_col:str, timestamp_col:str) -> pd
         pd.DataFrame: A new dataframe with columns key_col, 'TotalTimeHH' (total time in hours) and 'TotalTimeDD'.
     """
     # Convert timestamp column to datetime if it's not already
-    df[timestamp_col] = pd.to_datetime(df[timestamp_col])
+    df = df_to_datetime(df, [timestamp_col])
     
-    # Calculate the difference between the max and min timestamp for each CaseID
-    df_grouped = df.groupby(key_col).agg({timestamp_col: ['min', 'max'], key_col: 'size'})
+    # Calculate the difference between the max and min timestamp for each CaseID (the log is already in order of key_col: the groups are not sorted again)
+    df_grouped = df.groupby(key_col, sort=False).agg({timestamp_col: ['min', 'max'], key_col: 'size'})
     df_grouped.columns = ['StartTime', 'EndTime', 'CaseLength']
     df_grouped['TotalTime'] = df_grouped['EndTime'] - df_grouped['StartTime']
     
@@ -329,7 +362,7 @@ def plot_distinct_sessionID_per_class(df: pd.DataFrame, class_column: str, sessi
     # Clear the figure to prevent overlapping in future plots
     plt.clf()
 
-def save_distinct_sessionID_per_class(df: pd.DataFrame, class_column: str, session_column: str, output_folder: Path):
+def save_distinct_sessionID_per_class(df: pd.DataFrame, class_column: str, session_column: str, stats_sink: StatsSink):
     """
     Saves a CSV file containing the count of distinct sessionIDs for each class in the DataFrame, along with the percentage of each class relative to the total number of distinct sessionIDs.
 
@@ -340,12 +373,12 @@ def save_distinct_sessionID_per_class(df: pd.DataFrame, class_column: str, sessi
         The name of the column in the DataFrame that represents the class labels.
     - session_column: str
         The name of the column in the DataFrame that contains the session IDs.
-    - output_folder: Path
-        The folder where the CSV file will be saved.
+    - stats_sink: StatsSink
+        The stats sink where the table is added (the CSV file is saved in its folder).
 
     Returns:
     - None
-        Saves the resulting class counts and percentages as a CSV and XLSX file in the specified folder.
+        Saves the resulting class counts and percentages as a CSV file and adds them to the stats workbook.
     """
 
     # Group by the class column and count distinct session IDs for each class
@@ -362,20 +395,11 @@ def save_distinct_sessionID_per_class(df: pd.DataFrame, class_column: str, sessi
 
     class_counts = class_counts.sort_values(by='Qty', ascending=False)
 
-    # Create the file path for saving the CSV
-    output_file = Path(output_folder) / 'class_distinct_session_counts.csv'
-
-    # Save the DataFrame to a CSV file
-    class_counts.to_csv(output_file, index=False, sep=";")
-    print(f"CSV file saved successfully at: {output_file}")
-    print()
-
-    output_file = Path(output_folder) / 'class_distinct_session_counts.xlsx'
-    class_counts.to_excel(output_file, index=False, sheet_name="class_distinct_session_counts")
-    print(f"XLSX file saved successfully at: {output_file}")
+    # Save the DataFrame to a CSV file and add it to the stats workbook
+    stats_sink.add(class_counts, 'class_distinct_session_counts', csv=True)
     print()
     
-def save_distinct_eventTimestamps_for_na_class(df: pd.DataFrame, timestamp_column: str, class_column: str, output_folder: Path):
+def save_distinct_eventTimestamps_for_na_class(df: pd.DataFrame, timestamp_column: str, class_column: str, stats_sink: StatsSink):
     """
     Saves a CSV file containing the distinct values of eventTimestamps for rows where the Class is 'NA',
     sorted from the oldest to the most recent timestamp.
@@ -387,12 +411,12 @@ def save_distinct_eventTimestamps_for_na_class(df: pd.DataFrame, timestamp_colum
         The name of the column in the DataFrame that contains the event timestamps.
     - class_column: str
         The name of the column in the DataFrame that represents the class labels.
-    - output_folder: Path
-        The folder where the CSV file will be saved (must already exist).
+    - stats_sink: StatsSink
+        The stats sink where the table is added (the CSV file is saved in its folder).
 
     Returns:
     - None
-        Saves the resulting distinct eventTimestamps as a CSV file in the specified folder.
+        Saves the resulting distinct eventTimestamps as a CSV file and adds them to the stats workbook.
     """
 
     # Filter the DataFrame for rows where Class is 'NA'
@@ -403,18 +427,10 @@ def save_distinct_eventTimestamps_for_na_class(df: pd.DataFrame, timestamp_colum
 
     # Convert to DataFrame for saving
     distinct_timestamps_df = pd.DataFrame(distinct_timestamps, columns=[timestamp_column]).reset_index(drop=True)
-    distinct_timestamps_df['eventDate'] = pd.to_datetime(distinct_timestamps_df[timestamp_column]).dt.date
-
-    # Define the output file path
-    output_file = Path(output_folder) / 'distinct_event_timestamps_na_class.csv'
-    # Save the DataFrame to a CSV file
-    distinct_timestamps_df.to_csv(output_file, index=True)
-    print(f"CSV file saved successfully at: {output_file}")
+    distinct_timestamps_df['eventDate'] = distinct_timestamps_df[timestamp_column].dt.date
 
-    # Save the DataFrame to a CSV file
-    output_file = Path(output_folder) / 'distinct_event_timestamps_na_class.xlsx'
-    distinct_timestamps_df.to_excel(output_file, index=True, sheet_name="event_timestamps_na_class")
-    print(f"XLSX file saved successfully at: {output_file}")
+    # Save the DataFrame to a CSV file and add it to the stats workbook
+    stats_sink.add(distinct_timestamps_df, 'distinct_event_timestamps_na_class', csv=True, csv_sep=",", index=True)
 
     # list_event_date = distinct_timestamps_df['eventDate'].to_list()
     # print(list_event_date)
@@ -445,11 +461,12 @@ def label_terciles_by_session(df: pd.DataFrame, session_column: str, value_colum
     # Filter out rows where the value_column is NaN
     df_unique_non_nan = df_unique[df_unique[value_column].notna()]
     
-    # Calculate terciles based on the unique non-NaN values
-    df_unique_non_nan[col_tercile] = pd.qcut(df_unique_non_nan[value_column], q=3, labels=[1, 2, 3], duplicates='drop')
+    # Calculate terciles based on the unique non-NaN values (fewer than 3 labels if the tercile edges coincide, e.g. few distinct values after dropping the invalid cases)
+    tercile_codes = pd.qcut(df_unique_non_nan[value_column], q=3, labels=False, duplicates='drop')
+    df_unique_non_nan[col_tercile] = pd.Categorical(tercile_codes + 1, categories=[1, 2, 3])
     
-    # Merge the tercile labels back into the original dataframe
-    df = df.merge(df_unique_non_nan[[session_column, col_tercile]], on=session_column, how='left')
+    # Attach the tercile labels to the original dataframe
+    df = df_attach_by_key(df, df_unique_non_nan[[session_column, col_tercile]].set_index(session_column), session_column)
 
     # Count the number of empty cells in the specified column
     num_empty = df[col_tercile].isna().sum()
@@ -463,52 +480,89 @@ def label_terciles_by_session(df: pd.DataFrame, session_column: str, value_colum
 
     return df, col_tercile
 
-### MAIN ###
-def main():
-    print()
-    print("*** PROGRAM START ***")
-    print()
+def save_raw_event_log(df: pd.DataFrame, path_out: Path) -> None:
+    """
+    Saves a raw event log sorted by case (written atomically, see log_writer.py) and builds its index.
 
-    start_time = datetime.now().replace(microsecond=0)
-    print("Start process:", str(start_time))
-    print()
+    Parameters:
+        df (pd.DataFrame): The event log.
+        path_out (Path): The path of the output file.
 
-    ### Events from DISCO ###
-    df_disco = pd.DataFrame()
-    df_disco_list = []
-    path_disco_cases = Path(data_dir) / disco_cases
-    if path_disco_cases.exists():
-        print("Reading DISCO cases")
-        df_disco = pd.read_csv(path_disco_cases)
-        print("Cases in DISCO filter:", df_disco["Case ID"].nunique())
-    else:
-        print("Cases in DISCO filter: 0")
-    print()
+    Returns:
+        None
+    """
+    write_csv(df, path_out, sep=";", index=False)
+    log_build_index(path_out, df[id_column], id_column)
 
-    df_disco_list = df_disco["Case ID"].unique().tolist()
-    # print(df_disco_list) # debug
+def build_event_logs_pandas(stats_sink: StatsSink, writer: LogWriter) -> None:
+    """
+    Builds the event logs at PAGE and PARA level in memory with pandas and submits their saving (with their index) in log_dir to writer, adding the stats to stats_sink.
 
+    Parameters:
+        stats_sink (StatsSink): The stats sink of the script.
+        writer (LogWriter): The output writer of the script.
+
+    Returns:
+        None
+    """
     ### Events from tutorial ###
     print(">> Reading Events data")
-    path_events = Path(data_dir) / events_file
-    print("Path:", str(path_events))
-    col_list = ["sessionID","lang","pageName","pageTitle","menu","pageOrder","pagePara","event","duration","lastUpdate"]
-    df_events = df_read_csv_data(path_events, col_list)
+    paths_events = input_files(data_dir, events_file)
+    print("Path:", str(paths_events[0]) if len(paths_events) == 1 else f"{len(paths_events)} files ({events_file})")
+    col_list_read = col_list_events + (["projectID"] if output_partitions == 1 else []) # the project of each session, for the partitions
+    df_events = df_read_csv_files(paths_events, col_list_read, schemas["events"], timestamp_format, n_workers=input_workers) # typed by the parser, timestamps are parsed only here
     col_list_unique = ["pageName","pageTitle","menu","pageOrder","pagePara","event"]
     # df_events_unique = df_get_unique_values(df_events, col_list_unique)
     # dict_with_formatting(df_events_unique)
 
-    # Renaming 
-    for key in dic_en_pageTitle:
-        df_events['pageTitle'] = df_events['pageTitle'].replace([key], dic_en_pageTitle[key])
-
-    for key in dic_en_event:
-        df_events['event'] = df_events['event'].replace([key], dic_en_event[key])
+    # Renaming (the columns become categoricals, translated once per distinct value)
+    df_events = df_translate_columns(df_events, translations)
 
     ### Create a list of distinct values to check the data (and print it) ###
     df_events_unique = df_get_unique_values(df_events, col_list_unique)
     dict_with_formatting(df_events_unique) 
 
+    ### Quiz ###
+    print(">> Reading Quiz data")
+    path_quiz = Path(stats_dir) / quiz_stats_file
+    print("Path:", str(path_quiz))
+    df_quiz = df_read_csv_data(path_quiz, col_list_quiz, schema=schemas["quiz_stats"])
+    print(df_quiz.head())
+    print()
+
+    #### Survey ###
+    print(">> Reading Survey data")
+    path_survey = Path(data_dir) / survey_file_clean
+    print("Path:", str(path_survey))
+    df_survey = df_read_csv_cached(path_survey, None, date_format=timestamp_format, schema=schemas["survey_clean"])
+    print(df_survey.head())
+    print()
+
+    # Survey
+    print(">> Reading SUS data")
+    path_sus = Path(data_dir) / sus_file
+    print("Path:", str(path_sus))
+    df_sus = df_read_csv_data(path_sus, col_list_sus, schema=schemas["sus"]) # scores with decimal comma, parsed as floats
+    df_sus[col_list_sus[1:]] = df_sus[col_list_sus[1:]].fillna(0).round(3)
+    print(df_sus.head())
+    print()
+
+    ### Session dictionary ###
+    # The session ids of all the sources are replaced by int32 keys (see session_keys.py): the steps below join and group on the keys,
+    # translated back to the ids only when the stats and the event logs are saved
+    print(">> Building the session dictionary")
+    session_dictionary = SessionDictionary.build([df_events['sessionID'], df_quiz['sessionID'], df_survey['sessionID'], df_sus['sessionID']])
+    df_events['sessionID'] = session_dictionary.encode(df_events['sessionID'])
+    df_quiz = df_quiz.assign(sessionID=session_dictionary.encode(df_quiz['sessionID']))
+    df_survey = df_survey.assign(sessionID=session_dictionary.encode(df_survey['sessionID']))
+    df_sus = df_sus.assign(sessionID=session_dictionary.encode(df_sus['sessionID']))
+    print()
+
+    if output_partitions == 1:
+        print(">> Partitions of the sessions (project / date)")
+        df_session_partitions = session_partitions(df_events, 'sessionID', 'projectID', 'lastUpdate')
+        print()
+
     ### Create and event log at page-level (column "event", value "PageIN") ###
     print(">> Creating event log at page level")
     col_log = ["sessionID", "pageTitle", "menu", "pageOrder", "pagePara", "event", "lastUpdate"]
@@ -521,13 +575,8 @@ def main():
     # Define a dictionary for renaming columns
     rename_dict = {'event': 'eventPage','lastUpdate': 'eventTimestamp'}
     df_log_page = df_rename_columns(df_log_page, rename_dict)
-    print("> Fix duplicated timestamp")
-    df_log_page['eventTimestamp'] = pd.to_datetime(df_log_page['eventTimestamp'])
-    df_log_page = find_and_fix_ts_duplicates(df_log_page)
-    # Adds the number of clicks and double clicks for each sessionID
-    df_log_page = add_event_counts(df_log_page, clik_event_list)
-    # Removes click/dbclick events
-    df_log_page = df_remove_rows_with_substring(df_log_page, clik_event_list, ["eventPage", "eventPara"])
+    # Per-session steps (fix duplicated timestamps, click counts, click removal)
+    df_log_page = df_apply_partitioned(df_log_page, partial(process_session_events, event_list=clik_event_list), "sessionID", n_workers)
     # Show th final data
     df_show_data(df_log_page)
     print()
@@ -542,98 +591,81 @@ def main():
     # Define a dictionary for renaming columns
     rename_dict = {'event': 'eventPage','lastUpdate': 'eventTimestamp'}
     df_log_para = df_rename_columns(df_log_para, rename_dict)
-    print("> Fix duplicated timestamp")
-    df_log_para['eventTimestamp'] = pd.to_datetime(df_log_para['eventTimestamp'])
-    df_log_para = find_and_fix_ts_duplicates(df_log_para)
-    # Adds the number of clicks and double clicks for each sessionID
-    df_log_para = add_event_counts(df_log_para, clik_event_list)
-    # Removes click/dbclick events
-    df_log_para = df_remove_rows_with_substring(df_log_para, clik_event_list, ["eventPage", "eventPara"])
+    # Per-session steps (fix duplicated timestamps, click counts, click removal)
+    df_log_para = df_apply_partitioned(df_log_para, partial(process_session_events, event_list=clik_event_list), "sessionID", n_workers)
     # Show th final data
     df_show_data(df_log_para)
     print()
 
-    ### Quiz ###
-    print(">> Reading Quiz data")
-    path_quiz = Path(stats_dir) / quiz_stats_file
-    print("Path:", str(path_quiz))
-    col_list = ["sessionID", "QuizSessionCount", "QuizAnswerCorrectTotal", "QuizAnswerWrongTotal", "QuizAnswerCorrectRatioOverCount", "QuizAnswerCorrectRatioOverAll", "QuizSessionCount_P3","QuizAnswerCorrectTotal_P3","QuizAnswerWrongTotal_P3","QuizAnswerCorrectRatioOverCount_P3","QuizAnswerCorrectRatioOverAll_P3"]
-    df_quiz = df_read_csv_data(path_quiz, col_list, ";")
-    print(df_quiz.head())
-    print()
-
-    #### Survey ###
-    print(">> Reading Survey data")
-    path_survey = Path(data_dir) / survey_file_clean
-    print("Path:", str(path_survey))
-    df_survey = df_read_csv_data(path_survey, None, ";")
-    print(df_survey.head())
+    ### Merge with Quiz, Survey and SUS ###
+    # The tables with one row per session are combined first, then attached to the events in a single step
+    print(">> Combining Quiz, Survey and SUS by sessionID")
+    df_sessions = df_combine_by_key([df_quiz, df_survey, df_sus], 'sessionID')
+    print("Sessions:", len(df_sessions))
     print()
 
-    # Survey
-    print(">> Reading SUS data")
-    path_sus = Path(data_dir) / sus_file
-    print("Path:", str(path_sus))
-    col_list_sus = ["sessionID", "SUS", "Apprendimento percepito", "UEQ - Pragmatic", "UEQ - Hedonic", "UEQ - Overall"]
-    df_sus = df_read_csv_data(path_sus, col_list_sus, ";")
-    col_list_sus.pop(0) # remove "sessionID"
-    for col in col_list_sus:
-        df_sus[col] = df_sus[col].str.replace(',', '.')
-        df_sus[col] = df_sus[col].fillna("0")
-        df_sus[col] = df_sus[col].astype(float).round(3)
-    print(df_sus.head())
-    print()
-
-    ### Merge with Quiz and Survey###
-    print(">> Merging PAGE event log with Quiz and Survey")
-    print("> Merging page level event log with Quiz and Survey")
-    df_log_merge_1_page =  pd.merge(df_log_page, df_quiz, on='sessionID', how='left')
-    df_log_merge_2_page =  pd.merge(df_log_merge_1_page, df_survey, on='sessionID', how='left')
+    print(">> Merging PAGE event log with Quiz, Survey and SUS")
+    print("> Merging page level event log with Quiz, Survey and SUS")
+    df_log_merge_2_page = df_attach_by_key(df_log_page, df_sessions, 'sessionID')
     df_show_data(df_log_merge_2_page)
     print()
     distinct_session_count_1 = count_distinct_sessions_by_title(df_log_merge_2_page, "SURVEY")
     print("Number of distinct sessionID with survey (page levle):", distinct_session_count_1)
     print()
 
-    print("> Merging PARA event log with Quiz and Survey")
-    df_log_merge_1_para =  pd.merge(df_log_para, df_quiz, on='sessionID', how='left')
-    df_log_merge_2_para =  pd.merge(df_log_merge_1_para, df_survey, on='sessionID', how='left')    
+    print("> Merging PARA event log with Quiz, Survey and SUS")
+    df_log_merge_2_para = df_attach_by_key(df_log_para, df_sessions, 'sessionID')
     df_show_data(df_log_merge_2_para)
     print()
     distinct_session_count_2 = count_distinct_sessions_by_title(df_log_merge_2_para, "SURVEY")
     print("Number of distinct sessionID with survey (para level):", distinct_session_count_2)
     print()
 
-    ### Merge both df with SUS etc ###
-    print("> Merging PAGE and PARA event log with SUS")
-    df_log_merge_2_page =  pd.merge(df_log_merge_2_page, df_sus, on='sessionID', how='left')
-    df_log_merge_2_para =  pd.merge(df_log_merge_2_para, df_sus, on='sessionID', how='left')
-
 
     ### Final event log with survey end as event ###
     print(">> Creating final event log with survey responses as event")
 
-    # Final list of columns in the event log
-    columns_to_keep = ['sessionID', 'pageTitle', 'menu', 'pageOrder', 'pagePara', 'eventPage','eventTimestamp', 'eventPara', 'click_num', 'dbclick_num',
-                    'QuizSessionCount', 'QuizAnswerCorrectTotal', 'QuizAnswerWrongTotal',  'QuizAnswerCorrectRatioOverCount', 'QuizAnswerCorrectRatioOverAll', 'QuizSessionCount_P3','QuizAnswerCorrectTotal_P3','QuizAnswerWrongTotal_P3','QuizAnswerCorrectRatioOverCount_P3','QuizAnswerCorrectRatioOverAll_P3',
-                    'Q_1', 'Q_2', 'Q_3', 'Q_4', 'Q_5', 'Q_6', 'Q_7', 'Q_8', 'Q_9', 'Q_10', 'Q_11', 'Q_12', 'Q_13', 'Q_14', 'Q_15', 
-                    'Q_16', 'Q_17', 'Q_18', 'Q_19', 'Q_20', 'Q_21', 'Q_22', 'Q_23', 'Q_24', 'Q_25', 'Q_26', 'Q_27', 'Q_28'] + col_list_sus
     print(f"Columns in the vent log ({len(columns_to_keep)}): ", columns_to_keep)
     
-    df_log_merge_2_page_final = add_survey_end_rows(df_log_merge_2_page, columns_to_keep)
-    df_log_merge_2_page_final = df_log_merge_2_page_final.drop('eventPara', axis=1) # the page level has no para level
+    # The final event logs keep the order of add_survey_end_rows (by sessionID and eventTimestamp): they are not sorted again
+    df_log_merge_2_page_final = add_survey_end_rows(df_log_merge_2_page, [col for col in columns_to_keep if col != 'eventPara']) # the page level has no para level
 
     df_log_merge_2_para_final = add_survey_end_rows(df_log_merge_2_para, columns_to_keep)
 
     # Setting integer columns
     print("> Setting integer columns")
     # Convert specified columns to integers
-    columns_to_convert = ['click_num', 'dbclick_num','QuizSessionCount','QuizAnswerCorrectTotal','QuizAnswerWrongTotal']
     # Converting the columns to integers, setting errors='coerce' to handle non-convertible values
     df_log_merge_2_page_final[columns_to_convert] = df_log_merge_2_page_final[columns_to_convert].apply(pd.to_numeric, errors='coerce').fillna(0).astype(int)
     df_log_merge_2_para_final[columns_to_convert] = df_log_merge_2_para_final[columns_to_convert].apply(pd.to_numeric, errors='coerce').fillna(0).astype(int)
     print()
 
+    # Class of each event (added to the event logs after the total times)
+    class_page = df_log_merge_2_page_final['eventTimestamp'].apply(lambda x: add_class(x, criteria))
+    class_para = df_log_merge_2_para_final['eventTimestamp'].apply(lambda x: add_class(x, criteria))
+
+    ### Validation ###
+    # Before the total times, the stats and the terciles: with drop_invalid = 1 the invalid cases are not in them
+    if validate_logs == 1:
+        print(">> Validating the event logs")
+        for level in ["PAGE", "PARA"]:
+            df_final, class_final = (df_log_merge_2_page_final, class_page) if level == "PAGE" else (df_log_merge_2_para_final, class_para)
+            print(f"Event log ({level})")
+            # The events kept by drop_duplicates (below), with the columns of the checks
+            df_checked = df_final[["sessionID", "eventTimestamp", "pageTitle"]].assign(Class=class_final)[~df_final.duplicated().to_numpy()]
+            df_violations = validate_event_log(df_checked, "sessionID", "eventTimestamp", case_len_threshold, case_time_threshold)
+            df_violations_stats = df_violations.assign(sessionID=session_dictionary.decode(df_violations["sessionID"])).rename(columns={"sessionID": id_column})
+            stats_sink.add(df_violations_stats, f"edu_event_log_{level}_raw_violations", csv=True)
+            if drop_invalid == 1:
+                df_final = drop_invalid_cases(df_final, df_violations, "sessionID")
+                class_final = class_final.loc[df_final.index].reset_index(drop=True)
+                df_final = df_final.reset_index(drop=True)
+                if level == "PAGE":
+                    df_log_merge_2_page_final, class_page = df_final, class_final
+                else:
+                    df_log_merge_2_para_final, class_para = df_final, class_final
+        print()
+
     # Add total time and case length
     print("> Computing total times")
     df_log_merge_2_page_total_time = calculate_total_time(df_log_merge_2_page_final, "sessionID", "eventTimestamp")
@@ -643,44 +675,33 @@ def main():
     df_log_merge_2_para_total_time = df_log_merge_2_para_total_time.sort_values(by=["TotalTimeHH", "TotalTimeMM", "TotalTimeDD","CaseLength","sessionID"])
 
     # Saving
-    path_out = Path(stats_dir) / "edu_event_log_PAGE_raw_total_time.csv"
-    print("Saving total times (PAGE) to:", path_out)
-    df_log_merge_2_page_total_time.to_csv(path_out, sep=";", index=False)
+    print("Saving total times (PAGE)")
+    stats_sink.add(df_log_merge_2_page_total_time.assign(sessionID=session_dictionary.decode(df_log_merge_2_page_total_time['sessionID'])), "edu_event_log_PAGE_raw_total_time", csv=True)
 
-    path_out = Path(stats_dir) / "edu_event_log_PARA_raw_total_time.csv"
-    print("Saving total times (PAGE) to:", path_out)
-    df_log_merge_2_para_total_time.to_csv(path_out, sep=";", index=False)
+    print("Saving total times (PARA)")
+    stats_sink.add(df_log_merge_2_para_total_time.assign(sessionID=session_dictionary.decode(df_log_merge_2_para_total_time['sessionID'])), "edu_event_log_PARA_raw_total_time", csv=True)
 
     # Merge final data with total times for stats
-    df_log_merge_2_page_final = pd.merge(df_log_merge_2_page_final, df_log_merge_2_page_total_time, on="sessionID", how="left")
-    df_log_merge_2_para_final = pd.merge(df_log_merge_2_para_final, df_log_merge_2_para_total_time, on="sessionID", how="left")
-
-    df_log_merge_2_page_final = df_log_merge_2_page_final.sort_values(by=["TotalTimeHH", "TotalTimeMM", "TotalTimeDD", "CaseLength","sessionID"])
-    df_log_merge_2_para_final = df_log_merge_2_para_final.sort_values(by=["TotalTimeHH", "TotalTimeMM", "TotalTimeDD", "CaseLength","sessionID"])
+    df_log_merge_2_page_final = df_attach_by_key(df_log_merge_2_page_final, df_log_merge_2_page_total_time.set_index("sessionID"), "sessionID")
+    df_log_merge_2_para_final = df_attach_by_key(df_log_merge_2_para_final, df_log_merge_2_para_total_time.set_index("sessionID"), "sessionID")
 
     # Adds the class
     print(">> Adding classes")
-    df_log_merge_2_page_final['Class'] = df_log_merge_2_page_final['eventTimestamp'].apply(lambda x: add_class(x, criteria))
-    df_log_merge_2_para_final['Class'] = df_log_merge_2_para_final['eventTimestamp'].apply(lambda x: add_class(x, criteria))
+    df_log_merge_2_page_final['Class'] = class_page.to_numpy()
+    df_log_merge_2_para_final['Class'] = class_para.to_numpy()
     print(">> Stats about classes")
     plot_distinct_sessionID_per_class(df_log_merge_2_page_final, "Class", "sessionID", plots_dir)
-    save_distinct_sessionID_per_class(df_log_merge_2_page_final, "Class", "sessionID", stats_dir)
-    save_distinct_eventTimestamps_for_na_class(df_log_merge_2_page_final, "eventTimestamp", "Class", stats_dir)
+    save_distinct_sessionID_per_class(df_log_merge_2_page_final, "Class", "sessionID", stats_sink)
+    save_distinct_eventTimestamps_for_na_class(df_log_merge_2_page_final, "eventTimestamp", "Class", stats_sink)
 
     # Adds the class to quiz stats
     print(">> Updating Quiz ratio totals with Class")
     df_quiz = df_quiz.merge(df_log_merge_2_page_final[['sessionID', 'Class']], on='sessionID', how='left')
     df_quiz = df_quiz.drop_duplicates()
+    df_quiz['sessionID'] = session_dictionary.decode(df_quiz['sessionID'])
     print(df_quiz.head(5))
     print()
-    path_out = Path(stats_dir) / quiz_stats_file
-    # CSV
-    print("Path (CSV):", path_out)
-    df_quiz.to_csv(path_out, sep=";", index=False)
-    # XLS
-    path_out = Path(stats_dir) / f"{Path(quiz_stats_file).stem}.xlsx"
-    print("Path (XLSX):", path_out)
-    df_quiz.to_excel(path_out, sheet_name=f"{Path(quiz_stats_file).stem}", index=False)
+    stats_sink.add(df_quiz, Path(quiz_stats_file).stem, csv=True)
     print()
 
     df_log_merge_2_page_final = df_log_merge_2_page_final.drop_duplicates()
@@ -713,12 +734,10 @@ def main():
     df_log_merge_2_para_final.insert(2, activity_column, column)
 
     ### Ordering ###
-    df_log_merge_2_page_final.sort_values(by=[id_column, timestamp_column], ascending=[True, True], inplace=True)
-    df_log_merge_2_para_final.sort_values(by=[id_column, timestamp_column], ascending=[True, True], inplace=True)
+    # Already in order of id_column and timestamp_column (see add_survey_end_rows)
 
     ### Adding Terciles ###
     print(">> Adding Terciles")
-    list_col_t = ["SUS", "Apprendimento percepito", "UEQ - Overall", "QuizAnswerCorrectRatioOverAll"] # Columns on which to calculate the tertile
     print("Columns on which to calculate the tercile:", list_col_t)
     for col_name in list_col_t:
         print("Tercile on column:", col_name)
@@ -730,64 +749,171 @@ def main():
         print("Event log new tercile (PARA):", df_log_merge_2_para_final[col_tercile].unique())
         print()
 
+    ### Translating the session keys back to the session ids ###
+    if output_partitions == 1:
+        partitions_page = df_session_partitions.reindex(df_log_merge_2_page_final[id_column]).reset_index(drop=True)
+        partitions_para = df_session_partitions.reindex(df_log_merge_2_para_final[id_column]).reset_index(drop=True)
+    df_log_merge_2_page_final[id_column] = session_dictionary.decode(df_log_merge_2_page_final[id_column])
+    df_log_merge_2_para_final[id_column] = session_dictionary.decode(df_log_merge_2_para_final[id_column])
+
     ### Saving ###
+    # The two event logs are formatted and written in parallel by the output writer
     print("> Saving raw data")
     path_out = Path(log_dir) / "edu_event_log_PAGE_raw_ter.csv"
     print("Saving final event log to:", path_out)
-    df_log_merge_2_page_final.to_csv(path_out, sep=";", index=False)
+    writer.submit(save_raw_event_log, df_log_merge_2_page_final, path_out)
     
     path_out = Path(log_dir) / "edu_event_log_PARA_raw_ter.csv"
     print("Saving final event log to:", path_out)
-    df_log_merge_2_para_final.to_csv(path_out, sep=";", index=False)
+    writer.submit(save_raw_event_log, df_log_merge_2_para_final, path_out)
     print()
 
-    ### Filter based on DISCO ###
-    if filter_disco_cases == 1:
-        print("> Filtering Cases already chosen in DISCO")
-        df_log_merge_2_para_final_included = df_log_merge_2_para_final[df_log_merge_2_para_final[id_column].isin(df_disco_list)]
-        print("Cases after DISCO filter (para):", df_log_merge_2_para_final[id_column].nunique())
-        df_log_merge_2_page_final_included = df_log_merge_2_page_final[df_log_merge_2_page_final[id_column].isin(df_disco_list)]
-        print("Cases after DISCO filter (page):", df_log_merge_2_page_final[id_column].nunique())
+    if output_partitions == 1:
+        # The same event logs split by project and date of the session, only the changed partitions are rewritten
+        print("> Saving partitioned event logs to:", Path(log_dir) / partitions_dir)
+        writer.submit(write_csv_partitioned, df_log_merge_2_page_final, partitions_page, Path(log_dir) / partitions_dir, "edu_event_log_PAGE_raw_ter.csv", sep=";", index=False)
+        writer.submit(write_csv_partitioned, df_log_merge_2_para_final, partitions_para, Path(log_dir) / partitions_dir, "edu_event_log_PARA_raw_ter.csv", sep=";", index=False)
         print()
 
-        # Get the list of cases not in DISCO (excluded)
-        df_log_merge_2_para_final_excluded = df_log_merge_2_para_final[~df_log_merge_2_para_final[id_column].isin(df_disco_list)]
-        df_log_merge_2_page_final_excluded = df_log_merge_2_page_final[~df_log_merge_2_page_final[id_column].isin(df_disco_list)]
+def build_event_logs_duckdb(stats_sink: StatsSink) -> None:
+    """
+    Builds the event logs at PAGE and PARA level with the DuckDB backend (see log_duckdb.py) and saves them (with their index) in log_dir, adding the stats to stats_sink.
+    The steps are the ones of build_event_logs_pandas, expressed as views: the query plan is executed when each event log is saved, spilling to disk if the data does not fit in memory.
+    Only small tables (one row per session) are loaded in pandas.
 
-        print("> Saving filtered data")
-        path_out = Path(log_dir) / "edu_event_log_PAGE_raw_filtered_DISCO_ter.csv"
-        print("Saving final event log to:", path_out)
-        df_log_merge_2_page_final_included.to_csv(path_out, sep=";", index=False)
-        
-        path_out = Path(log_dir) / "edu_event_log_PARA_raw_filtered_DISCO_ter.csv"
-        print("Saving final event log to:", path_out)
-        df_log_merge_2_para_final_included.to_csv(path_out, sep=";", index=False)
-        print()
+    Parameters:
+        stats_sink (StatsSink): The stats sink of the script.
 
-        print("> Saving excluded data")
-        path_out = Path(log_dir) / "edu_event_log_PAGE_excluded_DISCO_ter.csv"
-        print("Saving excluded event log to:", path_out)
-        df_log_merge_2_page_final_excluded.to_csv(path_out, sep=";", index=False)
-        
-        path_out = Path(log_dir) / "edu_event_log_PARA_excluded_DISCO_ter.csv"
-        print("Saving excluded event log to:", path_out)
-        df_log_merge_2_para_final_excluded.to_csv(path_out, sep=";", index=False)
-        print()
-    else:
-        print("DISCO filter not applied")
-        print()
-        path_out = Path(log_dir) / "edu_event_log_PAGE_raw_ter.csv"
-        print("Saving final event log to:", path_out)
-        df_log_merge_2_page_final.to_csv(path_out, sep=";", index=False)
-        
-        path_out = Path(log_dir) / "edu_event_log_PARA_raw_ter.csv"
+    Returns:
+        None
+    """
+    con = duckdb_connect(Path(log_dir) / ".duckdb_tmp", duckdb_memory_limit)
+
+    ### Inputs ###
+    print(">> Reading Events, Quiz, Survey and SUS data (DuckDB)")
+    if output_partitions == 1:
+        print("Partitioned output not available with the DuckDB backend (only the event logs are saved)")
+    if validate_logs == 1:
+        print("Validation not available with the DuckDB backend (the event logs are not validated)")
+    duckdb_read_csv(con, "events_raw", input_files(data_dir, events_file), col_list_events, timestamp_format=timestamp_format, schema=schemas["events"], key_column="idEvent")
+    duckdb_replace_values(con, "events", "events_raw", translations)
+    duckdb_read_csv(con, "quiz", Path(stats_dir) / quiz_stats_file, col_list_quiz, schema=schemas["quiz_stats"])
+    duckdb_read_csv(con, "survey", Path(data_dir) / survey_file_clean, None, timestamp_format=timestamp_format, schema=schemas["survey_clean"])
+    duckdb_read_csv(con, "sus_raw", Path(data_dir) / sus_file, col_list_sus, schema=schemas["sus"])
+    duckdb_fill_round(con, "sus", "sus_raw", col_list_sus[1:], 3)
+    print("Events:", con.sql("SELECT count(*) FROM events").fetchone()[0])
+    print()
+
+    # Order of the events of each session in the pandas steps (the SURVEY-END rows after the events with the same timestamp)
+    order_columns = ["sessionID", "eventTimestamp", "is_survey_end", "eventTimestamp_orig", "rn", "quiz_rn", "survey_rn", "sus_rn"]
+    columns_out = columns_to_keep + ["TotalTimeHH", "TotalTimeMM", "TotalTimeDD", "CaseLength", "Class"]
+
+    for level, event_list in [("PAGE", ['PageIN'] + clik_event_list), ("PARA", None)]:
+        print(f">> Creating event log at {level} level (DuckDB)")
+        log_view = f"log_{level}"
+        duckdb_create_level_log(con, f"{log_view}_events", "events", event_list, clik_event_list)
+        duckdb_attach_sessions(con, f"{log_view}_merged", f"{log_view}_events", ["quiz", "survey", "sus"])
+        duckdb_add_survey_end_rows(con, f"{log_view}_survey_end", f"{log_view}_merged", order_columns[3:])
+        duckdb_set_integer_columns(con, f"{log_view}_int", f"{log_view}_survey_end", columns_to_convert)
+        # Executes the plan once, the following steps read its result
+        print("Events:", duckdb_materialize(con, f"{log_view}_table", f"{log_view}_int", order_columns))
+
+        print("> Computing total times")
+        df_total_time = duckdb_add_total_time(con, f"{log_view}_total_time", f"{log_view}_table", "sessionID", "eventTimestamp")
+        print(f"Saving total times ({level})")
+        stats_sink.add(df_total_time, f"edu_event_log_{level}_raw_total_time", csv=True)
+
+        duckdb_add_class(con, log_view, f"{log_view}_total_time", "eventTimestamp", criteria)
+
+        if level == "PAGE":
+            print(">> Stats about classes")
+            df_class = con.sql(f"SELECT DISTINCT Class, sessionID FROM {log_view}").df()
+            plot_distinct_sessionID_per_class(df_class, "Class", "sessionID", plots_dir)
+            save_distinct_sessionID_per_class(df_class, "Class", "sessionID", stats_sink)
+            df_na_class = con.sql(f"SELECT DISTINCT eventTimestamp, Class FROM {log_view} WHERE Class = 'NA'").df()
+            save_distinct_eventTimestamps_for_na_class(df_na_class, "eventTimestamp", "Class", stats_sink)
+
+            # Adds the class to quiz stats
+            print(">> Updating Quiz ratio totals with Class")
+            df_quiz = con.sql(f"""
+                SELECT q.* EXCLUDE (rn), c.Class FROM quiz q
+                LEFT JOIN (SELECT sessionID, Class, min(event_order) AS first_order FROM {log_view} GROUP BY ALL) c ON q.sessionID = c.sessionID
+                ORDER BY q.rn, c.first_order
+            """).df()
+            print(df_quiz.head(5))
+            print()
+            stats_sink.add(df_quiz, Path(quiz_stats_file).stem, csv=True)
+            print()
+
+        print(">> Adding Terciles")
+        print("Columns on which to calculate the tercile:", list_col_t)
+        tercile_tables = {f"{col_name}_Tercile": duckdb_label_terciles(con, log_view, "sessionID", col_name) for col_name in list_col_t}
+
+        # Output columns: renamed, with the activity column as third column (the page level has no para level)
+        activity_source = "pageTitle" if level == "PAGE" else "eventPara"
+        columns_file = [(col, {"sessionID": id_column, "eventTimestamp": timestamp_column}.get(col, col)) for col in columns_out if not (level == "PAGE" and col == "eventPara")]
+        columns_file.insert(2, (activity_source, activity_column))
+
+        path_out = Path(log_dir) / f"edu_event_log_{level}_raw_ter.csv"
         print("Saving final event log to:", path_out)
-        df_log_merge_2_para_final.to_csv(path_out, sep=";", index=False)
+        case_rows = duckdb_save_event_log(con, log_view, path_out, columns_file, tercile_tables)
+        log_build_index(path_out, id_column=id_column, case_rows=case_rows)
         print()
 
-    # Extract lines where 'CaseLen' > case_len_threshold
-    # df_log_merge_2_page_final = df_log_merge_2_page_final[(df_log_merge_2_page_final['CaseLength'] > case_len_threshold) & (df_log_merge_2_page_final['TotalTimeHH'] < case_time_threshold)]
-    # df_log_merge_2_para_final = df_log_merge_2_para_final[(df_log_merge_2_para_final['CaseLength'] > case_len_threshold) & (df_log_merge_2_para_final['TotalTimeHH'] < case_time_threshold)]
+    duckdb_close(con)
+
+### MAIN ###
+def main():
+    print()
+    print("*** PROGRAM START ***")
+    print()
+
+    start_time = datetime.now().replace(microsecond=0)
+    print("Start process:", str(start_time))
+    print()
+
+    stats_sink = StatsSink(stats_dir, stats_workbook)
+
+    ### Events from DISCO ###
+    # The case ids of each filter are indexed once and used for both levels
+    case_filters = log_read_case_filters({name: Path(data_dir) / file_name for name, file_name in disco_cases.items()}, id_column)
+    print()
+
+    # Output steps run in parallel on the writer (the files are written atomically)
+    with LogWriter(output_workers) as writer:
+        if backend == "duckdb":
+            build_event_logs_duckdb(stats_sink)
+        else:
+            build_event_logs_pandas(stats_sink, writer)
+        writer.wait() # the raw event logs and their indexes are needed by the DISCO filter
+
+        ### Filter based on DISCO ###
+        split_futures = {}
+        if filter_disco_cases == 1:
+            # The included / excluded cases of all the filters are copied from the indexed raw event logs in a single pass (one task for each level)
+            print("> Filtering Cases already chosen in DISCO")
+            print("> Saving filtered and excluded data")
+            for level in ["PAGE", "PARA"]:
+                path_in = Path(log_dir) / f"edu_event_log_{level}_raw_ter.csv"
+                output_paths = {name: (Path(log_dir) / f"edu_event_log_{level}_raw_filtered_{name}_ter.csv", Path(log_dir) / f"edu_event_log_{level}_excluded_{name}_ter.csv") for name in case_filters}
+                split_futures[level] = writer.submit(log_split_cases_multi, path_in, case_filters, output_paths, output_compression)
+        else:
+            print("DISCO filter not applied (final event logs: the raw ones)")
+            print()
+
+        ### Saving stats ###
+        print("> Saving stats workbook")
+        writer.submit(stats_sink.save)
+        writer.wait()
+
+    for level, split_future in split_futures.items():
+        for name, cases_included, cases_excluded, path_included, path_excluded in split_future.result().itertuples(index=False):
+            print(f"Cases after {name} filter ({level.lower()}):", cases_included)
+            print(f"Saving final event log to: {path_included}")
+            print(f"Saving excluded event log ({cases_excluded} cases) to: {path_excluded}")
+    print()
+
+    # The cases with CaseLength <= case_len_threshold or TotalTimeHH >= case_time_threshold are reported (and removed with drop_invalid = 1) by the validation
 
     # program END
     end_time = datetime.now().replace(microsecond=0)
@@ -0,0 +1,121 @@
+"""
+benchmark.py
+
+Regression gate for the analysis functions of the notebooks (and of export_features.py): runs the pytest-benchmark suite tests/test_benchmark.py
+(pip install -r requirements-dev.txt) and compares the timings with a stored baseline.
+Each function is called once per round, for at least n_repeat rounds and max_time_s seconds, keeping the fastest round (a fixed number of calls per round,
+unlike the calibration of pytest-benchmark, whose calls per round can change between runs and with them the time of a call); the suite runs n_passes times
+and the time of a function is the median of its fastest call in each pass, so that its rounds are spread over the run as the load of the machine changes
+and a pass in an unusually fast or slow state (e.g. of the memory allocator) does not become the baseline. The speed of the run is
+the median ratio of all the functions to their baseline: a function is a regression if it is slower than its baseline by more than the threshold,
+both in absolute terms and relative to the speed of the run (which absorbs the load of the machine).
+Exits with code 1 if there are regressions; run with --update (or update_baseline = 1) to store the current timings as baseline.
+For the time of each line of a function, run its workload once with EDU_LOG_PROFILE=line (see profiling.py):
+EDU_LOG_PROFILE=line python -m pytest tests/test_benchmark.py --benchmark-disable -s -k count_jumps
+"""
+
+### IMPORT ###
+from pathlib import Path
+from datetime import datetime
+import json
+import sys
+import tempfile
+import pandas as pd
+import pytest
+
+### LOCAL IMPORT ###
+from config import config_reader
+
+### GLOBALS ###
+yaml_config = config_reader.config_read_yaml("config.yml", "config")
+# print(yaml_config) # debug
+benchmark_dir = str(yaml_config["BENCHMARK_DIR"])
+baseline_file = "benchmark_baseline.json" # baseline timings (in benchmark_dir), specific to the machine
+suite_file = Path(__file__).parent / "tests" / "test_benchmark.py"
+
+# INPUT
+n_repeat = 7 # minimum rounds of each function (the fastest is kept)
+max_time_s = 0.5 # time of the rounds of each function in a pass (seconds): the fast functions run more rounds
+n_passes = 5 # runs of the suite (the median of the fastest call of each pass is kept)
+threshold = 0.25 # maximum slowdown with respect to the baseline (0.25 = 25%)
+update_baseline = 0 # 1 = saves the timings as the new baseline
+
+### FUNCTIONS ###
+def run_benchmark_suite(n_repeat: int, max_time_s: float) -> dict:
+    """
+    Runs the pytest-benchmark suite (see tests/test_benchmark.py) with one call per round and the garbage collector disabled and returns the fastest round of each function.
+
+    Parameters:
+        n_repeat (int): The minimum number of rounds.
+        max_time_s (float): The time of the rounds of each function in seconds.
+
+    Returns:
+        dict: The name of the function as key and the time of the fastest call (seconds) as value.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path_json = Path(tmp_dir) / "benchmark.json"
+        exit_code = pytest.main([str(suite_file), "-q", "-p", "no:cacheprovider", f"--benchmark-min-rounds={n_repeat}", f"--benchmark-max-time={max_time_s}",
+                                 "--benchmark-disable-gc", f"--benchmark-json={path_json}"])
+        if exit_code != 0 or not path_json.exists():
+            raise RuntimeError(f"The benchmark suite failed (pytest exit code {int(exit_code)}): {suite_file}")
+        results = json.loads(path_json.read_text())
+
+    return {result["extra_info"]["function"]: result["stats"]["min"] for result in results["benchmarks"]}
+
+### MAIN ###
+def main():
+    print()
+    print("*** PROGRAM START ***")
+    print()
+
+    start_time = datetime.now().replace(microsecond=0)
+    print("Start process:", str(start_time))
+    print()
+
+    print(">> Running the benchmark suite:", suite_file)
+    df_passes = pd.DataFrame([run_benchmark_suite(n_repeat, max_time_s) for _ in range(n_passes)])
+    timings = df_passes.median().to_dict()
+    print()
+
+    path_baseline = Path(benchmark_dir) / baseline_file
+    baseline = json.loads(path_baseline.read_text()) if path_baseline.exists() else {}
+    df_results = pd.DataFrame({"Function": list(timings), "Time_s": list(timings.values())})
+    df_results["Baseline_s"] = df_results["Function"].map(baseline)
+    df_results["Ratio"] = df_results["Time_s"] / df_results["Baseline_s"]
+    speed = df_results["Ratio"].median() if baseline else 1.0 # slowdown of the whole run (machine load), not of single functions
+    df_results["Relative_Ratio"] = df_results["Ratio"] / speed
+    df_results["Regression"] = (df_results["Ratio"] > 1 + threshold) & (df_results["Relative_Ratio"] > 1 + threshold)
+    if baseline:
+        print(f"Speed of the run (median ratio to the baseline): {speed:.3f}")
+    print(df_results.round(4).to_string(index=False))
+    print()
+
+    regressions = df_results.loc[df_results["Regression"], "Function"].tolist()
+    if update_baseline == 1 or "--update" in sys.argv or not baseline:
+        path_baseline.parent.mkdir(parents=True, exist_ok=True)
+        path_baseline.write_text(json.dumps(timings, indent=1) + "\n")
+        print("Baseline saved at:", path_baseline)
+        regressions = []
+    elif regressions:
+        print(f"Functions slower than the baseline by more than {threshold:.0%}:", regressions)
+    else:
+        print(f"No function slower than the baseline by more than {threshold:.0%}")
+
+    # program END
+    end_time = datetime.now().replace(microsecond=0)
+    delta_time = end_time - start_time
+
+    print()
+    print("End process:", end_time)
+    print("Time to finish:", delta_time)
+
+    print()
+    print("*** PROGRAM END ***")
+    print()
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+export_features.py
+
+Exports one fixed-width feature vector per session (case) of an event log, for the downstream models: a dense matrix with the features of session_feature_matrix (log_features.py)
+and the sparse matrices of the activity and bigram counts, over a vocabulary kept append-only across the exports (so that the matrices of repeated exports can be concatenated).
+"""
+
+### IMPORT ###
+from pathlib import Path
+from datetime import datetime
+import importlib.util
+import numpy as np
+import pandas as pd
+
+### LOCAL IMPORT ###
+from config import config_reader
+from log_loader import log_load
+from log_features import session_feature_matrix
+
+### GLOBALS ###
+yaml_config = config_reader.config_read_yaml("config.yml", "config")
+# print(yaml_config) # debug
+log_dir = str(yaml_config["LOG_DIR"])
+timestamp_format = str(yaml_config["TIMESTAMP_FORMAT"])
+id_column = "Case ID"
+activity_column = "Activity"
+timestamp_column = "Complete Timestamp"
+
+# INPUT
+level_list = ["PAGE", "PARA"]
+log_file = "edu_event_log_LEVEL_raw_filtered_DISCO_ter.csv" # <- INPUT: the event logs of 03_csv_to_log.py, leaving LEVEL word
+features_dir = "features" # output directory (in log_dir)
+vocabulary_file = "features_vocabulary_LEVEL.csv" # vocabulary of the activities and bigrams of each level (in features_dir), extended at each export
+
+### FUNCTIONS ###
+def vocabulary_read(path_vocabulary: Path) -> dict:
+    """
+    Reads the vocabulary of the previous exports (empty if the file does not exist).
+
+    Parameters:
+        path_vocabulary (Path): The path of the vocabulary file (columns 'Kind' and 'Token', in order of column).
+
+    Returns:
+        dict: The vocabulary: {'activity': [...], 'bigram': [...]}.
+    """
+    if not path_vocabulary.exists():
+        print("New vocabulary:", path_vocabulary)
+        return {"activity": [], "bigram": []}
+    df_vocabulary = pd.read_csv(path_vocabulary, dtype=str, keep_default_na=False)
+    vocabulary = {kind: df_vocabulary.loc[df_vocabulary["Kind"] == kind, "Token"].tolist() for kind in ["activity", "bigram"]}
+    print(f"Vocabulary: {len(vocabulary['activity'])} activities, {len(vocabulary['bigram'])} bigrams ({path_vocabulary})")
+
+    return vocabulary
+
+def save_features(df_features: pd.DataFrame, activity_counts, bigram_counts, path_stem: Path) -> None:
+    """
+    Saves the features of an event log: '<stem>_features.npz' (dense matrix 'X', 'columns' and 'cases'), '<stem>_features.parquet' if pyarrow is installed,
+    '<stem>_activities.npz' and '<stem>_bigrams.npz' (sparse matrices, scipy.sparse.load_npz; the rows are the cases of the dense matrix).
+
+    Parameters:
+        df_features (pd.DataFrame): The dense features (one row per case).
+        activity_counts (scipy.sparse.csr_matrix): The activity counts of each case.
+        bigram_counts (scipy.sparse.csr_matrix): The bigram counts of each case.
+        path_stem (Path): The path of the output files, without suffix.
+
+    Returns:
+        None
+    """
+    from scipy import sparse
+
+    path_dense = path_stem.with_name(f"{path_stem.name}_features.npz")
+    np.savez_compressed(path_dense, X=df_features.to_numpy(dtype=np.float64), columns=np.array(df_features.columns, dtype=str), cases=np.array(df_features.index, dtype=str))
+    print("Dense features saved at:", path_dense)
+    if importlib.util.find_spec("pyarrow") is not None:
+        path_parquet = path_stem.with_name(f"{path_stem.name}_features.parquet")
+        df_features.reset_index().to_parquet(path_parquet, index=False)
+        print("Dense features saved at:", path_parquet)
+    else:
+        print("The Parquet file requires the pyarrow package (pip install pyarrow): only the NPZ file is saved")
+    for name, matrix in [("activities", activity_counts), ("bigrams", bigram_counts)]:
+        path_sparse = path_stem.with_name(f"{path_stem.name}_{name}.npz")
+        sparse.save_npz(path_sparse, matrix)
+        print(f"Sparse {name} counts saved at:", path_sparse)
+
+### MAIN ###
+def main():
+    print()
+    print("*** PROGRAM START ***")
+    print()
+
+    start_time = datetime.now().replace(microsecond=0)
+    print("Start process:", str(start_time))
+    print()
+
+    path_features = Path(log_dir) / features_dir
+    path_features.mkdir(parents=True, exist_ok=True)
+
+    for level in level_list:
+        print(f">> Features at {level} level")
+        path_log = Path(log_dir) / log_file.replace("LEVEL", level)
+        print("Path:", path_log)
+        df_log = log_load(path_log, timestamp_column=timestamp_column, date_format=timestamp_format)
+
+        path_vocabulary = path_features / vocabulary_file.replace("LEVEL", level)
+        vocabulary = vocabulary_read(path_vocabulary)
+        df_features, activity_counts, bigram_counts, vocabulary = session_feature_matrix(df_log, id_column, activity_column, timestamp_column, vocabulary)
+
+        save_features(df_features, activity_counts, bigram_counts, path_features / path_log.stem)
+        df_vocabulary = pd.DataFrame([(kind, token) for kind, tokens in vocabulary.items() for token in tokens], columns=["Kind", "Token"])
+        df_vocabulary.to_csv(path_vocabulary, index=False)
+        print("Vocabulary saved at:", path_vocabulary)
+        print(df_features.describe().T.round(3))
+        print()
+
+    # program END
+    end_time = datetime.now().replace(microsecond=0)
+    delta_time = end_time - start_time
+
+    print()
+    print("End process:", end_time)
+    print("Time to finish:", delta_time)
+
+    print()
+    print("*** PROGRAM END ***")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# log_analysis.py
+from collections import defaultdict
+import pandas as pd
+
+from profiling import profiled
+from utilities import df_sort_values_once
+
+@profiled
+def count_jumps(df_log: pd.DataFrame, id_column: str, timestamp_column: str, activity_column: str) -> pd.DataFrame:
+    """
+    Counts forward and backward jumps between activities for each unique case ID in an event log.
+    A forward jump is identified when an arc (activity pair) reoccurs in the same direction, and a backward jump is identified when the reverse of a previously seen arc is encountered.
+
+    Parameters:
+        df_log (pd.DataFrame): A DataFrame containing the event log data.
+        id_column (str): The name of the column representing the case ID.
+        timestamp_column (str): The name of the column containing timestamps (datetime) for events, used to order events within each case.
+        activity_column (str): The name of the column representing the activity names.
+
+    Returns:
+        pd.DataFrame: A DataFrame with columns id_column, 'Forward_Jumps' and 'Backward_Jumps' (the counts of each case).
+    """
+    # Dictionary to store the counts of forward and backward arcs per case_id
+    arc_counts = defaultdict(lambda: {"Forward_Jumps": 0, "Backward_Jumps": 0})
+
+    # Initialise all case_id in the dictionary with 0 counts
+    for case_id in df_log[id_column].unique():
+        arc_counts[case_id]  # This ensures every case_id is initialised with forward=0 and backward=0
+
+    # Ensure the data is sorted by case_id and timestamp to maintain the correct event order (the event logs of 03_csv_to_log.py already are)
+    df_log = df_sort_values_once(df_log, [id_column, timestamp_column])
+
+    # Iterate through each unique case_id in the log
+    for case_id, group in df_log.groupby(id_column):
+        # Extract the sequence of activities for this case_id
+        activities = group[activity_column].tolist()
+
+        # Track seen arcs to identify the first forward arc for each pair
+        seen_arcs = {}
+
+        # Iterate through the sequence of activities to evaluate arcs
+        for i in range(len(activities) - 1):
+            arc_forward = (activities[i], activities[i + 1])
+            arc_backward = (activities[i + 1], activities[i])
+
+            # If this forward arc hasn't been encountered yet, mark it as seen
+            if arc_forward not in seen_arcs:
+                seen_arcs[arc_forward] = True
+            else:
+                # Count subsequent forward arcs
+                arc_counts[case_id]["Forward_Jumps"] += 1
+
+            # Check if this backward arc has been seen before
+            if arc_backward in seen_arcs:
+                # Count backward arcs if this reverse connection is found
+                arc_counts[case_id]["Backward_Jumps"] += 1
+
+    # Convert the dictionary into a DataFrame for easier analysis and visualisation
+    arc_counts_df = pd.DataFrame.from_dict(arc_counts, orient="index")
+    arc_counts_df.index.name = id_column
+    arc_counts_df.reset_index(inplace=True)
+
+    return arc_counts_df
+
+@profiled
+def calculate_session_count_and_percentage(df: pd.DataFrame, id_col: str) -> pd.DataFrame:
+    """
+    Calculates the distinct session counts and their percentage based on QuizSessionCount.
+
+    Parameters:
+        df (pd.DataFrame): A DataFrame with the columns 'QuizSessionCount' (the number of quiz sessions) and id_col.
+        id_col (str): The name of the session column.
+
+    Returns:
+        pd.DataFrame: A DataFrame with columns 'QuizSessionCount' (distinct values), 'SessionCount' (count of distinct sessions for each value)
+            and 'SessionPerc' (percentage of SessionCount with respect to the total, rounded to 2 decimal places).
+    """
+    # Count distinct sessionID for each QuizSessionCount
+    session_counts = df.groupby('QuizSessionCount')[id_col].nunique().reset_index(name='SessionCount')
+
+    # Calculate the percentage of session counts relative to the total
+    total_sessions = session_counts['SessionCount'].sum()
+    session_counts['SessionPerc'] = (session_counts['SessionCount'] / total_sessions * 100).round(2)
+
+    return session_counts
+
+@profiled
+def calculate_column_statistics(df: pd.DataFrame, id_column: str, calc_column: str) -> pd.DataFrame:
+    """
+    Calculates statistics on a specific column, considering only distinct IDs, and returns the results without grouping by ID.
+
+    Parameters:
+        df (pd.DataFrame): The input DataFrame.
+        id_column (str): The name of the column representing the unique identifiers (IDs).
+        calc_column (str): The name of the column on which to perform the calculations.
+
+    Returns:
+        pd.DataFrame: A DataFrame with one row and the columns '{calc_column}_not_na' (count of non-empty values), '{calc_column}_min', '{calc_column}_max',
+            '{calc_column}_avg' (rounded to 2 decimal places) and '{calc_column}_med'.
+    """
+    # Remove duplicate IDs
+    df_no_duplicates = df.drop_duplicates(subset=[id_column])
+
+    # Filter out rows where the calculation column is NaN
+    non_empty_df = df_no_duplicates[df_no_duplicates[calc_column].notna()]
+
+    # Calculate the statistics for the calc_column
+    col_not_na = non_empty_df[calc_column].count()  # Count of non-NaN values
+    col_min = non_empty_df[calc_column].min()       # Minimum value
+    col_max = non_empty_df[calc_column].max()       # Maximum value
+    col_avg = non_empty_df[calc_column].mean().round(2)      # Mean value
+    col_med = non_empty_df[calc_column].median()    # Median value
+
+    # Create a DataFrame with the results, using calc_column as prefix
+    stats_df = pd.DataFrame({
+        f'{calc_column}_not_na': [col_not_na],
+        f'{calc_column}_min': [col_min],
+        f'{calc_column}_max': [col_max],
+        f'{calc_column}_avg': [col_avg],
+        f'{calc_column}_med': [col_med]
+    })
+
+    return stats_df
+
+@profiled
+def extract_distinct_menu_per_session(df: pd.DataFrame, key_column: str, menu_column: str) -> pd.DataFrame:
+    """
+    Extracts the distinct values of the menu column for each distinct sessionID from a dataframe.
+
+    Parameters:
+        df (pd.DataFrame): The dataframe containing the data.
+        key_column (str): The column name to group by (typically sessionID).
+        menu_column (str): The column name from which to extract distinct values (typically menu).
+
+    Returns:
+        pd.DataFrame: A dataframe with each sessionID and the distinct values of the menu column.
+    """
+    # Group by the key column and aggregate distinct menu values
+    grouped_df = df.groupby(key_column)[menu_column].apply(lambda x: list(x.unique())).reset_index()
+
+    # Rename the columns for clarity
+    grouped_df.columns = [key_column, 'DistinctMenuValues']
+
+    # Sort
+    grouped_df = grouped_df.sort_values(by = "DistinctMenuValues")
+
+    return grouped_df
+
+@profiled
+def slice_statistics(df: pd.DataFrame, slice_columns: list, id_column: str, aggregates: dict, slice_values: list = None, variant_index=None,
+                     cc_column: str = "CC", slice_names: tuple = ("Slice", "Value"), decimals: int = 3) -> pd.DataFrame:
+    """
+    Computes the statistics of slices of cases, each slice being the cases with a value of a slice column (e.g. the terciles of the UX measures), for all the slice columns and values
+    in one grouped pass: the table is stacked by slice column (one row for each case and slice column) and grouped by slice column and value.
+    A new slice column or value is a new group, without filtering the table (or the event log) again.
+
+    Parameters:
+        df (pd.DataFrame): The table with one row per case (e.g. the stats of the cases), with id_column, the slice columns and the columns of the aggregates.
+        slice_columns (list): The slice columns (e.g. ['SUS_Tercile', 'UEQ - Overall_Tercile']).
+        id_column (str): The name of the case column.
+        aggregates (dict): The aggregates, as named aggregations of pandas (name: (column, function), e.g. {'CV_mean': ('CV', 'mean')}), rounded to decimals.
+        slice_values (list): The values of the slices (e.g. [1, 3]); all the slices of this values are returned, also without cases. Defaults to None (all the values).
+        variant_index (VariantIndex): If given, the cyclomatic complexity of the DFG of the cases of each slice is added in cc_column (see VariantIndex.group_weights). Defaults to None.
+        cc_column (str): The name of the cyclomatic complexity column. Defaults to 'CC'.
+        slice_names (tuple): The names of the columns with the slice column and the value. Defaults to ('Slice', 'Value').
+        decimals (int): The decimals of the aggregates. Defaults to 3.
+
+    Returns:
+        pd.DataFrame: A DataFrame with one row for each slice and the columns slice_names, 'Cases' (number of rows), the aggregates and cc_column (with variant_index).
+    """
+    slice_name, value_name = slice_names
+    value_columns = list(dict.fromkeys(col for col, _ in aggregates.values() if col != id_column))
+
+    # One row for each case and slice column
+    df_long = df.melt(id_vars=[id_column] + value_columns, value_vars=slice_columns, var_name=slice_name, value_name=value_name)
+    df_long = df_long[df_long[value_name].notna()]
+    if slice_values is not None:
+        df_long = df_long[df_long[value_name].isin(slice_values)]
+
+    df_slices = df_long.groupby([slice_name, value_name], sort=True).agg(Cases=(id_column, "size"), **aggregates)
+    df_slices[list(aggregates)] = df_slices[list(aggregates)].round(decimals)
+    if slice_values is not None:
+        df_slices = df_slices.reindex(pd.MultiIndex.from_product([slice_columns, slice_values], names=[slice_name, value_name]))
+        df_slices["Cases"] = df_slices["Cases"].fillna(0).astype(int)
+
+    if variant_index is not None:
+        group_codes = df_slices.index.get_indexer(pd.MultiIndex.from_frame(df_long[[slice_name, value_name]]))
+        weights = variant_index.group_weights(df_long[id_column], group_codes, len(df_slices))
+        df_slices[cc_column] = [variant_index.cyclomatic_complexity(weights=group_weights) for group_weights in weights]
+
+    return df_slices.reset_index()
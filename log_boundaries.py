@@ -0,0 +1,94 @@
+# log_boundaries.py
+import numpy as np
+import pandas as pd
+from pandas.core.dtypes.cast import find_common_type
+
+from utilities import df_is_sorted
+
+def log_sort_order(df: pd.DataFrame, key_column: str, timestamp_column: str) -> np.ndarray:
+    """
+    Returns the positions of the rows of an event log in the order of key and timestamp (stable: the rows with the same key and timestamp keep their order, as sort_values).
+    If the rows are already in order (see df_is_sorted), no sort is done.
+
+    Parameters:
+        df (pd.DataFrame): The event log.
+        key_column (str): The name of the case column.
+        timestamp_column (str): The name of the timestamp column (datetime; NaT after the other timestamps of the case).
+
+    Returns:
+        np.ndarray: The positions of the rows in order.
+    """
+    if df_is_sorted(df, [key_column, timestamp_column]):
+        return np.arange(len(df))
+
+    key_codes = pd.factorize(df[key_column], sort=True)[0]
+    timestamps = df[timestamp_column].to_numpy().view(np.int64).copy()
+    timestamps[df[timestamp_column].isna().to_numpy()] = np.iinfo(np.int64).max
+
+    return np.lexsort((timestamps, key_codes))
+
+def add_boundary_rows(df: pd.DataFrame, key_column: str, timestamp_column: str, boundary_column: str, values: dict, columns: list = None) -> pd.DataFrame:
+    """
+    Adds a synthetic boundary event (e.g. SURVEY-END, or the start / end of a case) to each case with a boundary timestamp, in the column boundary_column
+    (a per-case attribute, e.g. attached from the session table).
+    Each boundary row copies the columns of the first row of its case (in the order of df), with the timestamp from boundary_column and the values in values.
+    The events are put in order of key and timestamp once (see log_sort_order) and the boundary rows (one per case, already in order) are inserted with an ordered merge,
+    after the events of the case with a lower or equal timestamp: the result is the same of sorting the events and the boundary rows together.
+    Each column of the result is gathered once from df (the events and the first rows of the cases), without copying, concatenating and re-sorting the whole log.
+
+    Parameters:
+        df (pd.DataFrame): The event log.
+        key_column (str): The name of the case column (e.g. 'sessionID').
+        timestamp_column (str): The name of the timestamp column (datetime).
+        boundary_column (str): The name of the column with the timestamp of the boundary event of each case (NaT = no boundary event).
+        values (dict): The values of the boundary rows (column -> value, e.g. {'pageTitle': 'SURVEY-END'}); columns not in the result are ignored.
+        columns (list): The columns of the result (all the columns of df if None). Defaults to None.
+
+    Returns:
+        pd.DataFrame: The event log with the boundary rows, in order of key and timestamp (new index).
+    """
+    columns = list(df.columns) if columns is None else columns
+
+    # Events in order of key and timestamp
+    order = log_sort_order(df, key_column, timestamp_column)
+    key_codes, key_values = pd.factorize(df[key_column], sort=True)
+
+    # Boundary rows from the first row of each case, in order of key
+    first_rows = np.flatnonzero(~df[key_column].duplicated().to_numpy() & df[boundary_column].notna().to_numpy())
+    first_rows = first_rows[np.argsort(key_codes[first_rows], kind="stable")]
+    boundary_codes = key_codes[first_rows]
+    boundary_timestamps = df[boundary_column].array.take(first_rows).astype(df[timestamp_column].dtype)
+
+    # Position of each boundary row in the ordered events: the events of the previous cases and the events of the case with a lower or equal timestamp
+    key_codes = key_codes[order]
+    boundary_by_code = np.full(len(key_values), np.iinfo(np.int64).min, dtype=np.int64)
+    boundary_by_code[boundary_codes] = np.asarray(boundary_timestamps).view(np.int64)
+    timestamps = df[timestamp_column].to_numpy().view(np.int64)[order]
+    not_after = (timestamps <= boundary_by_code[key_codes]) & df[timestamp_column].notna().to_numpy()[order]
+    events_not_after = np.bincount(key_codes, weights=not_after.astype(np.float64), minlength=len(key_values)).astype(np.int64)
+    positions = np.searchsorted(key_codes, boundary_codes, side="left") + events_not_after[boundary_codes]
+
+    # Ordered merge: row of df of each row of the result (the events in order, the first row of the case for the boundary rows)
+    n_events = len(df)
+    boundary_positions = positions + np.arange(len(first_rows))
+    take = np.empty(n_events + len(first_rows), dtype=np.int64)
+    take[np.arange(n_events) + np.searchsorted(positions, np.arange(n_events), side="right")] = order
+    take[boundary_positions] = first_rows
+
+    # Each column gathered once; the timestamp and the columns in values are then set on the boundary rows
+    data = {}
+    for col in columns:
+        source = df[col].array
+        if col == timestamp_column or col in values:
+            boundary = pd.Series(boundary_timestamps if col == timestamp_column else values[col], index=range(len(first_rows)))
+            if len(boundary) and boundary.dtype != df[col].dtype:
+                # Common type of the events and of the boundary values, as pd.concat (e.g. object for a category and a string, Int64 for Int32 and int64)
+                dtype = find_common_type([df[col].dtype, boundary.dtype])
+                source = source.astype(dtype)
+                boundary = boundary.astype(dtype)
+            data[col] = source.take(take)
+            data[col][boundary_positions] = boundary.array
+        else:
+            data[col] = source.take(take)
+
+    return pd.DataFrame(data, copy=False)
@@ -0,0 +1,120 @@
+# log_conformance.py
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+import pandas as pd
+
+from profiling import profiled
+from utilities import df_sort_values_once
+
+def reference_path(df: pd.DataFrame, id_column: str, activity_column: str, order_columns: list, end_activities: list = None) -> list:
+    """
+    Returns the reference path of the tutorial: the activities of the event log in the canonical order of order_columns (e.g. ['pageOrder'] at PAGE level,
+    ['pageOrder', 'pagePara'] at PARA level, smallest value of each activity). The activities with the same order (e.g. a page and its quiz) are in order of
+    their mean position in the cases, so the path is the same on any copy of the log.
+    The synthetic boundary events (e.g. SURVEY-END, which copies the columns of the first event of its case) have no order of their own: they are put at the end.
+
+    Parameters:
+        df (pd.DataFrame): The event log, with the events of each case in order.
+        id_column (str): The name of the case column.
+        activity_column (str): The name of the activity column.
+        order_columns (list): The columns of the canonical order (numeric).
+        end_activities (list): The activities at the end of the path, in this order (only the ones in the log). Defaults to None.
+
+    Returns:
+        list: The activities of the reference path, in order.
+    """
+    end_activities = [activity for activity in (end_activities or []) if activity in set(df[activity_column])]
+    df = df[~df[activity_column].isin(end_activities)]
+    df_order = df[order_columns].apply(pd.to_numeric, errors="coerce").assign(
+        Activity=df[activity_column].to_numpy(), Position=df.groupby(id_column, sort=False).cumcount().to_numpy())
+    df_activities = df_order.groupby("Activity", sort=True).agg(**{col: (col, "min") for col in order_columns}, Position=("Position", "mean"))
+    path = df_activities.sort_values(by=order_columns + ["Position"], kind="stable").index.tolist() + end_activities
+    print(f"Reference path ({len(path)} activities): {' > '.join(map(str, path))}")
+
+    return path
+
+def edit_distance_batch(traces: np.ndarray, lengths: np.ndarray, reference: np.ndarray, substitution_cost: int = 2) -> np.ndarray:
+    """
+    Computes the edit distance between a batch of traces and the reference path with a dynamic-programming kernel vectorized over the traces and the reference:
+    the rows of the DP table of all the traces are updated together, one event at a time, and the insertions along a row are resolved with a cumulative minimum.
+
+    Parameters:
+        traces (np.ndarray): The activity codes of the traces (one row per trace, padded after its length).
+        lengths (np.ndarray): The number of events of each trace.
+        reference (np.ndarray): The activity codes of the reference path.
+        substitution_cost (int): The cost of replacing an activity (1 = Levenshtein distance, 2 = alignment with moves on log and on model only). Defaults to 2.
+
+    Returns:
+        np.ndarray: The distance of each trace.
+    """
+    n_reference = len(reference)
+    steps = np.arange(n_reference + 1, dtype=np.int64)
+    dist = np.tile(steps, (len(traces), 1)) # empty trace: all the moves on model
+    for i in range(traces.shape[1]):
+        # Move on log (dist + 1), synchronous move or substitution (diagonal), then moves on model along the row: row[j] = min_k (cand[k] + j - k)
+        cand = np.empty_like(dist)
+        cand[:, 0] = dist[:, 0] + 1
+        cand[:, 1:] = np.minimum(dist[:, 1:] + 1, dist[:, :-1] + np.where(traces[:, i, None] == reference[None, :], 0, substitution_cost))
+        row = np.minimum.accumulate(cand - steps, axis=1) + steps
+        active = (i < lengths)[:, None]
+        dist = np.where(active, row, dist)
+
+    return dist[:, n_reference]
+
+@profiled
+def conformance_scores(df: pd.DataFrame, id_column: str, activity_column: str, timestamp_column: str, reference: list, substitution_cost: int = 2,
+                       batch_size: int = 2048, n_workers: int = 1) -> pd.DataFrame:
+    """
+    Scores each case of an event log against a reference path (see reference_path): the edit distance between the sequence of its activities and the path
+    and the fitness 1 - distance / (events + activities of the path), the fitness of an alignment with a sequential model (1 = the path, 0 = nothing in common).
+    The activities are integer-encoded once, the cases are sorted by length and scored in batches (see edit_distance_batch), optionally on a pool of processes.
+
+    Parameters:
+        df (pd.DataFrame): The event log (sorted by case and timestamp if it is not).
+        id_column (str): The name of the case column.
+        activity_column (str): The name of the activity column.
+        timestamp_column (str): The name of the timestamp column.
+        reference (list): The activities of the reference path, in order.
+        substitution_cost (int): The cost of replacing an activity (see edit_distance_batch). Defaults to 2.
+        batch_size (int): The number of cases of a batch. Defaults to 2048.
+        n_workers (int): The number of worker processes (1 = current process). Defaults to 1.
+
+    Returns:
+        pd.DataFrame: A DataFrame with columns id_column, 'Events', 'Distance' and 'Fitness' (rounded to 3 decimal places), in order of case.
+    """
+    df = df_sort_values_once(df, [id_column, timestamp_column])
+    case_codes, case_ids = pd.factorize(df[id_column], sort=False)
+    activity_codes = pd.Index(reference).get_indexer(df[activity_column]) # -1 for the activities not in the path (never synchronous)
+    reference_codes = np.arange(len(reference), dtype=np.int64)
+    lengths = np.bincount(case_codes, minlength=len(case_ids))
+    starts = np.cumsum(lengths) - lengths
+
+    # Batches of cases of similar length (padding up to the longest case of the batch)
+    by_length = np.argsort(lengths, kind="stable")
+    batches = []
+    for first in range(0, len(by_length), batch_size):
+        cases = by_length[first:first + batch_size]
+        width = int(lengths[cases].max()) if len(cases) else 0
+        offsets = np.arange(width)
+        positions = np.minimum(starts[cases, None] + offsets, len(activity_codes) - 1)
+        traces = np.where(offsets < lengths[cases, None], activity_codes[positions], -1)
+        batches.append((cases, traces, lengths[cases]))
+
+    kernel = partial(edit_distance_batch, reference=reference_codes, substitution_cost=substitution_cost)
+    if n_workers > 1 and len(batches) > 1:
+        print(f"Scoring {len(batches)} batches on {n_workers} processes")
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(kernel, [traces for _, traces, _ in batches], [batch_lengths for _, _, batch_lengths in batches]))
+    else:
+        results = [kernel(traces, batch_lengths) for _, traces, batch_lengths in batches]
+
+    distances = np.zeros(len(case_ids), dtype=np.int64)
+    for (cases, _, _), batch_distances in zip(batches, results):
+        distances[cases] = batch_distances
+    fitness = 1 - distances / np.maximum(lengths + len(reference), 1)
+
+    df_scores = pd.DataFrame({id_column: case_ids, "Events": lengths, "Distance": distances, "Fitness": np.round(fitness, 3)})
+    print(f"Conformance: {len(df_scores)} cases, mean fitness {df_scores['Fitness'].mean():.3f}")
+
+    return df_scores
@@ -0,0 +1,489 @@
+# log_duckdb.py
+"""
+Out-of-core backend of 03_csv_to_log.py, based on DuckDB (optional dependency: pip install duckdb).
+Each step creates a view, so the pipeline is a lazy query plan that is executed only when its result is needed (see duckdb_materialize);
+DuckDB streams the CSV files and spills the sorts, windows and joins to disk when the data does not fit in memory.
+The steps give the same event log of the pandas steps of 03_csv_to_log.py.
+"""
+from pathlib import Path
+import os
+import pandas as pd
+
+def _sql_name(name: str) -> str:
+    """
+    Returns a column or view name quoted for SQL (e.g. 'UEQ - Overall' -> '"UEQ - Overall"').
+    """
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _sql_value(value) -> str:
+    """
+    Returns a string, date or time value as SQL literal.
+    """
+    return "'" + str(value).replace("'", "''") + "'"
+
+def duckdb_connect(temp_dir: str, memory_limit: str = None):
+    """
+    Opens a DuckDB database in temp_dir (file 'event_log.duckdb', replaced if it exists), which also spills to temp_dir when the data does not fit in memory.
+
+    Parameters:
+        temp_dir (str): The directory for the database and the temporary files (created if needed).
+        memory_limit (str): The memory limit of DuckDB (e.g. '4GB'); if None, the DuckDB default is used (80% of the RAM).
+
+    Returns:
+        duckdb.DuckDBPyConnection: The connection.
+    """
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ImportError("The DuckDB backend requires the duckdb package (pip install duckdb)") from e
+
+    Path(temp_dir).mkdir(parents=True, exist_ok=True)
+    path_db = Path(temp_dir) / "event_log.duckdb"
+    path_db.unlink(missing_ok=True)
+    con = duckdb.connect(str(path_db))
+    con.execute(f"SET temp_directory = {_sql_value(temp_dir)}")
+    con.execute("SET preserve_insertion_order = true") # the row number of the CSV files is the tie-breaker of the sorts
+    if memory_limit is not None:
+        con.execute(f"SET memory_limit = {_sql_value(memory_limit)}")
+
+    return con
+
+def duckdb_close(con) -> None:
+    """
+    Closes a connection opened by duckdb_connect and removes its database file.
+
+    Parameters:
+        con (duckdb.DuckDBPyConnection): The connection.
+
+    Returns:
+        None
+    """
+    path_db = con.sql("SELECT path FROM duckdb_databases() WHERE database_name = current_database()").fetchone()[0]
+    con.close()
+    Path(path_db).unlink(missing_ok=True)
+
+# SQL types of the types of the schemas (see SCHEMAS in config.yml)
+duckdb_schema_types = {"str": "VARCHAR", "object": "VARCHAR", "int64": "BIGINT", "Int64": "BIGINT", "int32": "INTEGER", "float64": "DOUBLE", "bool": "BOOLEAN", "datetime": "TIMESTAMP"}
+
+def duckdb_read_csv(con, view_name: str, path_csv, col_list: list, csv_sep: str = ",", col_types: dict = None, timestamp_format: str = "ISO8601", schema: dict = None, key_column: str = None) -> None:
+    """
+    Creates a view on a CSV file with the distinct rows of the columns in col_list (as df_read_csv_data) and their row number in the file (column 'rn', first occurrence).
+    With a schema (see csv_read_options), the separators and the types of the columns are those of the schema.
+    With more files (see input_files) the rows are numbered in order of file; the rows delivered in more files (same key_column) are kept once, from the last file (as df_read_csv_files).
+
+    Parameters:
+        con (duckdb.DuckDBPyConnection): The connection.
+        view_name (str): The name of the view.
+        path_csv (str | list): The file path to the CSV file, or the list of the paths of more files with the same columns.
+        col_list (list): The list of columns to read (None for all the columns).
+        csv_sep (str): The delimiter of the CSV file. Defaults to ','.
+        col_types (dict): The SQL types of some columns (e.g. {'lastUpdate': 'TIMESTAMP'}), the others are detected by DuckDB.
+        timestamp_format (str): The format of the TIMESTAMP columns ('ISO8601' or a strftime format). Defaults to 'ISO8601'.
+        schema (dict): The schema of the file (col_types override its types). Defaults to None.
+        key_column (str): The column that identifies a row across more files (e.g. 'idEvent'); not used with a single file. Defaults to None.
+
+    Returns:
+        None
+    """
+    paths = [path_csv] if isinstance(path_csv, (str, Path)) else list(path_csv)
+    if len(paths) == 1:
+        key_column = None
+    decimal_sep = "."
+    if schema is not None:
+        csv_sep = schema.get("sep", ",")
+        decimal_sep = schema.get("decimal", ".")
+        schema_types = {col: duckdb_schema_types[col_type] for col, col_type in (schema.get("columns") or {}).items() if col_list is None or col in col_list or col == key_column}
+        col_types = {**schema_types, **(col_types or {})}
+
+    options = [f"delim = {_sql_value(csv_sep)}", "header = true"]
+    if decimal_sep != ".":
+        options.append(f"decimal_separator = {_sql_value(decimal_sep)}")
+    if col_types:
+        options.append("types = {" + ", ".join(f"{_sql_value(col)}: {_sql_value(col_type)}" for col, col_type in col_types.items()) + "}")
+    if timestamp_format != "ISO8601":
+        options.append(f"timestampformat = {_sql_value(timestamp_format)}")
+
+    files = _sql_value(Path(paths[0]).as_posix()) if len(paths) == 1 else "[" + ", ".join(_sql_value(Path(path).as_posix()) for path in paths) + "]"
+    source = f"read_csv({files}, {', '.join(options)})"
+    if col_list is None:
+        col_list = con.sql(f"SELECT * FROM {source}").columns
+    cols = ", ".join(_sql_name(col) for col in col_list)
+    if key_column is not None:
+        # Rows delivered in more files: the last one (in order of file and row)
+        key_cols = cols if key_column in col_list else f"{cols}, {_sql_name(key_column)}"
+        source = f"""(SELECT {cols} FROM (SELECT {key_cols}, row_number() OVER () AS rn_file FROM {source})
+            QUALIFY row_number() OVER (PARTITION BY {_sql_name(key_column)} ORDER BY rn_file DESC) = 1 ORDER BY rn_file)"""
+
+    con.execute(f"""
+        CREATE OR REPLACE VIEW {_sql_name(view_name)} AS
+        SELECT {cols}, rn
+        FROM (SELECT {cols}, row_number() OVER () AS rn FROM {source})
+        QUALIFY row_number() OVER (PARTITION BY {cols} ORDER BY rn) = 1
+    """)
+
+def duckdb_replace_values(con, view_name: str, source_view: str, mapping_dict: dict) -> None:
+    """
+    Creates a view replacing the values of some columns (e.g. the translation of pageTitle and event, see translations_merge); the values without translation are kept as they are and reported.
+
+    Parameters:
+        con (duckdb.DuckDBPyConnection): The connection.
+        view_name (str): The name of the view.
+        source_view (str): The name of the source view.
+        mapping_dict (dict): A dictionary with the column name as key and the dictionary of its old -> new values as value.
+
+    Returns:
+        None
+    """
+    replace_list = []
+    for col, mapping in mapping_dict.items():
+        translations = set(mapping.values())
+        values = [value for (value,) in con.sql(f"SELECT DISTINCT {_sql_name(col)} FROM {_sql_name(source_view)} WHERE {_sql_name(col)} IS NOT NULL ORDER BY 1").fetchall()]
+        unmapped = [value for value in values if value not in mapping and value not in translations]
+        if unmapped:
+            print(f"Values of '{col}' without translation ({len(unmapped)}):", unmapped)
+        cases = " ".join(f"WHEN {_sql_value(old)} THEN {_sql_value(new)}" for old, new in mapping.items())
+        replace_list.append(f"CASE {_sql_name(col)} {cases} ELSE {_sql_name(col)} END AS {_sql_name(col)}")
+
+    con.execute(f"""
+        CREATE OR REPLACE VIEW {_sql_name(view_name)} AS
+        SELECT * REPLACE ({", ".join(replace_list)})
+        FROM {_sql_name(source_view)}
+    """)
+
+def duckdb_fill_round(con, view_name: str, source_view: str, col_list: list, decimals: int) -> None:
+    """
+    Creates a view with the float columns in col_list rounded, empty values as 0.
+
+    Parameters:
+        con (duckdb.DuckDBPyConnection): The connection.
+        view_name (str): The name of the view.
+        source_view (str): The name of the source view.
+        col_list (list): The columns to convert.
+        decimals (int): The number of decimal places (rounding half to even, as pandas).
+
+    Returns:
+        None
+    """
+    replace_list = [f"round_even(coalesce({_sql_name(col)}, 0), {decimals}) AS {_sql_name(col)}" for col in col_list]
+    con.execute(f"""
+        CREATE OR REPLACE VIEW {_sql_name(view_name)} AS
+        SELECT * REPLACE ({", ".join(replace_list)})
+        FROM {_sql_name(source_view)}
+    """)
+
+def duckdb_create_level_log(con, view_name: str, source_view: str, event_list: list, click_event_list: list) -> None:
+    """
+    Creates the view of the event log at page level (events in event_list) or paragraph level (event_list None), with the per-session steps of process_session_events:
+    fixes duplicated timestamps (+1 second, as find_and_fix_ts_duplicates), adds the count of the events in click_event_list for each sessionID and removes those events.
+    The fixed timestamps are computed with window functions: in a run of consecutive timestamps of a session that differ by 0 or 1 second,
+    a timestamp is moved by 1 second if the number of equal timestamps before it (in the run) is odd.
+    The columns 'eventTimestamp_orig' (timestamp before the fix) and 'rn' (row in the events file) keep the order of the pandas steps.
+
+    Parameters:
+        con (duckdb.DuckDBPyConnection): The connection.
+        view_name (str): The name of the view.
+        source_view (str): The name of the view with the (translated) events.
+        event_list (list): The events of the page level (e.g. ['PageIN', 'CLICK', 'DBCLICK']); None for the paragraph level, which also gets the 'eventPara' column.
+        click_event_list (list): The events to count and remove (e.g. ['CLICK', 'DBCLICK']).
+
+    Returns:
+        None
+    """
+    if event_list is None:
+        event_para = "pageTitle || '_' || event || '_' || CAST(pagePara AS VARCHAR)"
+        event_filter = ""
+    else:
+        event_para = "CAST(NULL AS VARCHAR)"
+        event_filter = f"WHERE event IN ({', '.join(_sql_value(event) for event in event_list)})"
+
+    counts = ", ".join(f"count(*) FILTER (WHERE eventPage = {_sql_value(event)}) OVER (PARTITION BY sessionID) AS {_sql_name(f'{event}_num'.lower())}" for event in click_event_list)
+    removed = " OR ".join(f"coalesce(contains(lower({col}), {_sql_value(event.lower())}), false)" for col in ["eventPage", "eventPara"] for event in click_event_list)
+
+    con.execute(f"""
+        CREATE OR REPLACE VIEW {_sql_name(view_name)} AS
+        WITH level_events AS (
+            SELECT sessionID, pageTitle, menu, pageOrder, pagePara, event AS eventPage, lastUpdate AS eventTimestamp_orig, {event_para} AS eventPara, rn
+            FROM {_sql_name(source_view)}
+            {event_filter}
+        ),
+        ts_steps AS (
+            SELECT *, eventTimestamp_orig - lag(eventTimestamp_orig) OVER (PARTITION BY sessionID ORDER BY eventTimestamp_orig, rn) AS ts_step
+            FROM level_events
+        ),
+        ts_runs AS (
+            SELECT *, sum(CASE WHEN ts_step IN (INTERVAL 0 SECOND, INTERVAL 1 SECOND) THEN 0 ELSE 1 END)
+                OVER (PARTITION BY sessionID ORDER BY eventTimestamp_orig, rn ROWS UNBOUNDED PRECEDING) AS ts_run
+            FROM ts_steps
+        ),
+        ts_fixed AS (
+            SELECT *, sum(CASE WHEN ts_step = INTERVAL 0 SECOND THEN 1 ELSE 0 END)
+                OVER (PARTITION BY sessionID, ts_run ORDER BY eventTimestamp_orig, rn ROWS UNBOUNDED PRECEDING) % 2 AS ts_shift
+            FROM ts_runs
+        ),
+        counted AS (
+            SELECT sessionID, pageTitle, menu, pageOrder, pagePara, eventPage,
+                eventTimestamp_orig + CAST(ts_shift AS INTEGER) * INTERVAL 1 SECOND AS eventTimestamp, eventPara,
+                {counts}, eventTimestamp_orig, rn
+            FROM ts_fixed
+        )
+        SELECT * FROM counted
+        WHERE NOT ({removed})
+    """)
+
+def duckdb_attach_sessions(con, view_name: str, source_view: str, session_views: list, key_column: str = "sessionID") -> None:
+    """
+    Creates a view attaching to each event the columns of the tables with one row per session (left join, as df_combine_by_key and df_attach_by_key).
+    The row number of each table is kept as '<table>_rn' (order of the events of sessions with more rows in a table).
+    As in pandas, the integer columns of the session tables become floats (the events of the sessions not in a table get empty values).
+
+    Parameters:
+        con (duckdb.DuckDBPyConnection): The connection.
+        view_name (str): The name of the view.
+        source_view (str): The name of the view with the events.
+        session_views (list): The names of the views of the session tables (e.g. quiz, survey, SUS), each with key_column and 'rn'.
+        key_column (str): The key column. Defaults to 'sessionID'.
+
+    Returns:
+        None
+    """
+    select_list = ["e.*"]
+    join_list = []
+    for i, session_view in enumerate(session_views):
+        alias = f"s{i}"
+        rel = con.sql(f"SELECT * FROM {_sql_name(session_view)}")
+        for col, col_type in zip(rel.columns, rel.types):
+            if col in (key_column, "rn"):
+                continue
+            if str(col_type) in ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT"):
+                select_list.append(f"CAST({alias}.{_sql_name(col)} AS DOUBLE) AS {_sql_name(col)}")
+            else:
+                select_list.append(f"{alias}.{_sql_name(col)}")
+        select_list.append(f"{alias}.rn AS {_sql_name(f'{session_view}_rn')}")
+        join_list.append(f"LEFT JOIN {_sql_name(session_view)} {alias} ON e.{_sql_name(key_column)} = {alias}.{_sql_name(key_column)}")
+
+    con.execute(f"""
+        CREATE OR REPLACE VIEW {_sql_name(view_name)} AS
+        SELECT {", ".join(select_list)}
+        FROM {_sql_name(source_view)} e
+        {" ".join(join_list)}
+    """)
+
+def duckdb_add_survey_end_rows(con, view_name: str, source_view: str, order_columns: list) -> None:
+    """
+    Creates a view adding a 'SURVEY-END' row for each sessionID with a SurveyTimestamp (as add_survey_end_rows), taken from the first row of the session in the order of order_columns.
+    The column 'is_survey_end' (1 for the new rows) puts the new rows after the events with the same timestamp.
+
+    Parameters:
+        con (duckdb.DuckDBPyConnection): The connection.
+        view_name (str): The name of the view.
+        source_view (str): The name of the view with the events and the survey columns.
+        order_columns (list): The columns giving the order of the events of each session.
+
+    Returns:
+        None
+    """
+    order = ", ".join(_sql_name(col) for col in order_columns)
+    con.execute(f"""
+        CREATE OR REPLACE VIEW {_sql_name(view_name)} AS
+        SELECT *, 0 AS is_survey_end FROM {_sql_name(source_view)}
+        UNION ALL BY NAME
+        SELECT * REPLACE ('SURVEY-END' AS pageTitle, 'PageIN' AS eventPage, SurveyTimestamp AS eventTimestamp, 'SURVEY-END_PageIN_0' AS eventPara), 1 AS is_survey_end
+        FROM {_sql_name(source_view)}
+        WHERE SurveyTimestamp IS NOT NULL
+        QUALIFY row_number() OVER (PARTITION BY sessionID ORDER BY {order}) = 1
+    """)
+
+def duckdb_set_integer_columns(con, view_name: str, source_view: str, col_list: list) -> None:
+    """
+    Creates a view with the columns in col_list converted to integers (empty or non-numeric values set to 0).
+
+    Parameters:
+        con (duckdb.DuckDBPyConnection): The connection.
+        view_name (str): The name of the view.
+        source_view (str): The name of the source view.
+        col_list (list): The columns to convert.
+
+    Returns:
+        None
+    """
+    replace_list = [f"coalesce(CAST(trunc(TRY_CAST({_sql_name(col)} AS DOUBLE)) AS BIGINT), 0) AS {_sql_name(col)}" for col in col_list]
+    con.execute(f"""
+        CREATE OR REPLACE VIEW {_sql_name(view_name)} AS
+        SELECT * REPLACE ({", ".join(replace_list)})
+        FROM {_sql_name(source_view)}
+    """)
+
+def duckdb_materialize(con, table_name: str, source_view: str, order_columns: list) -> int:
+    """
+    Executes the query plan of a view and saves its result in a table of the database (on disk), adding the position of each row in the order of order_columns ('event_order').
+    The following steps (total times, stats, terciles, saving) read the table instead of executing the plan again.
+
+    Parameters:
+        con (duckdb.DuckDBPyConnection): The connection.
+        table_name (str): The name of the table.
+        source_view (str): The name of the view.
+        order_columns (list): The columns giving the order of the rows.
+
+    Returns:
+        int: The number of rows of the table.
+    """
+    order = ", ".join(_sql_name(col) for col in order_columns)
+    con.execute(f"""
+        CREATE OR REPLACE TABLE {_sql_name(table_name)} AS
+        SELECT *, row_number() OVER (ORDER BY {order}) AS event_order
+        FROM {_sql_name(source_view)}
+    """)
+
+    return con.sql(f"SELECT count(*) FROM {_sql_name(table_name)}").fetchone()[0]
+
+def duckdb_add_total_time(con, view_name: str, source_view: str, key_col: str, timestamp_col: str) -> pd.DataFrame:
+    """
+    Computes the total time and the length of each case (as calculate_total_time) and creates a view attaching them to the events.
+    The per-case table is small, so it is computed once and returned.
+
+    Parameters:
+        con (duckdb.DuckDBPyConnection): The connection.
+        view_name (str): The name of the view.
+        source_view (str): The name of the view with the events.
+        key_col (str): Name of the key column (case-id).
+        timestamp_col (str): Name of the timestamp column.
+
+    Returns:
+        pd.DataFrame: A DataFrame with columns key_col, 'TotalTimeHH', 'TotalTimeMM', 'TotalTimeDD', 'CaseLength', sorted by all its columns.
+    """
+    total_time_table = f"{view_name}_total_time"
+    # round_even rounds half to even, as pandas
+    con.execute(f"""
+        CREATE OR REPLACE TABLE {_sql_name(total_time_table)} AS
+        SELECT {_sql_name(key_col)},
+            round_even(epoch(max({_sql_name(timestamp_col)}) - min({_sql_name(timestamp_col)})) / 3600, 2) AS TotalTimeHH,
+            round_even(epoch(max({_sql_name(timestamp_col)}) - min({_sql_name(timestamp_col)})) / 60, 2) AS TotalTimeMM,
+            round_even(epoch(max({_sql_name(timestamp_col)}) - min({_sql_name(timestamp_col)})) / 86400, 2) AS TotalTimeDD,
+            count(*) AS CaseLength
+        FROM {_sql_name(source_view)}
+        GROUP BY {_sql_name(key_col)}
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE VIEW {_sql_name(view_name)} AS
+        SELECT e.*, t.* EXCLUDE ({_sql_name(key_col)})
+        FROM {_sql_name(source_view)} e
+        LEFT JOIN {_sql_name(total_time_table)} t ON e.{_sql_name(key_col)} = t.{_sql_name(key_col)}
+    """)
+
+    return con.sql(f"SELECT * FROM {_sql_name(total_time_table)} ORDER BY TotalTimeHH, TotalTimeMM, TotalTimeDD, CaseLength, {_sql_name(key_col)}").df()
+
+def duckdb_add_class(con, view_name: str, source_view: str, timestamp_col: str, criteria: list) -> None:
+    """
+    Creates a view with the 'Class' column assigned from the timestamp of each event (as add_class, 'NA' if no criterion matches).
+
+    Parameters:
+        con (duckdb.DuckDBPyConnection): The connection.
+        view_name (str): The name of the view.
+        source_view (str): The name of the source view.
+        timestamp_col (str): Name of the timestamp column.
+        criteria (list): A list of dictionaries containing 'date', 'start_time', 'end_time', and 'class'.
+
+    Returns:
+        None
+    """
+    ts = _sql_name(timestamp_col)
+    cases = " ".join(
+        f"WHEN CAST({ts} AS DATE) = DATE {_sql_value(criterion['date'])} AND CAST({ts} AS TIME) BETWEEN TIME {_sql_value(criterion['start_time'])} AND TIME {_sql_value(criterion['end_time'])} THEN {_sql_value(criterion['class'])}"
+        for criterion in criteria)
+    con.execute(f"""
+        CREATE OR REPLACE VIEW {_sql_name(view_name)} AS
+        SELECT *, CASE {cases} ELSE 'NA' END AS Class
+        FROM {_sql_name(source_view)}
+    """)
+
+def duckdb_label_terciles(con, source_view: str, session_column: str, value_column: str, order_column: str = "event_order") -> str:
+    """
+    Computes the terciles of value_column over the distinct (session, value) pairs (as label_terciles_by_session) and saves them in a table.
+    The pairs are few (one or a few per session), so the terciles are computed with pandas.qcut, giving the same bins.
+
+    Parameters:
+        con (duckdb.DuckDBPyConnection): The connection.
+        source_view (str): The name of the view with the events.
+        session_column (str): The column representing session IDs (grouping key).
+        value_column (str): The column containing the values to be split into terciles.
+        order_column (str): The column with the position of the events (order of the pairs of sessions with more values). Defaults to 'event_order'.
+
+    Returns:
+        str: The name of the table with the columns session_column, '<value_column>_Tercile' and 'tercile_order'.
+    """
+    col_tercile = f"{value_column}_Tercile"
+    df_unique_non_nan = con.sql(f"""
+        SELECT {_sql_name(session_column)}, {_sql_name(value_column)}, min({_sql_name(order_column)}) AS tercile_order
+        FROM {_sql_name(source_view)}
+        WHERE {_sql_name(value_column)} IS NOT NULL
+        GROUP BY ALL
+    """).df()
+
+    df_unique_non_nan[col_tercile] = pd.qcut(df_unique_non_nan[value_column], q=3, labels=[1, 2, 3], duplicates='drop').astype(int)
+    df_terciles = df_unique_non_nan[[session_column, col_tercile, "tercile_order"]]
+
+    table_name = f"{source_view}_{col_tercile}"
+    con.register("df_terciles", df_terciles)
+    con.execute(f"CREATE OR REPLACE TABLE {_sql_name(table_name)} AS SELECT * FROM df_terciles")
+    con.unregister("df_terciles")
+
+    num_empty = con.sql(f"""
+        SELECT count(DISTINCT {_sql_name(session_column)}) FROM {_sql_name(source_view)}
+        WHERE {_sql_name(session_column)} NOT IN (SELECT {_sql_name(session_column)} FROM {_sql_name(table_name)})
+    """).fetchone()[0]
+    print(f"Number of sessions without '{col_tercile}':", num_empty)
+
+    return table_name
+
+def duckdb_save_event_log(con, source_view: str, path_out: str, columns: list, tercile_tables: dict, session_column: str = "sessionID", order_column: str = "event_order", csv_sep: str = ";") -> pd.Series:
+    """
+    Saves the event log to a CSV file (written to '<path_out>.part' and renamed on completion): distinct rows (as drop_duplicates), sorted by order_column (the rows of a session must be consecutive), with the tercile columns.
+
+    Parameters:
+        con (duckdb.DuckDBPyConnection): The connection.
+        source_view (str): The name of the view with the events.
+        path_out (str): The path of the output file.
+        columns (list): The output columns, as a list of (column of the view, output name) pairs in the order of the file (a column can be saved with more names).
+        tercile_tables (dict): A dictionary with the tercile column as key and the table with its values as value (see duckdb_label_terciles).
+        session_column (str): The column representing session IDs. Defaults to 'sessionID'.
+        order_column (str): The column with the position of the events (see duckdb_materialize). Defaults to 'event_order'.
+        csv_sep (str): The delimiter of the CSV file. Defaults to ';'.
+
+    Returns:
+        pd.Series: The number of rows of each case, in the order of the file (see log_build_index).
+    """
+    cols = ", ".join(_sql_name(col) for col in dict.fromkeys(col for col, _ in columns))
+    distinct_events = f"""
+        SELECT * FROM {_sql_name(source_view)}
+        QUALIFY row_number() OVER (PARTITION BY {cols} ORDER BY {_sql_name(order_column)}) = 1
+    """
+
+    select_list = [f"e.{_sql_name(col)} AS {_sql_name(name)}" for col, name in columns]
+    join_list = []
+    tercile_order = []
+    for i, (col_tercile, table_name) in enumerate(tercile_tables.items()):
+        alias = f"t{i}"
+        select_list.append(f"coalesce({alias}.{_sql_name(col_tercile)}, 0) AS {_sql_name(col_tercile)}")
+        join_list.append(f"LEFT JOIN {_sql_name(table_name)} {alias} ON e.{_sql_name(session_column)} = {alias}.{_sql_name(session_column)}")
+        tercile_order.append(f"{alias}.tercile_order")
+    order_list = [f"e.{_sql_name(order_column)}"] + tercile_order
+
+    path_part = Path(path_out).with_name(Path(path_out).name + ".part").as_posix()
+    con.execute(f"""
+        COPY (
+            SELECT {", ".join(select_list)}
+            FROM ({distinct_events}) e
+            {" ".join(join_list)}
+            ORDER BY {", ".join(order_list)}
+        ) TO {_sql_value(path_part)} (HEADER, DELIMITER {_sql_value(csv_sep)})
+    """)
+
+    id_name = dict(columns)[session_column]
+    df_case_rows = con.sql(f"""
+        SELECT {_sql_name(id_name)}, count(*) AS n FROM read_csv({_sql_value(path_part)}, delim = {_sql_value(csv_sep)}, header = true, all_varchar = true)
+        GROUP BY ALL ORDER BY {_sql_name(id_name)}
+    """).df()
+
+    os.replace(path_part, path_out)
+
+    return df_case_rows.set_index(id_name)["n"]
@@ -0,0 +1,186 @@
+# log_features.py
+import numpy as np
+import pandas as pd
+
+from profiling import profiled
+from utilities import df_sort_values_once
+
+# Columns of the session feature matrix (see session_feature_matrix): the schema is fixed, so the matrices of repeated exports can be concatenated
+session_case_columns = ['QuizSessionCount', 'QuizAnswerCorrectTotal', 'QuizAnswerWrongTotal', 'QuizAnswerCorrectRatioOverCount', 'QuizAnswerCorrectRatioOverAll',
+                        'QuizSessionCount_P3', 'QuizAnswerCorrectTotal_P3', 'QuizAnswerWrongTotal_P3', 'QuizAnswerCorrectRatioOverCount_P3', 'QuizAnswerCorrectRatioOverAll_P3',
+                        'SUS', 'Apprendimento percepito', 'UEQ - Pragmatic', 'UEQ - Hedonic', 'UEQ - Overall', 'TotalTimeMM'] # case attributes (value of the first event of the case)
+session_sum_columns = {'CLICK_total': 'click_num', 'DBCLICK_total': 'dbclick_num'} # event counts summed over the case
+session_log_columns = ['Events', 'Forward_Jumps', 'Backward_Jumps', 'CC', 'A_Time_mean', 'A_Time_std', 'A_Time_CV'] # computed from the events
+session_feature_columns = session_case_columns + list(session_sum_columns) + session_log_columns
+
+@profiled
+def calculate_activity_times(df: pd.DataFrame, id_column: str, timestamp_column: str) -> pd.DataFrame:
+    """
+    Calculates the duration of each activity as the time until the next activity of the same case (0 for the last activity of each case).
+    No columns are added to the event log.
+
+    Parameters:
+        df (pd.DataFrame): The event log, sorted by id_column and timestamp_column.
+        id_column (str): The name of the case column.
+        timestamp_column (str): The name of the timestamp column (datetime).
+
+    Returns:
+        pd.DataFrame: A DataFrame with the same index as df and the columns 'A_Time_s' (seconds) and 'A_Time_m' (minutes), rounded to 2 decimal places.
+    """
+    # Timestamp of the next activity within each case
+    next_timestamps = df[timestamp_column].groupby(df[id_column], sort=False).shift(-1)
+    time_s = (next_timestamps - df[timestamp_column]).dt.total_seconds()
+
+    df_times = pd.DataFrame({
+        'A_Time_s': time_s.fillna(0).round(2),
+        'A_Time_m': (time_s / 60).fillna(0).round(2)
+    }, index=df.index)
+
+    return df_times
+
+@profiled
+def calculate_activity_time_stats(df: pd.DataFrame, id_column: str, time_column: str, activity_column: str = None, subsets: dict = None, subset_column: str = None) -> pd.DataFrame:
+    """
+    Calculates mean, median, standard deviation and Coefficient of Variation (CV = STD / Mean) of the activity durations of each case, for several subsets of activities in one grouped pass.
+    The subsets are either lists of activities (e.g. quiz pages, content pages) or the values of a column (e.g. 'menu').
+
+    Parameters:
+        df (pd.DataFrame): The event log with the activity durations (see calculate_activity_times).
+        id_column (str): The name of the case column.
+        time_column (str): The name of the activity duration column (e.g. 'A_Time_s').
+        activity_column (str): The name of the activity column (used with subsets).
+        subsets (dict): A dictionary with the subset name as key and the list of its activities as value (an activity can be in more subsets).
+        subset_column (str): The name of a column whose values are used as subsets (used when subsets is None).
+
+    Returns:
+        pd.DataFrame: A DataFrame with columns id_column, 'Subset', 'Mean', 'Median', 'STD', 'CV' (CV is empty when the mean is 0).
+    """
+    if subsets is not None:
+        # Map each activity to its subsets (inner join: activities outside every subset are dropped)
+        df_subsets = pd.DataFrame([(activity, name) for name, activities in subsets.items() for activity in activities], columns=[activity_column, 'Subset'])
+        df_times = df[[id_column, activity_column, time_column]].merge(df_subsets, on=activity_column, how='inner')
+    elif subset_column is not None:
+        df_times = df[[id_column, subset_column, time_column]].rename(columns={subset_column: 'Subset'})
+    else:
+        raise ValueError("Either subsets or subset_column must be specified")
+
+    df_stats = df_times.groupby([id_column, 'Subset'])[time_column].agg(
+        Mean='mean',
+        Median='median',
+        STD='std'
+    ).reset_index()
+
+    df_stats['CV'] = (df_stats['STD'] / df_stats['Mean']).where(df_stats['Mean'] != 0)
+
+    return df_stats
+
+def vocabulary_extend(vocabulary: list, tokens) -> list:
+    """
+    Extends a vocabulary (activities or bigrams) with the new tokens, appended in sorted order: the position of the known tokens never changes,
+    so the columns of the sparse matrices of an older export are the first columns of a newer one.
+
+    Parameters:
+        vocabulary (list): The known tokens, in order of column.
+        tokens: The tokens of the new export.
+
+    Returns:
+        list: The extended vocabulary.
+    """
+    known = set(vocabulary)
+
+    return list(vocabulary) + sorted({token for token in tokens if token not in known})
+
+@profiled
+def session_feature_matrix(df: pd.DataFrame, id_column: str, activity_column: str, timestamp_column: str, vocabulary: dict = None,
+                           case_columns: list = None, sum_columns: dict = None) -> tuple:
+    """
+    Builds one feature vector per session (case) of an event log, in one vectorized pass over the events sorted by case and timestamp:
+    the case attributes (quiz ratios, SUS / UEQ scores, total time), the click counts, the number of events, the forward and backward jumps (as count_jumps),
+    the cyclomatic complexity of the DFG of the case (as the CC of the variants of 08_log_analysis.ipynb) and the mean, STD and CV of the activity times (as calculate_activity_times).
+    It also builds the sparse matrices of the activity counts and of the bigram counts (directly-follows pairs) of each case, over a vocabulary extended append-only (see vocabulary_extend).
+
+    Parameters:
+        df (pd.DataFrame): The event log (sorted by case and timestamp if it is not).
+        id_column (str): The name of the case column.
+        activity_column (str): The name of the activity column.
+        timestamp_column (str): The name of the timestamp column (datetime).
+        vocabulary (dict): The vocabulary of a previous export: {'activity': [...], 'bigram': [...]} (bigrams as 'A > B'). Defaults to None (empty).
+        case_columns (list): The case attributes (the missing ones are empty). Defaults to session_case_columns.
+        sum_columns (dict): The event counts summed over the case (feature -> column of the log). Defaults to session_sum_columns.
+
+    Returns:
+        pd.DataFrame: The dense features (float64, one row per case indexed by case id, in order of case id; columns session_feature_columns with the defaults).
+        scipy.sparse.csr_matrix: The activity counts of each case (columns: vocabulary['activity']).
+        scipy.sparse.csr_matrix: The bigram counts of each case (columns: vocabulary['bigram']).
+        dict: The extended vocabulary.
+    """
+    try:
+        from scipy import sparse
+    except ImportError as e:
+        raise ImportError("The sparse matrices of the features require the scipy package (pip install scipy)") from e
+    case_columns = session_case_columns if case_columns is None else case_columns
+    sum_columns = session_sum_columns if sum_columns is None else sum_columns
+    vocabulary = {"activity": [], "bigram": []} if vocabulary is None else vocabulary
+
+    df = df_sort_values_once(df, [id_column, timestamp_column])
+    case_codes, case_ids = pd.factorize(df[id_column], sort=False) # consecutive codes: the log is sorted by case
+    n_cases = len(case_ids)
+    n_events = np.bincount(case_codes, minlength=n_cases)
+    starts = np.cumsum(n_events) - n_events
+
+    # Activities and bigrams, coded on the extended vocabulary
+    activity_labels = df[activity_column].astype(str).to_numpy()
+    activities = vocabulary_extend(vocabulary["activity"], pd.unique(activity_labels))
+    activity_codes = pd.Index(activities).get_indexer(activity_labels)
+    same_case = case_codes[1:] == case_codes[:-1] # transitions i -> i + 1 within a case
+    transitions = np.flatnonzero(same_case)
+    bigram_labels = pd.Series(activity_labels[transitions]) + " > " + pd.Series(activity_labels[transitions + 1])
+    bigrams = vocabulary_extend(vocabulary["bigram"], bigram_labels.unique())
+    bigram_codes = pd.Index(bigrams).get_indexer(bigram_labels)
+    transition_cases = case_codes[transitions]
+
+    activity_counts = sparse.csr_matrix((np.ones(len(df), dtype=np.int64), (case_codes, activity_codes)), shape=(n_cases, len(activities)))
+    bigram_counts = sparse.csr_matrix((np.ones(len(transitions), dtype=np.int64), (transition_cases, bigram_codes)), shape=(n_cases, len(bigrams)))
+
+    features = {}
+    # Case attributes (first event of each case) and event counts summed over the case
+    missing = [col for col in case_columns + list(sum_columns.values()) if col not in df.columns]
+    if missing:
+        print("Feature columns not in the event log (empty):", missing)
+    for col in case_columns:
+        features[col] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64)[starts] if col in df.columns else np.full(n_cases, np.nan)
+    for feature, col in sum_columns.items():
+        values = pd.to_numeric(df[col], errors="coerce").fillna(0).to_numpy(dtype=np.float64) if col in df.columns else np.zeros(len(df))
+        features[feature] = np.bincount(case_codes, weights=values, minlength=n_cases)
+    features['Events'] = n_events.astype(np.float64)
+
+    # Jumps: a forward jump is a transition already seen in the case, a backward jump is a transition whose reverse was already seen (the transition itself included)
+    n_bigrams = max(len(bigrams), 1)
+    reverse_codes = pd.Index(bigrams).get_indexer(pd.Series(activity_labels[transitions + 1]) + " > " + pd.Series(activity_labels[transitions]))
+    keys = transition_cases.astype(np.int64) * n_bigrams + bigram_codes
+    unique_keys, first_positions = np.unique(keys, return_index=True) # first transition of each bigram of each case
+    features['Forward_Jumps'] = np.bincount(transition_cases, minlength=n_cases) - np.bincount(unique_keys // n_bigrams, minlength=n_cases)
+    reverse_keys = transition_cases.astype(np.int64) * n_bigrams + reverse_codes
+    lookup = np.minimum(np.searchsorted(unique_keys, reverse_keys), max(len(unique_keys) - 1, 0))
+    backward = (reverse_codes >= 0) & (unique_keys[lookup] == reverse_keys) & (first_positions[lookup] <= np.arange(len(transitions))) if len(transitions) else np.zeros(0, dtype=bool)
+    features['Backward_Jumps'] = np.bincount(transition_cases, weights=backward, minlength=n_cases)
+
+    # Cyclomatic complexity of the DFG of each case: distinct edges - nodes of the edges + 2 (the nodes are all the activities of a case with a transition)
+    distinct_edges = np.diff(bigram_counts.indptr)
+    distinct_activities = np.diff(activity_counts.indptr)
+    features['CC'] = (distinct_edges - np.where(n_events > 1, distinct_activities, 0) + 2).astype(np.float64)
+
+    # Activity times: time until the next event of the case (0 for the last one), in seconds rounded to 2 decimal places
+    timestamps = df[timestamp_column].to_numpy().astype("datetime64[ns]").view(np.int64)
+    times = np.zeros(len(df))
+    times[transitions] = np.round((timestamps[transitions + 1] - timestamps[transitions]) / 1e9, 2)
+    time_mean = np.bincount(case_codes, weights=times, minlength=n_cases) / np.maximum(n_events, 1)
+    time_var = np.bincount(case_codes, weights=(times - time_mean[case_codes]) ** 2, minlength=n_cases) / np.where(n_events > 1, n_events - 1, np.nan)
+    features['A_Time_mean'] = time_mean
+    features['A_Time_std'] = np.sqrt(time_var)
+    features['A_Time_CV'] = np.where(time_mean != 0, features['A_Time_std'] / np.where(time_mean != 0, time_mean, 1), np.nan)
+
+    df_features = pd.DataFrame(features, index=pd.Index(case_ids, name=id_column)).astype(np.float64)
+    print(f"Feature matrix: {n_cases} cases, {len(df_features.columns)} features, {len(activities)} activities, {len(bigrams)} bigrams")
+
+    return df_features, activity_counts, bigram_counts, {"activity": activities, "bigram": bigrams}
@@ -0,0 +1,278 @@
+# log_index.py
+from contextlib import ExitStack
+from pathlib import Path
+import io
+import mmap
+import numpy as np
+import pandas as pd
+
+from log_writer import atomic_output, output_path
+
+def log_index_path(path_log: str) -> Path:
+    """
+    Returns the path of the index file of an event log (e.g. 'edu_event_log_PARA_raw_ter.csv.idx').
+
+    Parameters:
+        path_log (str): The path of the event log (CSV).
+
+    Returns:
+        Path: The path of the index file.
+    """
+    path_log = Path(path_log)
+    return path_log.with_name(f"{path_log.name}.idx")
+
+def _csv_record_offsets(mm: mmap.mmap, chunk_size: int = 64 * 1024 * 1024) -> tuple:
+    """
+    Finds the byte offsets of the records (header included) of a CSV file, ignoring the line breaks inside quoted values.
+    The file is scanned in chunks, so the memory used does not depend on the size of the file.
+
+    Parameters:
+        mm (mmap.mmap): The memory map of the CSV file.
+        chunk_size (int): The number of bytes scanned at a time. Defaults to 64 MB.
+
+    Returns:
+        tuple: Two arrays with the start offset (inclusive) and the end offset (exclusive) of each record.
+    """
+    size = len(mm)
+    ends_list = []
+    quotes_before = 0
+    for chunk_start in range(0, size, chunk_size):
+        buf = np.frombuffer(mm, dtype=np.uint8, count=min(chunk_size, size - chunk_start), offset=chunk_start)
+        newlines = np.flatnonzero(buf == ord("\n"))
+        quotes = np.flatnonzero(buf == ord('"'))
+        # A line break ends a record only if it is preceded by an even number of quotes
+        ends_list.append(newlines[(np.searchsorted(quotes, newlines) + quotes_before) % 2 == 0] + chunk_start + 1)
+        quotes_before += len(quotes)
+        del buf # release the buffer before closing the memory map
+
+    record_ends = np.concatenate(ends_list) if ends_list else np.array([], dtype=np.int64)
+    if size > 0 and mm[size - 1] != ord("\n"):
+        record_ends = np.append(record_ends, size)
+    record_starts = np.concatenate(([0], record_ends[:-1]))
+
+    return record_starts, record_ends
+
+def log_build_index(path_log: str, case_ids: pd.Series = None, id_column: str = "Case ID", csv_sep: str = ";", case_rows: pd.Series = None) -> pd.DataFrame:
+    """
+    Builds and saves the index of an event log sorted by case: for each case the range of rows and the range of bytes in the CSV file.
+    The index is saved next to the event log (see log_index_path).
+
+    Parameters:
+        path_log (str): The path of the event log (CSV), with the events of each case in consecutive rows.
+        case_ids (pd.Series): The case of each row, in the same order as the file (e.g. the id column of the DataFrame just saved); if None, it is read from the file.
+        id_column (str): The name of the case column. Defaults to 'Case ID'.
+        csv_sep (str): The delimiter of the CSV file. Defaults to ';'.
+        case_rows (pd.Series): The number of rows of each case (indexed by case), in the order of the file; used instead of case_ids when the log is too big to keep its ids in memory.
+
+    Returns:
+        pd.DataFrame: The index with columns id_column, 'row_start', 'row_end', 'byte_start', 'byte_end' (end values are exclusive).
+    """
+    if case_rows is not None:
+        # Row ranges of each case from the number of rows
+        case_ends = np.cumsum(case_rows.to_numpy(dtype=np.int64))
+        case_starts = case_ends - case_rows.to_numpy(dtype=np.int64)
+        case_list = case_rows.index.to_numpy()
+        n_rows = int(case_ends[-1]) if len(case_ends) > 0 else 0
+    else:
+        if case_ids is None:
+            case_ids = pd.read_csv(path_log, sep=csv_sep, usecols=[id_column], dtype={id_column: object})[id_column]
+        case_ids = case_ids.reset_index(drop=True)
+
+        # Row ranges of each case (the cases must be in consecutive rows)
+        case_starts = np.flatnonzero(case_ids.ne(case_ids.shift()).to_numpy())
+        case_ends = np.append(case_starts[1:], len(case_ids))
+        if len(case_starts) != case_ids.nunique():
+            raise ValueError(f"The event log {path_log} is not sorted by case")
+        case_list = case_ids.iloc[case_starts].to_numpy()
+        n_rows = len(case_ids)
+
+    with open(path_log, "rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        record_starts, record_ends = _csv_record_offsets(mm)
+
+    if len(record_starts) != n_rows + 1:
+        raise ValueError(f"The event log {path_log} has {len(record_starts) - 1} rows, expected {n_rows}")
+
+    # Record 0 is the header
+    df_index = pd.DataFrame({
+        id_column: case_list,
+        'row_start': case_starts,
+        'row_end': case_ends,
+        'byte_start': record_starts[case_starts + 1],
+        'byte_end': record_ends[case_ends],
+    })
+
+    path_index = log_index_path(path_log)
+    df_index.to_csv(path_index, sep=";", index=False)
+    print(f"Index of {len(df_index)} cases saved at: {path_index}")
+
+    return df_index
+
+def log_read_index(path_log: str) -> pd.DataFrame:
+    """
+    Reads the index of an event log built by log_build_index.
+
+    Parameters:
+        path_log (str): The path of the event log (CSV).
+
+    Returns:
+        pd.DataFrame: The index of the event log.
+    """
+    return pd.read_csv(log_index_path(path_log), sep=";", converters={0: str})
+
+def _log_cases_chunks(mm: mmap.mmap, df_index: pd.DataFrame, case_list: list, exclude: bool = False) -> tuple:
+    """
+    Reads the CSV header and the rows of the cases in case_list (or of the other cases) from the memory map of an event log, one case at a time.
+
+    Parameters:
+        mm (mmap.mmap): The memory map of the event log.
+        df_index (pd.DataFrame): The index of the event log.
+        case_list (list): The list of case ids.
+        exclude (bool): If True, the rows of the cases not in case_list are read. Defaults to False.
+
+    Returns:
+        tuple: A generator of the bytes of the CSV (header first) and the number of cases read.
+    """
+    in_list = df_index.iloc[:, 0].isin(case_list)
+    df_sel = df_index[~in_list] if exclude else df_index[in_list]
+    header_end = int(df_index['byte_start'].min()) if len(df_index) > 0 else len(mm)
+
+    ranges = [(0, header_end)] + list(zip(df_sel['byte_start'], df_sel['byte_end']))
+    chunks = (mm[byte_start:byte_end] for byte_start, byte_end in ranges)
+
+    return chunks, len(df_sel)
+
+def log_read_cases(path_log: str, case_list: list, csv_sep: str = ";", **read_csv_kwargs) -> pd.DataFrame:
+    """
+    Reads only the events of the cases in case_list from an indexed event log, through a memory map of the file.
+
+    Parameters:
+        path_log (str): The path of the event log (CSV) with its index.
+        case_list (list): The list of case ids to read.
+        csv_sep (str): The delimiter of the CSV file. Defaults to ';'.
+        **read_csv_kwargs: Other arguments passed to pd.read_csv (e.g. dtype).
+
+    Returns:
+        pd.DataFrame: The events of the cases, in the order of the event log.
+    """
+    df_index = log_read_index(path_log)
+
+    with open(path_log, "rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        chunks, _ = _log_cases_chunks(mm, df_index, case_list)
+        data = b"".join(chunks)
+
+    return pd.read_csv(io.BytesIO(data), sep=csv_sep, **read_csv_kwargs)
+
+def log_read_case_filters(filter_files: dict, id_column: str = "Case ID") -> dict:
+    """
+    Reads one or more case filters (e.g. the cases exported by DISCO) and builds for each one a hashed index of its case ids, used by log_split_cases_multi.
+    A missing file gives an empty filter (all the cases are excluded).
+
+    Parameters:
+        filter_files (dict): A dictionary with the name of the filter as key and the path of its CSV file (with the id_column) as value.
+        id_column (str): The name of the case column. Defaults to 'Case ID'.
+
+    Returns:
+        dict: A dictionary with the name of the filter as key and the index of its case ids as value.
+    """
+    case_filters = {}
+    for name, path_filter in filter_files.items():
+        if Path(path_filter).exists():
+            print(f"Reading case filter '{name}':", path_filter)
+            case_ids = pd.read_csv(path_filter, usecols=[id_column], dtype={id_column: object})[id_column].dropna().unique()
+        else:
+            print(f"Case filter '{name}' not found:", path_filter)
+            case_ids = []
+        case_filters[name] = pd.Index(case_ids)
+        print(f"Cases in filter '{name}':", len(case_filters[name]))
+
+    return case_filters
+
+def _write_chunks(view: memoryview, start: int, end: int, outputs: list, chunk_size: int) -> None:
+    """
+    Writes a range of bytes of a memory map to some files, in chunks of chunk_size bytes (views of the memory map, so no chunk is copied to a bytes object).
+
+    Parameters:
+        view (memoryview): The view of the memory map.
+        start (int): The first byte of the range.
+        end (int): The byte after the range.
+        outputs (list): The files (opened in binary mode) to write the range to.
+        chunk_size (int): The size in bytes of the chunks.
+
+    Returns:
+        None
+    """
+    for chunk_start in range(start, end, chunk_size):
+        chunk = view[chunk_start:min(chunk_start + chunk_size, end)]
+        for fp in outputs:
+            fp.write(chunk)
+        chunk.release()
+
+def log_split_cases_multi(path_log: str, case_filters: dict, output_paths: dict, compression: str = None, chunk_size: int = 4 * 1024 * 1024) -> pd.DataFrame:
+    """
+    Splits an indexed event log by one or more case filters, each in two CSV files with the events of the cases in the filter and with the events of the other cases.
+    The membership of the cases is computed once for all the filters, then the log is read in a single pass: consecutive cases with the same membership are copied as one block
+    from the memory map of the event log to the output files, without parsing it, in chunks of chunk_size bytes (views of the memory map, not copies),
+    so the memory used does not depend on the size of the blocks.
+    The output files are written atomically (see atomic_output).
+
+    Parameters:
+        path_log (str): The path of the event log (CSV) with its index.
+        case_filters (dict): A dictionary with the name of the filter as key and the case ids to include as value (see log_read_case_filters).
+        output_paths (dict): A dictionary with the name of the filter as key and the paths of the output files (included, excluded) as value.
+        compression (str): The compression of the output files: None, 'gzip' or 'zstd' (the suffix is added to the paths). Defaults to None.
+        chunk_size (int): The size in bytes of the chunks copied to the output files. Defaults to 4 MB.
+
+    Returns:
+        pd.DataFrame: A DataFrame with columns 'filter', 'cases_included', 'cases_excluded', 'path_included', 'path_excluded'.
+    """
+    df_index = log_read_index(path_log)
+    case_ids = df_index.iloc[:, 0]
+    filter_names = list(case_filters)
+
+    # Membership of each case in each filter (cases x filters)
+    membership = np.column_stack([case_ids.isin(case_filters[name]).to_numpy() for name in filter_names]) if filter_names else np.zeros((len(df_index), 0), dtype=bool)
+
+    # Blocks of consecutive cases with the same membership
+    changes = np.flatnonzero((membership[1:] != membership[:-1]).any(axis=1)) + 1
+    block_starts = np.concatenate(([0], changes)) if len(df_index) > 0 else np.array([], dtype=np.int64)
+    block_ends = np.append(block_starts[1:], len(df_index)).astype(np.int64) if len(df_index) > 0 else block_starts
+    byte_starts = df_index['byte_start'].to_numpy()
+    byte_ends = df_index['byte_end'].to_numpy()
+
+    with open(path_log, "rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm, ExitStack() as stack:
+        files = {name: [stack.enter_context(atomic_output(output_path(path_out, compression), compression)) for path_out in output_paths[name]] for name in filter_names}
+        with memoryview(mm) as view:
+            header_end = int(byte_starts[0]) if len(df_index) > 0 else len(mm)
+            for fp_included, fp_excluded in files.values():
+                _write_chunks(view, 0, header_end, [fp_included, fp_excluded], chunk_size)
+
+            for block_start, block_end in zip(block_starts, block_ends):
+                outputs = [files[name][0 if membership[block_start, j] else 1] for j, name in enumerate(filter_names)]
+                _write_chunks(view, int(byte_starts[block_start]), int(byte_ends[block_end - 1]), outputs, chunk_size)
+
+    df_counts = pd.DataFrame({
+        'filter': filter_names,
+        'cases_included': membership.sum(axis=0),
+    })
+    df_counts['cases_excluded'] = len(df_index) - df_counts['cases_included']
+    df_counts['path_included'] = [output_path(output_paths[name][0], compression) for name in filter_names]
+    df_counts['path_excluded'] = [output_path(output_paths[name][1], compression) for name in filter_names]
+
+    return df_counts
+
+def log_split_cases(path_log: str, case_list: list, path_included: str, path_excluded: str) -> tuple:
+    """
+    Splits an indexed event log in two CSV files, with the events of the cases in case_list and with the events of the other cases (see log_split_cases_multi).
+
+    Parameters:
+        path_log (str): The path of the event log (CSV) with its index.
+        case_list (list): The list of case ids to include.
+        path_included (str): The path of the output file with the included cases.
+        path_excluded (str): The path of the output file with the excluded cases.
+
+    Returns:
+        tuple: The number of included cases and the number of excluded cases.
+    """
+    df_counts = log_split_cases_multi(path_log, {"cases": pd.Index(case_list)}, {"cases": (path_included, path_excluded)})
+
+    return int(df_counts.loc[0, 'cases_included']), int(df_counts.loc[0, 'cases_excluded'])
@@ -0,0 +1,103 @@
+# log_live.py
+from collections import Counter
+import pandas as pd
+
+def live_activities(df_events: pd.DataFrame, level: str, click_event_list: list) -> pd.Series:
+    """
+    Returns the activity of each raw event (translated, see df_translate_columns) at PAGE or PARA level, as defined by 03_csv_to_log.py:
+    at PAGE level the 'pageTitle' of the 'PageIN' events, at PARA level 'pageTitle'_'event'_'pagePara' of the events that are not clicks.
+    The clicks (counted in the event logs, not activities) and the other events of the PAGE level have no activity.
+
+    Parameters:
+        df_events (pd.DataFrame): The raw events with the columns 'pageTitle', 'event' and 'pagePara'.
+        level (str): PAGE or PARA.
+        click_event_list (list): The click events (e.g. ['CLICK', 'DBCLICK']).
+
+    Returns:
+        pd.Series: The activity of each event (NA for the events without activity), with the index of df_events.
+    """
+    events = df_events['event'].astype(object)
+    if level == "PAGE":
+        return df_events['pageTitle'].astype(object).where(events == 'PageIN')
+    if level == "PARA":
+        activities = df_events['pageTitle'].astype(object) + '_' + events + '_' + df_events['pagePara'].astype(str)
+        return activities.where(~events.isin(click_event_list))
+    raise ValueError(f"Unknown level: {level} (PAGE or PARA)")
+
+class IncrementalDFG:
+    """
+    Directly-Follows Graph (DFG) maintained while the events are appended (e.g. during a class): for each case the last activity is kept,
+    so each event adds at most one edge in O(1). The edge frequencies and the cyclomatic complexity are available at any time, without rebuilding the event log.
+    The events of each case must be appended in order of time.
+    """
+
+    def __init__(self):
+        self.last_activity = {} # case id -> last activity of the open cases
+        self.edges = Counter() # (activity1, activity2) -> frequency
+        self.nodes = Counter() # activity -> number of edges with the activity as source or target
+        self.n_events = 0
+        self.n_cases = 0
+
+    def append(self, case_id, activity) -> None:
+        """
+        Appends an event to the DFG.
+
+        Parameters:
+            case_id: The case of the event.
+            activity: The activity of the event.
+
+        Returns:
+            None
+        """
+        last = self.last_activity.get(case_id)
+        if last is None:
+            self.n_cases += 1
+        else:
+            edge = (last, activity)
+            if self.edges[edge] == 0:
+                self.nodes[last] += 1
+                self.nodes[activity] += 1
+            self.edges[edge] += 1
+        self.last_activity[case_id] = activity
+        self.n_events += 1
+
+    def end_case(self, case_id) -> None:
+        """
+        Removes the state of a completed case (its edges stay in the DFG); a later event of the case starts a new trace.
+
+        Parameters:
+            case_id: The completed case.
+
+        Returns:
+            None
+        """
+        self.last_activity.pop(case_id, None)
+
+    def dfg(self) -> dict:
+        """
+        Returns the current DFG.
+
+        Returns:
+            dict: The DFG, with the edges (activity1, activity2) as keys and their frequency as values (as returned by pm4py DFG discovery).
+        """
+        return dict(self.edges)
+
+    def edge_frequencies(self) -> pd.DataFrame:
+        """
+        Returns the current edges by decreasing frequency.
+
+        Returns:
+            pd.DataFrame: A DataFrame with columns 'Source', 'Target', 'Frequency'.
+        """
+        df_edges = pd.DataFrame([(s, t, n) for (s, t), n in self.edges.items()], columns=['Source', 'Target', 'Frequency'])
+
+        return df_edges.sort_values(by='Frequency', ascending=False, kind='stable').reset_index(drop=True)
+
+    def cyclomatic_complexity(self) -> int:
+        """
+        Returns the current cyclomatic complexity, V(G) = E - N + 2 (as dfg_cyclomatic_complexity in log_variants.py), in O(1).
+
+        Returns:
+            int: The cyclomatic complexity.
+        """
+        return len(self.edges) - len(self.nodes) + 2
@@ -0,0 +1,80 @@
+# log_loader.py
+from pathlib import Path
+import csv
+import pandas as pd
+
+from utilities import df_typed_cache_path
+
+log_column_types = {'Case ID': object, 'CaseLength': int, 'SUS_Tercile': int, 'Apprendimento percepito_Tercile': int, 'UEQ - Overall_Tercile': int,
+                    'QuizAnswerCorrectRatioOverAll_Tercile': int} # types of the event log columns (the other columns are inferred)
+log_disco_columns = ['Variant', 'Variant index'] # columns added by DISCO to the exported event logs, never read
+
+def log_header(path_log: str) -> tuple:
+    """
+    Reads the header of an event log: the separator (';' for the logs of 03_csv_to_log.py, ',' for the logs of the notebooks) and the columns
+    (duplicated names get the suffix '.1', '.2', ... as in pd.read_csv).
+
+    Parameters:
+        path_log (str): The path of the event log (CSV).
+
+    Returns:
+        tuple: The separator and the list of the columns.
+    """
+    with open(path_log, newline="", encoding="utf-8") as f:
+        header = f.readline()
+    csv_sep = ";" if header.count(";") > header.count(",") else ","
+
+    columns = []
+    name_counts = {}
+    for col in next(csv.reader([header.rstrip("\r\n")], delimiter=csv_sep)):
+        columns.append(col if col not in name_counts else f"{col}.{name_counts[col]}")
+        name_counts[col] = name_counts.get(col, 0) + 1
+
+    return csv_sep, columns
+
+def log_load(path_log: str, columns: list = None, timestamp_column: str = "Complete Timestamp", parse_dates: bool = True, date_format: str = "ISO8601",
+             cache: bool = False, drop_duplicates: bool = False) -> pd.DataFrame:
+    """
+    Loads an event log typed (log_column_types, timestamps parsed once with an explicit format) and pruned at read time: only the requested columns are parsed,
+    and the columns added by DISCO (log_disco_columns) are never read.
+    With cache the whole typed event log is kept in a pickle next to the CSV file (see df_typed_cache_path), read instead of the CSV file while it is up to date.
+
+    Parameters:
+        path_log (str): The path of the event log (CSV, separator detected from the header).
+        columns (list): The columns to read, in this order (the missing ones are ignored); None for all the columns. Defaults to None.
+        timestamp_column (str): The name of the timestamp column. Defaults to 'Complete Timestamp'.
+        parse_dates (bool): If True, the timestamp column is parsed as datetime (always with cache). Defaults to True.
+        date_format (str): The format of the timestamps ('ISO8601' or a strftime format). Defaults to 'ISO8601'.
+        cache (bool): If True, the typed cache is used (and created or updated). Defaults to False.
+        drop_duplicates (bool): If True, the duplicated rows are removed. Defaults to False.
+
+    Returns:
+        pd.DataFrame: The event log.
+    """
+    path_log = Path(path_log)
+    csv_sep, header = log_header(path_log)
+    all_columns = [col for col in header if col not in log_disco_columns]
+    selected = all_columns if columns is None else [col for col in columns if col in all_columns]
+    if columns is not None and len(selected) < len(columns):
+        print("Columns not in the event log:", [col for col in columns if col not in all_columns])
+
+    path_cache = df_typed_cache_path(path_log)
+    if cache and path_cache.exists() and path_cache.stat().st_mtime >= path_log.stat().st_mtime:
+        print("Reading typed cache:", path_cache)
+        df_log = pd.read_pickle(path_cache)[selected]
+    else:
+        read_columns = all_columns if cache else selected
+        df_log = pd.read_csv(path_log, sep=csv_sep, header=0, names=header, usecols=read_columns, low_memory=False,
+                             dtype={col: col_type for col, col_type in log_column_types.items() if col in read_columns},
+                             parse_dates=[timestamp_column] if (parse_dates or cache) and timestamp_column in read_columns else None, date_format=date_format)
+        if cache:
+            df_log.to_pickle(path_cache)
+            print("Typed cache saved at:", path_cache)
+        if list(df_log.columns) != selected:
+            df_log = df_log[selected] # the order of columns (usecols keeps the order of the file)
+
+    if drop_duplicates:
+        df_log = df_log.drop_duplicates()
+    print(f"Event log: {path_log.name} - rows: {len(df_log)}, columns: {len(df_log.columns)}")
+
+    return df_log
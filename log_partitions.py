@@ -0,0 +1,82 @@
+# log_partitions.py
+from pathlib import Path
+import pandas as pd
+
+from log_writer import atomic_output
+
+def session_partitions(df: pd.DataFrame, key_column: str, project_column: str, timestamp_column: str) -> pd.DataFrame:
+    """
+    Returns the partition of each session (case) of the events: its project and the date of its first event.
+    All the events of a session end up in the same partition, also when the session spans midnight.
+
+    Parameters:
+        df (pd.DataFrame): The events.
+        key_column (str): The name of the session column (e.g. 'sessionID').
+        project_column (str): The name of the project column (e.g. 'projectID').
+        timestamp_column (str): The name of the timestamp column (datetime).
+
+    Returns:
+        pd.DataFrame: A DataFrame indexed by session, with the columns 'projectID' and 'date' ('YYYY-MM-DD').
+    """
+    df_sessions = df.groupby(key_column, sort=False).agg(projectID=(project_column, "first"), date=(timestamp_column, "min"))
+    df_sessions["date"] = df_sessions["date"].dt.strftime("%Y-%m-%d")
+    print(f"Session partitions: {len(df_sessions)} sessions, {len(df_sessions.drop_duplicates())} partitions (projectID / date)")
+
+    return df_sessions
+
+def partition_path(path_dir: str, keys: dict) -> Path:
+    """
+    Returns the directory of a partition, Hive-style (e.g. 'data_log/partitions/projectID=3/date=2024-03-19').
+
+    Parameters:
+        path_dir (str): The root directory of the partitions.
+        keys (dict): The partition columns and their values, in order.
+
+    Returns:
+        Path: The directory of the partition.
+    """
+    return Path(path_dir).joinpath(*[f"{col}={value}" for col, value in keys.items()])
+
+def write_csv_partitioned(df: pd.DataFrame, partitions: pd.DataFrame, path_dir: str, file_name: str, **csv_kwargs) -> pd.DataFrame:
+    """
+    Writes a DataFrame split by partition in Hive-style directories (see partition_path), one file_name in each partition, written atomically.
+    A partition file is rewritten only if its content changes: a rerun that adds or fixes the events of one day rewrites only the partitions of that day
+    (and of the sessions whose case attributes changed, e.g. the terciles), the files of the other partitions are not touched.
+    The file_name files of the partitions not in partitions (emptied, or whose sessions moved to another partition) are removed, so that a session is never read
+    from two partitions; the directories are kept (the other event logs written in the same partitions, possibly at the same time, may use them).
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame to write (e.g. an event log).
+        partitions (pd.DataFrame): The partition of each row of df (same length and order, e.g. from session_partitions), one column per partition level.
+        path_dir (str): The root directory of the partitions.
+        file_name (str): The name of the file in each partition.
+        **csv_kwargs: Other arguments passed to DataFrame.to_csv (e.g. sep, index).
+
+    Returns:
+        pd.DataFrame: The partitions written, with the partition columns, 'Rows' and 'Written' (False if the file was already up to date).
+            The stale partitions removed are not in the result.
+    """
+    results = []
+    paths_current = set()
+    partition_columns = list(partitions.columns)
+    for keys, df_part in df.groupby([partitions[col].to_numpy() for col in partition_columns], sort=True):
+        keys = dict(zip(partition_columns, keys))
+        path_out = partition_path(path_dir, keys) / file_name
+        paths_current.add(path_out)
+        content = df_part.to_csv(**csv_kwargs).encode("utf-8")
+        written = not (path_out.exists() and path_out.read_bytes() == content)
+        if written:
+            path_out.parent.mkdir(parents=True, exist_ok=True)
+            with atomic_output(path_out) as fp:
+                fp.write(content)
+        results.append({**keys, "Rows": len(df_part), "Written": written})
+
+    # Stale partitions: files of a previous run in partitions without rows now
+    paths_stale = [path for path in Path(path_dir).glob("/".join(["*"] * len(partition_columns) + [file_name])) if path not in paths_current]
+    for path in paths_stale:
+        path.unlink()
+
+    df_results = pd.DataFrame(results)
+    print(f"Partitions of {file_name} in {path_dir}: {len(df_results)} ({int(df_results['Written'].sum()) if len(df_results) else 0} written, {len(paths_stale)} stale removed)")
+
+    return df_results
@@ -0,0 +1,109 @@
+# log_sampling.py
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+
+def sample_cases(df: pd.DataFrame, id_column: str, strata_columns: list, fraction: float, seed: int = 42) -> tuple:
+    """
+    Draws a stratified sample of the cases of an event log (e.g. 5% of the cases for an exploratory run), keeping all the events of the sampled cases.
+    The strata are the combinations of the values of strata_columns (case attributes, e.g. 'Class' and the '*_Tercile' columns; the missing columns are ignored),
+    and round(fraction * cases) cases are taken from each stratum (at least one).
+    The sample is deterministic: each case gets a random key from the hash of its id and of the seed, and the cases with the lowest keys of each stratum are taken,
+    so the same seed gives the same sample on any copy of the log, and the sample of a fraction is contained in the sample of a bigger fraction.
+
+    Parameters:
+        df (pd.DataFrame): The event log.
+        id_column (str): The name of the case column.
+        strata_columns (list): The columns that define the strata.
+        fraction (float): The fraction of the cases to sample (0 < fraction <= 1).
+        seed (int): The seed of the sample. Defaults to 42.
+
+    Returns:
+        pd.DataFrame: The events of the sampled cases (in the order of df).
+        pd.DataFrame: The strata, with the strata columns, 'Cases' (cases in the log) and 'Sampled' (cases in the sample), used by sample_mean_ci.
+    """
+    if not 0 < fraction <= 1:
+        raise ValueError(f"The fraction of the cases must be in (0, 1]: {fraction}")
+    strata_columns = [col for col in strata_columns if col in df.columns]
+    df_cases = df.drop_duplicates(subset=[id_column])[[id_column] + strata_columns].reset_index(drop=True)
+
+    # Random key of each case, from its id and the seed
+    hash_key = f"{seed:016d}"[-16:]
+    case_keys = pd.util.hash_pandas_object(df_cases[id_column], index=False, hash_key=hash_key).to_numpy()
+
+    # The cases with the lowest keys of each stratum
+    stratum_ids = df_cases.groupby(strata_columns, dropna=False, sort=True).ngroup().to_numpy() if strata_columns else np.zeros(len(df_cases), dtype=np.int64)
+    order = np.lexsort((case_keys, stratum_ids))
+    stratum_sizes = np.bincount(stratum_ids)
+    stratum_starts = np.cumsum(stratum_sizes) - stratum_sizes
+    rank = np.empty(len(df_cases), dtype=np.int64)
+    rank[order] = np.arange(len(df_cases)) - stratum_starts[stratum_ids[order]]
+    stratum_samples = np.maximum(1, np.round(fraction * stratum_sizes)).astype(np.int64)
+    df_cases["Sampled"] = rank < stratum_samples[stratum_ids]
+
+    if strata_columns:
+        df_strata = df_cases.groupby(strata_columns, dropna=False, sort=True).agg(Cases=(id_column, "size"), Sampled=("Sampled", "sum")).reset_index()
+    else:
+        df_strata = pd.DataFrame({"Cases": [len(df_cases)], "Sampled": [int(df_cases["Sampled"].sum())]})
+    sampled_cases = df_cases.loc[df_cases["Sampled"], id_column]
+    print(f"Sampled cases: {len(sampled_cases)} / {len(df_cases)} ({len(df_strata)} strata by {strata_columns}, seed {seed})")
+
+    return df[df[id_column].isin(sampled_cases)], df_strata
+
+def sample_mean_ci(df_sample: pd.DataFrame, df_strata: pd.DataFrame, id_column: str, columns: list, confidence: float = 0.95) -> pd.DataFrame:
+    """
+    Estimates the mean of case attributes on the whole log from a stratified sample (see sample_cases), with its confidence interval:
+    the means of the strata are weighted by the cases of each stratum in the log, and the variance includes the finite population correction.
+    The cases with an empty value are ignored; the strata with one sampled case use the variance of the whole sample; with a sample of all the cases the interval is the mean itself.
+
+    Parameters:
+        df_sample (pd.DataFrame): The events of the sampled cases.
+        df_strata (pd.DataFrame): The strata returned by sample_cases.
+        id_column (str): The name of the case column.
+        columns (list): The columns to estimate (numeric, one value per case).
+        confidence (float): The confidence level of the interval. Defaults to 0.95.
+
+    Returns:
+        pd.DataFrame: A DataFrame with columns 'Column', 'Sampled' (cases with a value), 'Mean', 'CI_low', 'CI_high'.
+    """
+    strata_columns = [col for col in df_strata.columns if col not in ("Cases", "Sampled")]
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    df_cases = df_sample.drop_duplicates(subset=[id_column])
+    if strata_columns:
+        df_cases = df_cases.merge(df_strata[strata_columns + ["Cases"]], on=strata_columns, how="left")
+    else:
+        df_cases = df_cases.assign(Cases=df_strata["Cases"].iloc[0])
+
+    results = []
+    for col in columns:
+        df_values = df_cases[df_cases[col].notna()]
+        df_stratum = df_values.groupby(strata_columns if strata_columns else (lambda _: 0), dropna=False).agg(
+            N=("Cases", "first"), n=(col, "size"), mean=(col, "mean"), var=(col, "var"))
+        weights = df_stratum["N"] / df_stratum["N"].sum()
+        mean = float((weights * df_stratum["mean"]).sum())
+        stratum_var = df_stratum["var"].fillna(df_values[col].var()) # strata with one sampled case: variance of the whole sample
+        variance = float((weights ** 2 * (1 - df_stratum["n"] / df_stratum["N"]).clip(lower=0) * stratum_var.fillna(0) / df_stratum["n"]).sum())
+        half_width = z * np.sqrt(max(variance, 0.0))
+        results.append({"Column": col, "Sampled": len(df_values), "Mean": round(mean, 3), "CI_low": round(mean - half_width, 3), "CI_high": round(mean + half_width, 3)})
+
+    return pd.DataFrame(results)
+
+def correlation_ci(r: float, n: int, confidence: float = 0.95) -> tuple:
+    """
+    Returns the confidence interval of a correlation coefficient (Pearson or Spearman) with the Fisher transformation.
+
+    Parameters:
+        r (float): The correlation coefficient.
+        n (int): The number of cases used to compute it.
+        confidence (float): The confidence level of the interval. Defaults to 0.95.
+
+    Returns:
+        tuple: The lower and upper bound of the interval (NaN with less than 4 cases).
+    """
+    if n < 4 or np.isnan(r):
+        return (np.nan, np.nan)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    r_z = np.arctanh(np.clip(r, -0.999999, 0.999999))
+    half_width = z / np.sqrt(n - 3)
+
+    return (float(np.tanh(r_z - half_width)), float(np.tanh(r_z + half_width)))
@@ -0,0 +1,103 @@
+# log_validation.py
+import numpy as np
+import pandas as pd
+
+from log_boundaries import log_sort_order
+from profiling import profiled
+
+# Checks of validate_event_log (column of the report -> description)
+validation_checks = {
+    'Duplicate_Timestamps': "events with the same timestamp of the previous event of the case (the synthetic end events, e.g. SURVEY-END, excluded)",
+    'Class_NA': "case without a class (Class 'NA')",
+    'Events_After_End': "events after the end event of the case (e.g. SURVEY-END)",
+    'Short_Case': "case with CaseLength <= CASE_LEN_THRESHOLD",
+    'Long_Case': "case with TotalTimeHH >= CASE_TIME_THRESHOLD",
+}
+
+@profiled
+def validate_event_log(df: pd.DataFrame, id_column: str, timestamp_column: str, case_len_threshold: int, case_time_threshold: float,
+                       class_column: str = "Class", end_column: str = "pageTitle", end_value: str = "SURVEY-END") -> pd.DataFrame:
+    """
+    Checks the integrity of an event log before it is mined (see validation_checks), with vectorized predicates on the events in order of case and timestamp
+    (one pass, no sort if the log is already in order): duplicated timestamps within a case (not counting the end events, synthetic rows added by add_boundary_rows
+    whose timestamp can match an event), cases of class 'NA', events after the end event of the case,
+    cases too short (number of events, as CaseLength) or too long (first to last event in hours, as TotalTimeHH), as the filter on CASE_LEN_THRESHOLD and CASE_TIME_THRESHOLD.
+    The checks on missing columns (class_column, end_column) are skipped.
+
+    Parameters:
+        df (pd.DataFrame): The event log.
+        id_column (str): The name of the case column.
+        timestamp_column (str): The name of the timestamp column (datetime).
+        case_len_threshold (int): The cases with this number of events or less are short.
+        case_time_threshold (float): The cases lasting this number of hours or more are long.
+        class_column (str): The name of the class column. Defaults to 'Class'.
+        end_column (str): The name of the column of the end event. Defaults to 'pageTitle'.
+        end_value (str): The value of end_column of the end event. Defaults to 'SURVEY-END'.
+
+    Returns:
+        pd.DataFrame: The report, one row per case with violations (in order of case): id_column, 'Events', 'TotalTimeHH', the counts or flags of each check
+            and 'Violations' (the names of the failed checks, separated by '|').
+    """
+    order = log_sort_order(df, id_column, timestamp_column)
+    case_codes, case_ids = pd.factorize(df[id_column].to_numpy()[order], sort=False)
+    n_cases = len(case_ids)
+    positions = np.arange(len(order))
+    timestamps = df[timestamp_column].to_numpy().astype("datetime64[ns]").view(np.int64)[order]
+    same_case = np.r_[False, case_codes[1:] == case_codes[:-1]] # event with a previous event in the same case
+    is_end = df[end_column].to_numpy()[order] == end_value if end_column in df.columns else np.zeros(len(order), dtype=bool)
+    same_timestamp = np.r_[False, (timestamps[1:] == timestamps[:-1]) & ~is_end[1:] & ~is_end[:-1]] # end events not compared
+
+    n_events = np.bincount(case_codes, minlength=n_cases)
+    starts = np.cumsum(n_events) - n_events
+    ends = starts + n_events - 1
+    report = {
+        'Events': n_events,
+        'TotalTimeHH': np.round((timestamps[ends] - timestamps[starts]) / 3.6e12, 2) if n_cases else np.zeros(0),
+        'Duplicate_Timestamps': np.bincount(case_codes, weights=same_case & same_timestamp, minlength=n_cases).astype(np.int64),
+    }
+
+    if class_column in df.columns:
+        report['Class_NA'] = np.bincount(case_codes, weights=df[class_column].to_numpy()[order] == "NA", minlength=n_cases) > 0
+    else:
+        print(f"Check Class_NA skipped (no column {class_column})")
+    if end_column in df.columns:
+        # Events after the first end event of the case
+        first_end = np.full(n_cases, len(order), dtype=np.int64)
+        np.minimum.at(first_end, case_codes[is_end], positions[is_end])
+        report['Events_After_End'] = np.bincount(case_codes, weights=positions > first_end[case_codes], minlength=n_cases).astype(np.int64)
+    else:
+        print(f"Check Events_After_End skipped (no column {end_column})")
+    report['Short_Case'] = n_events <= case_len_threshold
+    report['Long_Case'] = report['TotalTimeHH'] >= case_time_threshold
+
+    df_report = pd.DataFrame(report)
+    df_report.insert(0, id_column, case_ids)
+    checks = [check for check in validation_checks if check in df_report.columns]
+    failed = df_report[checks].to_numpy(dtype=bool)
+    df_report['Violations'] = ["|".join(np.array(checks)[row]) for row in failed]
+    df_report = df_report[failed.any(axis=1)].reset_index(drop=True)
+
+    print(f"Validation: {len(df_report)} / {n_cases} cases with violations")
+    for check in checks:
+        print(f"  {check}: {int(df_report[check].astype(bool).sum())} cases ({validation_checks[check]})")
+
+    return df_report
+
+def drop_invalid_cases(df: pd.DataFrame, df_report: pd.DataFrame, id_column: str, checks: list = None) -> pd.DataFrame:
+    """
+    Removes from an event log the cases with violations (see validate_event_log), so that they are not mined.
+
+    Parameters:
+        df (pd.DataFrame): The event log.
+        df_report (pd.DataFrame): The report of validate_event_log.
+        id_column (str): The name of the case column.
+        checks (list): The checks whose violations remove a case (all the checks if None). Defaults to None.
+
+    Returns:
+        pd.DataFrame: The event log without the events of the invalid cases.
+    """
+    checks = [check for check in (validation_checks if checks is None else checks) if check in df_report.columns]
+    invalid_cases = df_report.loc[df_report[checks].to_numpy(dtype=bool).any(axis=1), id_column]
+    print(f"Cases removed: {len(invalid_cases)} (events: {int(df[id_column].isin(invalid_cases).sum())})")
+
+    return df[~df[id_column].isin(invalid_cases)]
@@ -0,0 +1,213 @@
+# log_variants.py
+from collections import Counter
+import hashlib
+import numpy as np
+import pandas as pd
+
+from profiling import profiled
+
+def variant_hash(activities: tuple) -> str:
+    """
+    Returns a stable hash of a trace variant (the sequence of its activities), the same across runs and event logs.
+
+    Parameters:
+        activities (tuple): The activities of the variant, in order.
+
+    Returns:
+        str: The hash of the variant (16 hexadecimal characters).
+    """
+    return hashlib.blake2b("\x1f".join(map(str, activities)).encode("utf-8"), digest_size=8).hexdigest()
+
+def dfg_cyclomatic_complexity(dfg: dict) -> int:
+    """
+    Calculates the cyclomatic complexity of a Directly-Follows Graph (DFG): V(G) = E - N + 2P, with the graph assumed connected (P = 1).
+
+    Parameters:
+        dfg (dict): The DFG, with the edges (activity1, activity2) as keys (as returned by pm4py DFG discovery or by VariantIndex.dfg).
+
+    Returns:
+        int: The cyclomatic complexity.
+    """
+    nodes = set()
+    for (s, t) in dfg.keys():
+        nodes.add(s)
+        nodes.add(t)
+
+    return len(dfg) - len(nodes) + 2
+
+class VariantIndex:
+    """
+    Index of the trace variants of an event log: each case is mapped to its variant (the sequence of its activities), and each variant is stored once with its cases,
+    its frequency and its Directly-Follows Graph (DFG).
+    Control-flow measures of the log or of a subset of cases (DFG, cyclomatic complexity) are computed per variant and weighted by the number of cases, without scanning the events again.
+    """
+
+    @profiled
+    def __init__(self, df: pd.DataFrame, id_column: str = "Case ID", activity_column: str = "Activity"):
+        """
+        Builds the index of an event log.
+
+        Parameters:
+            df (pd.DataFrame): The event log, with the events of each case in order (e.g. sorted by case and timestamp, as saved by 03_csv_to_log.py).
+            id_column (str): The name of the case column. Defaults to 'Case ID'.
+            activity_column (str): The name of the activity column. Defaults to 'Activity'.
+        """
+        self.id_column = id_column
+        self.activity_column = activity_column
+
+        # Activity sequence of each case (codes of the activities), keeping the order of the events within the case
+        case_codes, case_ids = pd.factorize(df[id_column], sort=False)
+        activity_codes, activities = pd.factorize(df[activity_column], sort=False, use_na_sentinel=False)
+        order = np.argsort(case_codes, kind="stable") if np.any(np.diff(case_codes) < 0) else np.arange(len(case_codes)) # no sort if the log is sorted by case
+        bounds = np.flatnonzero(np.diff(case_codes[order])) + 1
+        traces = [tuple(trace) for trace in np.split(activity_codes[order], bounds)] if len(order) > 0 else []
+
+        # Variant of each case: variants numbered by decreasing frequency (ties by first case), as the variants of DISCO
+        variant_ids = {}
+        case_variant_first = np.array([variant_ids.setdefault(trace, len(variant_ids)) for trace in traces], dtype=np.int64)
+        counts = np.bincount(case_variant_first, minlength=len(variant_ids))
+        rank = np.empty(len(variant_ids), dtype=np.int64)
+        rank[np.argsort(-counts, kind="stable")] = np.arange(len(variant_ids))
+        variant_traces = [None] * len(variant_ids)
+        for trace, variant_first in variant_ids.items():
+            variant_traces[rank[variant_first]] = tuple(activities[list(trace)])
+
+        self.case_variant = pd.Series(rank[case_variant_first] + 1, index=pd.Index(case_ids, name=id_column), name="Variant")
+        self.variant_cases = np.bincount(self.case_variant.to_numpy() - 1, minlength=len(variant_traces))
+        self.variant_activities = variant_traces
+
+        # DFG of each variant: the edges of a single trace with their counts
+        self.variant_dfgs = [Counter(zip(trace[:-1], trace[1:])) for trace in variant_traces]
+
+        print(f"Variant index: {len(self.case_variant)} cases, {len(variant_traces)} variants")
+
+    def variants(self) -> pd.DataFrame:
+        """
+        Returns the frequency table of the variants.
+
+        Returns:
+            pd.DataFrame: A DataFrame with columns 'Variant', 'Hash', 'Cases', 'Frequency' (percentage of the cases), 'Events' (events of a case), 'Activities' (separated by ' > ').
+        """
+        n_cases = max(len(self.case_variant), 1)
+
+        return pd.DataFrame({
+            "Variant": np.arange(1, len(self.variant_activities) + 1),
+            "Hash": [variant_hash(trace) for trace in self.variant_activities],
+            "Cases": self.variant_cases,
+            "Frequency": (self.variant_cases / n_cases * 100).round(2),
+            "Events": [len(trace) for trace in self.variant_activities],
+            "Activities": [" > ".join(map(str, trace)) for trace in self.variant_activities],
+        })
+
+    def cases(self, variants: list) -> pd.Index:
+        """
+        Returns the cases of some variants.
+
+        Parameters:
+            variants (list): The variants (numbers as in the 'Variant' column of variants()).
+
+        Returns:
+            pd.Index: The case ids.
+        """
+        return self.case_variant.index[self.case_variant.isin(variants)]
+
+    def filter_log(self, df: pd.DataFrame, variants: list) -> pd.DataFrame:
+        """
+        Filters an event log (the indexed one or one with the same cases) by variant.
+
+        Parameters:
+            df (pd.DataFrame): The event log.
+            variants (list): The variants of the cases to keep.
+
+        Returns:
+            pd.DataFrame: The events of the cases of the variants.
+        """
+        return df[df[self.id_column].isin(self.cases(variants))]
+
+    def case_weights(self, cases: list = None) -> np.ndarray:
+        """
+        Returns the number of cases of each variant, for all the cases or for a subset.
+
+        Parameters:
+            cases (list): The case ids of the subset (all the cases if None). Defaults to None.
+
+        Returns:
+            np.ndarray: The number of cases of each variant (position 0 is variant 1).
+        """
+        if cases is None:
+            return self.variant_cases
+        variant_numbers = self.case_variant.reindex(pd.Index(cases).unique()).dropna().astype(np.int64)
+        if len(variant_numbers) < len(pd.Index(cases).unique()):
+            print("Warning: some cases are not in the variant index")
+
+        return np.bincount(variant_numbers.to_numpy() - 1, minlength=len(self.variant_activities))
+
+    def group_weights(self, cases: pd.Series, group_codes: np.ndarray, n_groups: int) -> np.ndarray:
+        """
+        Returns the number of cases of each variant for more subsets of cases at once (e.g. the slices of slice_statistics), with a single pass on the cases.
+
+        Parameters:
+            cases (pd.Series): The case ids (a case can be in more subsets).
+            group_codes (np.ndarray): The subset of each case id (0 to n_groups - 1).
+            n_groups (int): The number of subsets.
+
+        Returns:
+            np.ndarray: A matrix with the number of cases of each variant (columns, position 0 is variant 1) for each subset (rows).
+        """
+        df_pairs = pd.DataFrame({"case": pd.Series(cases).to_numpy(), "group": group_codes}).drop_duplicates()
+        variant_numbers = self.case_variant.reindex(df_pairs["case"]).to_numpy()
+        found = ~np.isnan(variant_numbers)
+        if not np.all(found):
+            print("Warning: some cases are not in the variant index")
+        weights = np.zeros((n_groups, len(self.variant_activities)), dtype=np.int64)
+        np.add.at(weights, (df_pairs["group"].to_numpy()[found], variant_numbers[found].astype(np.int64) - 1), 1)
+
+        return weights
+
+    @profiled
+    def dfg(self, cases: list = None, weights: np.ndarray = None) -> dict:
+        """
+        Returns the DFG of all the cases or of a subset, summing the DFGs of the variants weighted by their number of cases
+        (the same DFG discovered by pm4py on the events of the cases).
+
+        Parameters:
+            cases (list): The case ids of the subset (all the cases if None). Defaults to None.
+            weights (np.ndarray): The number of cases of each variant, instead of cases (e.g. a row of group_weights). Defaults to None.
+
+        Returns:
+            dict: The DFG, with the edges (activity1, activity2) as keys and their frequency as values.
+        """
+        dfg = Counter()
+        weights = self.case_weights(cases) if weights is None else weights
+        for variant in np.flatnonzero(weights):
+            for edge, count in self.variant_dfgs[variant].items():
+                dfg[edge] += count * int(weights[variant])
+
+        return dict(dfg)
+
+    def cyclomatic_complexity(self, cases: list = None, weights: np.ndarray = None) -> int:
+        """
+        Calculates the cyclomatic complexity of the DFG of all the cases or of a subset (see dfg_cyclomatic_complexity).
+
+        Parameters:
+            cases (list): The case ids of the subset (all the cases if None). Defaults to None.
+            weights (np.ndarray): The number of cases of each variant, instead of cases (see dfg). Defaults to None.
+
+        Returns:
+            int: The cyclomatic complexity.
+        """
+        return dfg_cyclomatic_complexity(self.dfg(cases, weights))
+
+    def variant_values(self, func) -> pd.Series:
+        """
+        Computes a value once for each variant and returns it for each case (e.g. the cyclomatic complexity of the single traces).
+
+        Parameters:
+            func (callable): A function of the DFG of a variant (dict) and of its activities (tuple).
+
+        Returns:
+            pd.Series: The value of each case, indexed by case id.
+        """
+        values = np.array([func(dict(dfg), trace) for dfg, trace in zip(self.variant_dfgs, self.variant_activities)])
+
+        return pd.Series(values[self.case_variant.to_numpy() - 1], index=self.case_variant.index)
@@ -0,0 +1,151 @@
+# log_writer.py
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+import gzip
+import io
+import os
+import pandas as pd
+
+compression_suffixes = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+def output_path(path_out: str, compression: str = None) -> Path:
+    """
+    Returns the path of an output file with the suffix of its compression (e.g. 'log.csv' -> 'log.csv.gz').
+
+    Parameters:
+        path_out (str): The path of the output file (uncompressed).
+        compression (str): None, 'gzip' or 'zstd'. Defaults to None.
+
+    Returns:
+        Path: The path of the output file.
+    """
+    if compression not in compression_suffixes:
+        raise ValueError(f"Unknown compression: {compression} (None, 'gzip' or 'zstd')")
+    path_out = Path(path_out)
+    return path_out.with_name(path_out.name + compression_suffixes[compression])
+
+def _open_compressed(path_out: Path, compression: str = None):
+    """
+    Opens a binary file for writing, compressed with gzip or zstd (zstd requires the zstandard package).
+    """
+    if compression is None:
+        return open(path_out, "wb")
+    if compression == "gzip":
+        return gzip.open(path_out, "wb", compresslevel=6)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("The zstd compression requires the zstandard package (pip install zstandard)") from e
+        return zstandard.open(path_out, "wb")
+    raise ValueError(f"Unknown compression: {compression} (None, 'gzip' or 'zstd')")
+
+@contextmanager
+def atomic_output(path_out: str, compression: str = None):
+    """
+    Opens a binary file to write path_out atomically: the data are written to '<path_out>.part', which is renamed to path_out on completion (and removed on error).
+    A half-written file is never visible with its final name (e.g. to the jobs importing the event logs).
+
+    Parameters:
+        path_out (str): The path of the output file (with the suffix of its compression, see output_path).
+        compression (str): None, 'gzip' or 'zstd'. Defaults to None.
+
+    Yields:
+        The binary file object.
+    """
+    path_out = Path(path_out)
+    path_part = path_out.with_name(path_out.name + ".part")
+    try:
+        with _open_compressed(path_part, compression) as fp:
+            yield fp
+        os.replace(path_part, path_out)
+    except BaseException:
+        path_part.unlink(missing_ok=True)
+        raise
+
+def write_csv(df: pd.DataFrame, path_out: str, compression: str = None, **csv_kwargs) -> Path:
+    """
+    Writes a DataFrame to a CSV file atomically (see atomic_output), optionally compressed.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame to write.
+        path_out (str): The path of the output file (the suffix of the compression is added).
+        compression (str): None, 'gzip' or 'zstd'. Defaults to None.
+        **csv_kwargs: Other arguments passed to DataFrame.to_csv (e.g. sep, index).
+
+    Returns:
+        Path: The path of the file written.
+    """
+    path_out = output_path(path_out, compression)
+    with atomic_output(path_out, compression) as fp:
+        text = io.TextIOWrapper(fp, encoding="utf-8", newline="")
+        df.to_csv(text, **csv_kwargs)
+        text.flush()
+        text.detach() # the binary file is closed by atomic_output
+    print("CSV file saved successfully at:", path_out)
+
+    return path_out
+
+class LogWriter:
+    """
+    Runs the output steps of a script (formatting and writing the event logs, splitting them, saving the stats) on a pool of threads or processes,
+    so that they run in parallel with each other and with the rest of the script.
+    """
+
+    def __init__(self, n_workers: int = 2, processes: bool = False):
+        """
+        Parameters:
+            n_workers (int): The number of threads (or processes) of the pool. Defaults to 2.
+            processes (bool): If True, a pool of processes is used (the formatting of large CSV files runs in parallel, the DataFrames are copied to the processes); the tasks must be picklable. Defaults to False.
+        """
+        self.executor = ProcessPoolExecutor(max_workers=n_workers) if processes else ThreadPoolExecutor(max_workers=n_workers)
+        self.futures = []
+
+    def submit(self, func, *args, **kwargs) -> Future:
+        """
+        Submits an output task (e.g. write_csv or log_split_cases_multi).
+
+        Parameters:
+            func (callable): The function to run.
+            *args, **kwargs: The arguments of the function.
+
+        Returns:
+            Future: The future of the result of the task.
+        """
+        future = self.executor.submit(func, *args, **kwargs)
+        self.futures.append(future)
+
+        return future
+
+    def wait(self) -> list:
+        """
+        Waits for the tasks submitted so far.
+
+        Returns:
+            list: The results of the tasks, in the order of submission (the first error of a task is raised).
+        """
+        futures, self.futures = self.futures, []
+
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """
+        Waits for the tasks submitted so far and shuts down the pool.
+
+        Returns:
+            None
+        """
+        try:
+            self.wait()
+        finally:
+            self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.executor.shutdown(cancel_futures=True)
@@ -0,0 +1,79 @@
+# profiling.py
+from functools import wraps
+from pathlib import Path
+import cProfile
+import io
+import os
+import pstats
+import time
+import pandas as pd
+
+profile_env = "EDU_LOG_PROFILE" # "time" = duration of each call, "cprofile" = cProfile stats of each call, "line" = time of each line (line_profiler), unset or "" = no profiling
+profile_dir_env = "EDU_LOG_PROFILE_DIR" # optional directory where the cProfile stats are saved (one .prof file per function, e.g. for snakeviz)
+profile_timings = {} # function -> [calls, total seconds], collected while profiling is on
+
+def profiled(func):
+    """
+    Decorator that profiles a function when the environment variable EDU_LOG_PROFILE is set (read at each call, so it can be toggled in a notebook with os.environ):
+    'time' prints the duration of each call, 'cprofile' prints the most expensive calls of the function (and saves them in EDU_LOG_PROFILE_DIR if set),
+    'line' prints the time of each line of the function (pip install line_profiler).
+    The timings are collected in profile_timings (see profile_summary); without the variable the function runs as it is.
+
+    Parameters:
+        func (callable): The function to profile.
+
+    Returns:
+        callable: The decorated function.
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        mode = os.environ.get(profile_env, "")
+        if not mode:
+            return func(*args, **kwargs)
+
+        if mode == "line":
+            try:
+                from line_profiler import LineProfiler
+            except ImportError as error:
+                raise ImportError(f"{profile_env}=line requires line_profiler: pip install line_profiler") from error
+            profiler = LineProfiler(func)
+        else:
+            profiler = cProfile.Profile() if mode == "cprofile" else None
+        start = time.perf_counter()
+        result = profiler.runcall(func, *args, **kwargs) if profiler is not None else func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        timing = profile_timings.setdefault(name, [0, 0.0])
+        timing[0] += 1
+        timing[1] += elapsed
+        print(f"[profile] {name}: {elapsed:.3f} s")
+        if mode == "line":
+            stream = io.StringIO()
+            profiler.print_stats(stream=stream, stripzeros=True)
+            print(stream.getvalue())
+        elif profiler is not None:
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(15)
+            print(stream.getvalue())
+            profile_dir = os.environ.get(profile_dir_env)
+            if profile_dir:
+                Path(profile_dir).mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(Path(profile_dir) / f"{name}.prof")
+
+        return result
+
+    return wrapper
+
+def profile_summary() -> pd.DataFrame:
+    """
+    Returns the timings collected by the profiled functions.
+
+    Returns:
+        pd.DataFrame: A DataFrame with columns 'Function', 'Calls', 'Total_s', 'Mean_s', sorted by total time.
+    """
+    df_timings = pd.DataFrame([(name, calls, total) for name, (calls, total) in profile_timings.items()], columns=["Function", "Calls", "Total_s"])
+    df_timings["Mean_s"] = df_timings["Total_s"] / df_timings["Calls"]
+
+    return df_timings.sort_values(by="Total_s", ascending=False).round(4).reset_index(drop=True)
@@ -0,0 +1,111 @@
+"""
+replay_events.py
+"""
+
+### IMPORT ###
+from datetime import datetime
+import time
+import pandas as pd
+
+### LOCAL IMPORT ###
+from config import config_reader
+from log_live import IncrementalDFG, live_activities
+from log_variants import VariantIndex
+from utilities import input_files, df_read_csv_files, translations_merge, df_translate_columns
+
+### GLOBALS ###
+yaml_config = config_reader.config_read_yaml("config.yml", "config")
+# print(yaml_config) # debug
+data_dir = str(yaml_config["DATA_DIR"])
+events_file = str(yaml_config["EVENTS_FILE"]) # input: a file, a directory or a glob pattern
+timestamp_format = str(yaml_config["TIMESTAMP_FORMAT"])
+schemas = yaml_config["SCHEMAS"] # schemas of the input files
+translations = translations_merge(yaml_config["TRANSLATIONS"])
+clik_event_list = ['CLICK', 'DBCLICK'] # not activities (counted in the event logs)
+col_list_events = ["sessionID","pageTitle","pagePara","event","lastUpdate"]
+
+# INPUT
+level = "PAGE" # PAGE, PARA
+replay_speed = 0 # 0 = no pause; otherwise seconds of events replayed in one second (e.g. 60 = one minute of events per second)
+report_every = 10000 # events between two reports of the DFG
+check_rebuild = 1 # 1 = compares the final DFG with the one rebuilt from all the events (see log_variants.py), 0 = no
+
+### FUNCTIONS ###
+def replay_events(df_events: pd.DataFrame, dfg: IncrementalDFG, speed: float = 0, report_every: int = 10000) -> None:
+    """
+    Feeds the events to an incremental DFG in order of time, pausing to follow the timestamps at the given speed and printing the DFG every report_every events.
+
+    Parameters:
+        df_events (pd.DataFrame): The events with the columns 'sessionID', 'Activity' and 'lastUpdate', sorted by 'lastUpdate'.
+        dfg (IncrementalDFG): The incremental DFG.
+        speed (float): Seconds of events replayed in one second (0 = no pause). Defaults to 0.
+        report_every (int): The number of events between two reports. Defaults to 10000.
+
+    Returns:
+        None
+    """
+    timestamps = df_events['lastUpdate'].to_numpy()
+    offsets = (timestamps - timestamps[0]) / pd.Timedelta(seconds=1) if len(timestamps) > 0 else timestamps # seconds from the first event
+    start_wall = time.monotonic()
+    for i, (case_id, activity) in enumerate(zip(df_events['sessionID'].to_numpy(), df_events['Activity'].to_numpy())):
+        if speed > 0:
+            delay = offsets[i] / speed - (time.monotonic() - start_wall)
+            if delay > 0:
+                time.sleep(delay)
+        dfg.append(case_id, activity)
+        if (i + 1) % report_every == 0:
+            print(f"{pd.Timestamp(timestamps[i])} - events: {dfg.n_events}, cases: {dfg.n_cases}, edges: {len(dfg.edges)}, CC: {dfg.cyclomatic_complexity()}")
+
+### MAIN ###
+def main():
+    print()
+    print("*** PROGRAM START ***")
+    print()
+
+    start_time = datetime.now().replace(microsecond=0)
+    print("Start process:", str(start_time))
+    print()
+
+    print(">> Reading Events data")
+    paths_events = input_files(data_dir, events_file)
+    print("Path:", str(paths_events[0]) if len(paths_events) == 1 else f"{len(paths_events)} files ({events_file})")
+    df_events = df_read_csv_files(paths_events, col_list_events, schemas["events"], timestamp_format)
+    df_events = df_translate_columns(df_events, translations)
+    print()
+
+    print(f">> Activities at {level} level")
+    df_events['Activity'] = live_activities(df_events, level, clik_event_list)
+    df_events = df_events.dropna(subset=['Activity', 'lastUpdate'])
+    df_events = df_events.sort_values(by='lastUpdate', kind='stable') # arrival order of the events
+    print("Events to replay:", len(df_events))
+    print()
+
+    print(f">> Replaying the events (speed: {replay_speed})")
+    dfg = IncrementalDFG()
+    replay_events(df_events, dfg, replay_speed, report_every)
+    print(f"Final DFG - events: {dfg.n_events}, cases: {dfg.n_cases}, edges: {len(dfg.edges)}, CC: {dfg.cyclomatic_complexity()}")
+    print("Most frequent edges:")
+    print(dfg.edge_frequencies().head(10))
+    print()
+
+    if check_rebuild == 1:
+        print(">> Checking with the DFG rebuilt from all the events")
+        variant_index = VariantIndex(df_events, "sessionID", "Activity")
+        print("Same DFG:", variant_index.dfg() == dfg.dfg())
+        print()
+
+    # program END
+    end_time = datetime.now().replace(microsecond=0)
+    delta_time = end_time - start_time
+
+    print()
+    print("End process:", end_time)
+    print("Time to finish:", delta_time)
+
+    print()
+    print("*** PROGRAM END ***")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# session_keys.py
+import numpy as np
+import pandas as pd
+
+class SessionDictionary:
+    """
+    Dictionary of the session ids (long random strings, the sessionID of the events, quiz, survey and SUS files and the Case ID of the event logs):
+    each id is mapped to a compact int32 key, so that merges, groupby, isin and drop_duplicates hash and compare integers instead of strings.
+    The keys are the positions of the ids in sorted order, so sorting by key gives the same order of sorting by id; the ids are translated back only when the data is saved.
+    The dictionary is built at each run from the data read and kept in memory: the keys are not meant to be stored.
+    """
+
+    def __init__(self, ids: list = None):
+        """
+        Parameters:
+            ids (list): The session ids (duplicates and empty values are ignored). Defaults to None (empty dictionary).
+        """
+        ids = pd.Series([] if ids is None else ids, dtype=object).dropna().unique()
+        self.ids = pd.Index(np.sort(ids.astype(str)), name="sessionID")
+        print(f"Session dictionary: {len(self.ids)} sessions")
+
+    @classmethod
+    def build(cls, id_columns: list) -> "SessionDictionary":
+        """
+        Builds the dictionary of the ids of more sources (e.g. the sessionID column of the events and of the tables with one row per session).
+
+        Parameters:
+            id_columns (list): The id columns (pd.Series) of the sources.
+
+        Returns:
+            SessionDictionary: The dictionary with the ids of all the sources.
+        """
+        return cls(pd.concat([pd.Series(col.unique(), dtype=object) for col in id_columns], ignore_index=True))
+
+    def encode(self, ids: pd.Series) -> pd.Series:
+        """
+        Returns the keys of some ids.
+
+        Parameters:
+            ids (pd.Series): The session ids (all in the dictionary, or empty).
+
+        Returns:
+            pd.Series: The keys (int32, with the index of ids); if some ids are empty the dtype is the nullable Int32, with the empty values as <NA>.
+        """
+        keys = self.ids.get_indexer(ids)
+        missing = keys < 0
+        if np.any(missing & ids.notna().to_numpy()):
+            unknown = ids[missing & ids.notna().to_numpy()].unique()
+            raise ValueError(f"Session ids not in the dictionary ({len(unknown)}): {list(unknown[:5])}")
+        if np.any(missing):
+            return pd.Series(keys, index=ids.index, name=ids.name, dtype="Int32").mask(missing)
+
+        return pd.Series(keys.astype(np.int32), index=ids.index, name=ids.name)
+
+    def decode(self, keys: pd.Series) -> pd.Series:
+        """
+        Returns the ids of some keys (e.g. before saving an event log or a stats table).
+
+        Parameters:
+            keys (pd.Series): The keys (int32 or nullable Int32).
+
+        Returns:
+            pd.Series: The session ids (object, with the index of keys; empty for the empty keys).
+        """
+        missing = keys.isna().to_numpy()
+        ids = self.ids.to_numpy(dtype=object).take(keys.fillna(0).to_numpy(dtype=np.int64))
+        ids[missing] = np.nan
+
+        return pd.Series(ids, index=keys.index, name=keys.name, dtype=object)
@@ -0,0 +1,90 @@
+# stats_sink.py
+from pathlib import Path
+import pandas as pd
+
+class StatsSink:
+    """
+    Collects the stats tables produced during a run and writes them once in a single Excel workbook (one sheet per table).
+    Each table can also be saved as CSV (opt-in), e.g. when it is read by a following script.
+    """
+
+    def __init__(self, stats_dir: str, workbook_name: str):
+        """
+        Parameters:
+            stats_dir (str): The directory where the workbook and the CSV files are saved.
+            workbook_name (str): The file name of the workbook (e.g. '_all_stats.xlsx').
+        """
+        self.stats_dir = Path(stats_dir)
+        self.workbook_name = workbook_name
+        self.tables = {} # table name -> (DataFrame, index)
+
+    def add(self, df: pd.DataFrame, name: str, csv: bool = False, csv_sep: str = ";", index: bool = False, **csv_kwargs) -> None:
+        """
+        Adds a stats table to the sink (a table with the same name is replaced).
+
+        Parameters:
+            df (pd.DataFrame): The stats table.
+            name (str): The name of the table, used as sheet name and as CSV file stem.
+            csv (bool): If True, the table is also saved as CSV in stats_dir. Defaults to False.
+            csv_sep (str): The delimiter of the CSV file. Defaults to ';'.
+            index (bool): If True, the index of the DataFrame is written too. Defaults to False.
+            **csv_kwargs: Other arguments passed to DataFrame.to_csv (e.g. quoting).
+
+        Returns:
+            None
+        """
+        self.tables[name] = (df, index)
+        if csv:
+            path_out = self.stats_dir / f"{name}.csv"
+            df.to_csv(path_out, sep=csv_sep, index=index, **csv_kwargs)
+            print(f"CSV file saved successfully at: {path_out}")
+
+    def add_csv_dir(self, csv_dir: str, csv_sep: str = ";") -> None:
+        """
+        Adds to the sink the CSV files of a directory (e.g. the stats saved by the previous scripts), skipping the tables already in the sink.
+
+        Parameters:
+            csv_dir (str): The directory with the CSV files.
+            csv_sep (str): The delimiter of the CSV files. Defaults to ';'.
+
+        Returns:
+            None
+        """
+        for csv_file in sorted(Path(csv_dir).glob('*.csv')):
+            if csv_file.stem in self.tables:
+                continue
+            print("Adding file:", csv_file)
+            df = pd.read_csv(csv_file, dtype={"sessionID":object}, sep=csv_sep, low_memory=False)
+            self.add(df, csv_file.stem)
+
+    def save(self) -> Path:
+        """
+        Writes all the tables in a single workbook, using XlsxWriter if installed (faster) or openpyxl otherwise.
+        Sheet names are the table names without spaces, truncated to 31 characters (Excel limit).
+
+        Returns:
+            Path: The path of the workbook.
+        """
+        try:
+            import xlsxwriter # noqa: F401
+            engine = "xlsxwriter"
+        except ImportError:
+            engine = "openpyxl"
+
+        path_out = self.stats_dir / self.workbook_name
+        sheet_names = set()
+        with pd.ExcelWriter(path_out, engine=engine) as writer:
+            for name, (df, index) in self.tables.items():
+                sheet_name = name.replace(" ", "_")[:31]
+                # Ensure the sheet name is unique after truncation
+                i = 1
+                while sheet_name in sheet_names:
+                    i += 1
+                    sheet_name = f"{name.replace(' ', '_')[:31 - len(str(i)) - 1]}_{i}"
+                sheet_names.add(sheet_name)
+                df.to_excel(writer, sheet_name=sheet_name, index=index)
+
+        print(f"XLSX file with {len(self.tables)} stats tables saved successfully at: {path_out}")
+        print()
+
+        return path_out
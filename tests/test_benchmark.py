@@ -0,0 +1,116 @@
+"""
+test_benchmark.py
+
+Benchmarks of the analysis functions of the notebooks (and of export_features.py) on a synthetic event log, with the benchmark fixture of pytest-benchmark
+(pip install -r requirements-dev.txt): pytest tests/test_benchmark.py. The regression gate on the stored baseline is benchmark.py, which runs this suite.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from log_analysis import count_jumps, calculate_session_count_and_percentage, calculate_column_statistics, extract_distinct_menu_per_session, slice_statistics
+from log_features import calculate_activity_times, calculate_activity_time_stats, session_feature_matrix
+from log_variants import VariantIndex
+from log_conformance import conformance_scores
+
+id_column = "Case ID"
+activity_column = "Activity"
+timestamp_column = "Complete Timestamp"
+
+# Synthetic event log
+n_cases = 2000 # cases of the synthetic event log
+case_len_mean = 40 # mean number of events of a case
+n_activities = 20
+seed = 42
+
+def synthetic_event_log(n_cases: int, case_len_mean: int, n_activities: int, seed: int) -> pd.DataFrame:
+    """
+    Generates a synthetic event log with the columns used by the analysis functions (sorted by case and timestamp, as the event logs of 03_csv_to_log.py).
+
+    Parameters:
+        n_cases (int): The number of cases.
+        case_len_mean (int): The mean number of events of a case.
+        n_activities (int): The number of distinct activities.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        pd.DataFrame: The event log.
+    """
+    rng = np.random.default_rng(seed)
+    case_len = rng.poisson(case_len_mean, n_cases) + 2
+    case_ids = np.repeat([f"S{i:06d}" for i in range(n_cases)], case_len)
+    n_events = len(case_ids)
+    # Activities mostly in order (the tutorial path), with some jumps back and forward
+    steps = rng.choice([1, 1, 1, 0, -1, 2], size=n_events)
+    activity_codes = np.abs(np.cumsum(steps)) % n_activities
+    starts = pd.Timestamp("2024-03-01 09:00:00") + pd.to_timedelta(rng.integers(0, 60 * 24 * 60, n_cases), unit="m")
+    gaps = pd.to_timedelta(rng.integers(1, 300, n_events), unit="s")
+    case_starts = np.repeat(starts.to_numpy(), case_len)
+    offsets = pd.Series(gaps).groupby(case_ids).cumsum().to_numpy()
+
+    df_log = pd.DataFrame({
+        id_column: case_ids,
+        activity_column: [f"ACT_{code:02d}" for code in activity_codes],
+        timestamp_column: case_starts + offsets,
+        'menu': np.repeat(rng.choice(["menu_1", "menu_2", "menu_3", "menu_4"], n_cases), case_len),
+        'QuizSessionCount': np.repeat(rng.integers(0, 11, n_cases), case_len),
+        'SUS': np.repeat(rng.uniform(20, 100, n_cases).round(1), case_len),
+    })
+
+    return df_log.sort_values(by=[id_column, timestamp_column], kind="stable").reset_index(drop=True)
+
+def benchmark_functions(df_log: pd.DataFrame) -> dict:
+    """
+    Returns the benchmarked functions, each as a callable without arguments on the synthetic event log.
+
+    Parameters:
+        df_log (pd.DataFrame): The synthetic event log.
+
+    Returns:
+        dict: The name of the function as key and the callable as value.
+    """
+    df_times = pd.concat([df_log, calculate_activity_times(df_log, id_column, timestamp_column)], axis=1)
+    activities = sorted(df_log[activity_column].unique())
+    variant_index = VariantIndex(df_log, id_column, activity_column)
+    subset_cases = df_log[id_column].drop_duplicates().iloc[::3]
+    df_cases = df_log.drop_duplicates(subset=[id_column]).copy()
+    df_cases["SUS_Tercile"] = pd.qcut(df_cases["SUS"], q=3, labels=[1, 2, 3]).astype(int)
+
+    return {
+        "count_jumps": lambda: count_jumps(df_log, id_column, timestamp_column, activity_column),
+        "calculate_session_count_and_percentage": lambda: calculate_session_count_and_percentage(df_log, id_column),
+        "calculate_column_statistics": lambda: calculate_column_statistics(df_log, id_column, "SUS"),
+        "extract_distinct_menu_per_session": lambda: extract_distinct_menu_per_session(df_log, id_column, "menu"),
+        "calculate_activity_times": lambda: calculate_activity_times(df_log, id_column, timestamp_column),
+        "calculate_activity_time_stats": lambda: calculate_activity_time_stats(df_times, id_column, "A_Time_s", activity_column, subsets={"FIRST": activities[:10], "ALL": activities}),
+        "variant_index": lambda: VariantIndex(df_log, id_column, activity_column),
+        "variant_cyclomatic_complexity": lambda: variant_index.cyclomatic_complexity(subset_cases),
+        "session_feature_matrix": lambda: session_feature_matrix(df_log, id_column, activity_column, timestamp_column, case_columns=['QuizSessionCount', 'SUS'], sum_columns={}),
+        "conformance_scores": lambda: conformance_scores(df_log, id_column, activity_column, timestamp_column, activities),
+        "slice_statistics": lambda: slice_statistics(df_cases, ["SUS_Tercile", "QuizSessionCount"], id_column, {"SUS_mean": ("SUS", "mean")}, variant_index=variant_index),
+    }
+
+# Names of the benchmarked functions (keys of benchmark_functions)
+function_names = [
+    "count_jumps", "calculate_session_count_and_percentage", "calculate_column_statistics", "extract_distinct_menu_per_session", "calculate_activity_times",
+    "calculate_activity_time_stats", "variant_index", "variant_cyclomatic_complexity", "session_feature_matrix", "conformance_scores", "slice_statistics",
+]
+
+@pytest.fixture(scope="module")
+def functions() -> dict:
+    """
+    The benchmarked functions on the synthetic event log (generated once for the module).
+    """
+    return benchmark_functions(synthetic_event_log(n_cases, case_len_mean, n_activities, seed))
+
+def test_function_names(functions):
+    assert list(functions) == function_names
+
+@pytest.mark.parametrize("name", function_names)
+def test_benchmark(benchmark, functions, name):
+    benchmark.group = "analysis"
+    benchmark.extra_info["function"] = name
+    benchmark(functions[name])
@@ -1,7 +1,53 @@
 # utilities.py
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+import importlib.util
+import numpy as np
 import pandas as pd
 
-def df_read_csv_data(path_csv: str, col_list: list, csv_sep: str = ",") -> pd.DataFrame:
+def csv_read_options(schema: dict, col_list: list = None, date_format: str = "ISO8601") -> dict:
+    """
+    Returns the arguments of pd.read_csv for a CSV file described by a schema (see SCHEMAS in config.yml), so that the parser reads the declared columns
+    directly with their types (separator, decimal separator, types and date formats), without type inference and conversions after reading.
+
+    Parameters:
+        schema (dict): The schema of the file: 'sep', 'decimal' (optional, defaults to '.'), 'engine' (optional: 'c' or 'pyarrow', defaults to 'c')
+            and 'columns' (optional: column -> type, e.g. str, int64, float64 or datetime).
+        col_list (list): The columns to read (None for all the columns of the file; the columns without a type are inferred). Defaults to None.
+        date_format (str): The format of the datetime columns ('ISO8601' or a strftime format). Defaults to 'ISO8601'.
+
+    Returns:
+        dict: The arguments of pd.read_csv.
+    """
+    col_types = schema.get("columns") or {}
+    if col_list is not None:
+        missing = [col for col in col_list if col not in col_types]
+        if col_types and missing:
+            raise ValueError(f"Columns not in the schema: {missing}")
+        col_types = {col: col_types[col] for col in col_list if col in col_types}
+
+    options = {"sep": schema.get("sep", ","), "decimal": schema.get("decimal", ".")}
+    if col_list is not None:
+        options["usecols"] = col_list
+    dtype = {col: col_type for col, col_type in col_types.items() if col_type != "datetime"}
+    if dtype:
+        options["dtype"] = dtype
+    date_columns = [col for col, col_type in col_types.items() if col_type == "datetime"]
+    if date_columns:
+        options["parse_dates"] = date_columns
+        options["date_format"] = date_format
+
+    engine = schema.get("engine", "c")
+    if engine == "pyarrow" and importlib.util.find_spec("pyarrow") is None:
+        print("The pyarrow engine requires the pyarrow package (pip install pyarrow): using the C engine")
+        engine = "c"
+    options["engine"] = engine
+    if engine == "c":
+        options["low_memory"] = False # the columns without a type are inferred on the whole file
+
+    return options
+
+def df_read_csv_data(path_csv: str, col_list: list, csv_sep: str = ",", schema: dict = None, date_format: str = "ISO8601") -> pd.DataFrame:
     """
     Reads data from a CSV file into a pandas DataFrame with specified columns and data types.
 
@@ -9,12 +55,16 @@ def df_read_csv_data(path_csv: str, col_list: list, csv_sep: str = ",") -> pd.Da
         path_csv (str): the file path to the CSV file to be read.
         col_list (list): a list of column names to be extracted.
         sep (str): the delimiter string used in the CSV file. Defaults to ';'.
+        schema (dict): the schema of the file (see csv_read_options); if given, its separator is used instead of csv_sep. Defaults to None (types inferred).
+        date_format (str): the format of the datetime columns of the schema. Defaults to 'ISO8601'.
 
     Returns:
         pd.DataFrame: a pandas DataFrame containing the data read from the CSV file.
     """
     df = None
-    if col_list is None:
+    if schema is not None:
+        df = pd.read_csv(path_csv, **csv_read_options(schema, col_list, date_format))
+    elif col_list is None:
         df = pd.read_csv(path_csv, sep=csv_sep, low_memory=False)
     else:
         df = pd.read_csv(path_csv, sep=csv_sep, usecols=col_list, low_memory=False)
@@ -30,6 +80,295 @@ def df_read_csv_data(path_csv: str, col_list: list, csv_sep: str = ",") -> pd.Da
 
     return df
 
+def input_files(data_dir: str, file_spec: str) -> list:
+    """
+    Returns the input files of a file setting (e.g. EVENTS_FILE): a single file, a directory (all its CSV files) or a glob pattern (e.g. 'events/*/events_*.csv'),
+    relative to data_dir. The files are in order of name, so that the daily exports are read in order of date.
+
+    Parameters:
+        data_dir (str): The directory of the input files.
+        file_spec (str): The file name, the directory or the glob pattern.
+
+    Returns:
+        list: The paths of the input files.
+    """
+    path_spec = Path(data_dir) / file_spec
+    if path_spec.is_dir():
+        paths = sorted(path_spec.glob("*.csv"))
+    elif any(char in file_spec for char in "*?["):
+        paths = sorted(Path(data_dir).glob(file_spec))
+    else:
+        return [path_spec]
+    if not paths:
+        raise FileNotFoundError(f"No input files for: {path_spec}")
+
+    return paths
+
+def df_read_csv_files(paths: list, col_list: list, schema: dict, date_format: str = "ISO8601", key_column: str = "idEvent", n_workers: int = 4) -> pd.DataFrame:
+    """
+    Reads more CSV files with the same schema (e.g. the daily exports of each project) into a single DataFrame, as df_read_csv_data reads a single file.
+    The files are parsed in parallel on a pool of threads; the rows delivered in more files (same key_column, e.g. an event exported again in the file of the next day)
+    are kept once, from the last file in order, then the duplicated rows are removed as in df_read_csv_data.
+    With a single file, df_read_csv_data is used.
+
+    Parameters:
+        paths (list): The paths of the CSV files (see input_files), in order.
+        col_list (list): The columns to read.
+        schema (dict): The schema of the files (see csv_read_options); it must include key_column.
+        date_format (str): The format of the datetime columns of the schema. Defaults to 'ISO8601'.
+        key_column (str): The column that identifies a row across the files. Defaults to 'idEvent'.
+        n_workers (int): The number of threads. Defaults to 4.
+
+    Returns:
+        pd.DataFrame: The rows of all the files, in order of file and row.
+    """
+    if len(paths) == 1:
+        return df_read_csv_data(paths[0], col_list, schema=schema, date_format=date_format)
+
+    read_columns = col_list if key_column in col_list else col_list + [key_column]
+    options = csv_read_options(schema, read_columns, date_format)
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        frames = list(executor.map(lambda path_csv: pd.read_csv(path_csv, **options), paths))
+    for path_csv, df_file in zip(paths, frames):
+        print(f"File: {Path(path_csv).name} - rows: {len(df_file)}")
+
+    df = pd.concat(frames, ignore_index=True)
+    rows_read = len(df)
+    df = df.drop_duplicates(subset=[key_column], keep="last")
+    print(f"Rows delivered in more files (same {key_column}): {rows_read - len(df)}")
+    df = df[col_list].drop_duplicates()
+
+    print("Data preview")
+    print(df.head())
+    print()
+    print("Files:", len(paths))
+    print("Shape:", df.shape)
+    print("Rows:", len(df))
+    print("Columns:", df.columns)
+    print()
+
+    return df
+
+def df_to_datetime(df: pd.DataFrame, col_list: list, date_format: str = "ISO8601") -> pd.DataFrame:
+    """
+    Converts the specified columns to datetime with an explicit format, so that the timestamps are parsed once (at ingestion) and then carried as datetimes.
+    Columns that are already datetimes are left as they are.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame with the columns to convert.
+        col_list (list): The list of columns to convert.
+        date_format (str): The format of the timestamps ('ISO8601' or a strftime format). Defaults to 'ISO8601'.
+
+    Returns:
+        pd.DataFrame: The DataFrame with the columns converted.
+    """
+    for col in col_list:
+        if not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], format=date_format)
+
+    return df
+
+def translations_merge(translations: dict) -> dict:
+    """
+    Merges the mapping tables of several languages (e.g. TRANSLATIONS in config.yml: language -> column -> value -> translation) in a single table per column.
+
+    Parameters:
+        translations (dict): The mapping tables by language.
+
+    Returns:
+        dict: A dictionary with the column name as key and the dictionary of its value -> translation as value.
+    """
+    mapping_dict = {}
+    for lang, lang_tables in translations.items():
+        for col, mapping in lang_tables.items():
+            col_mapping = mapping_dict.setdefault(col, {})
+            for value, translation in mapping.items():
+                if col_mapping.get(value, translation) != translation:
+                    raise ValueError(f"Value '{value}' of column '{col}' has different translations ('{col_mapping[value]}' and '{translation}', language '{lang}')")
+                col_mapping[value] = translation
+
+    return mapping_dict
+
+def df_translate_columns(df: pd.DataFrame, mapping_dict: dict) -> pd.DataFrame:
+    """
+    Translates the values of some columns by converting them to categoricals and mapping their categories once (the cost does not depend on the size of the mapping tables).
+    The values without translation are kept as they are and reported.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame with the columns to translate.
+        mapping_dict (dict): A dictionary with the column name as key and the dictionary of its value -> translation as value (see translations_merge).
+
+    Returns:
+        pd.DataFrame: The DataFrame with the translated columns (categoricals).
+    """
+    for col, mapping in mapping_dict.items():
+        values = df[col].astype("category")
+        categories = values.cat.categories
+        translated = pd.Index([mapping.get(value, value) for value in categories])
+
+        translations = set(mapping.values())
+        unmapped = [value for value in categories if value not in mapping and value not in translations]
+        if unmapped:
+            print(f"Values of '{col}' without translation ({len(unmapped)}):", unmapped)
+
+        # More values can have the same translation: the categories are made unique and the codes remapped
+        new_codes, new_categories = pd.factorize(translated)
+        codes = values.cat.codes.to_numpy()
+        codes = np.where(codes >= 0, new_codes[codes], -1)
+        df[col] = pd.Categorical.from_codes(codes, new_categories)
+
+    return df
+
+def df_combine_by_key(df_list: list, key_column: str) -> pd.DataFrame:
+    """
+    Combines tables with one row per key (e.g. quiz, survey and SUS data per sessionID) in a single table indexed by the key (outer join).
+
+    Parameters:
+        df_list (list): The list of DataFrames to combine, each with the key_column.
+        key_column (str): The key column (e.g. 'sessionID').
+
+    Returns:
+        pd.DataFrame: The combined DataFrame, indexed by key_column, with the columns of the tables in the order of df_list.
+    """
+    df_combined = df_list[0]
+    for df in df_list[1:]:
+        df_combined = df_combined.merge(df, on=key_column, how='outer')
+
+    return df_combined.set_index(key_column)
+
+def df_attach_by_key(df: pd.DataFrame, df_key_table: pd.DataFrame, key_column: str) -> pd.DataFrame:
+    """
+    Attaches the columns of a table indexed by key (see df_combine_by_key) to each row of df, as a left join on key_column.
+    If the key is unique in df_key_table the rows are taken by index in a single step, otherwise (more rows for the same key) a merge is used.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame (e.g. the event log) with the key_column.
+        df_key_table (pd.DataFrame): The table indexed by key.
+        key_column (str): The key column (e.g. 'sessionID').
+
+    Returns:
+        pd.DataFrame: The DataFrame with the columns of df_key_table added (empty for the keys not in df_key_table).
+    """
+    if not df_key_table.index.is_unique:
+        duplicated_keys = df_key_table.index[df_key_table.index.duplicated()].unique()
+        print(f"Keys with more rows ({len(duplicated_keys)}), attaching with a merge")
+        return df.merge(df_key_table, left_on=key_column, right_index=True, how='left').reset_index(drop=True)
+
+    df_attributes = df_key_table.reindex(df[key_column])
+    df_attributes.index = df.index
+
+    return pd.concat([df, df_attributes], axis=1)
+
+def df_is_sorted(df: pd.DataFrame, columns: list) -> bool:
+    """
+    Checks if a DataFrame is already in ascending order of some columns (as sort_values, with the empty values last), comparing each row with the previous one
+    column by column (a later column only decides between rows tied in the earlier ones), in a single linear pass and without sorting.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame to check.
+        columns (list): The sort columns, in order of priority (e.g. ['sessionID', 'eventTimestamp']).
+
+    Returns:
+        bool: True if the rows are in order.
+    """
+    ordered = np.zeros(max(len(df) - 1, 0), dtype=bool) # rows after the previous one by an earlier column
+    tied = np.ones(max(len(df) - 1, 0), dtype=bool) # rows equal to the previous one in the columns checked so far
+    for col in columns:
+        series = df[col]
+        na = series.isna().to_numpy()
+        if na.all():
+            continue # all the rows tied
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            values = series.cat.codes.to_numpy() # a categorical is sorted in the order of its categories
+        elif na.any():
+            values = series.to_numpy(na_value=series.iloc[int(np.argmin(na))]) # any valid value in place of the empty ones, which are compared by na
+        else:
+            values = series.to_numpy()
+        valid = ~na[1:] & ~na[:-1]
+        greater = (valid & (values[1:] > values[:-1])) | (na[1:] & ~na[:-1]) # empty values last
+        equal = (valid & (values[1:] == values[:-1])) | (na[1:] & na[:-1])
+        ordered |= tied & greater
+        tied &= equal
+        if not np.all(ordered | tied):
+            return False
+
+    return bool(np.all(ordered | tied))
+
+def df_sort_values_once(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """
+    Sorts a DataFrame by some columns (stable sort) only if it is not already in that order (see df_is_sorted): the steps that keep the order of the rows
+    (filters, left joins, df_attach_by_key) do not need a new sort, and a sort already satisfied costs a check instead of a sort and a copy.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame to sort.
+        columns (list): The sort columns, in order of priority.
+
+    Returns:
+        pd.DataFrame: The DataFrame itself if already in order, otherwise a sorted copy (with the original index).
+    """
+    if df_is_sorted(df, columns):
+        return df
+
+    return df.sort_values(by=columns, kind="stable")
+
+def df_typed_cache_path(path_csv: str) -> Path:
+    """
+    Returns the path of the typed cache of a CSV file (a pickle next to it, e.g. 'survey_google_clean.pkl').
+
+    Parameters:
+        path_csv (str): The file path to the CSV file.
+
+    Returns:
+        Path: The path of the typed cache.
+    """
+    return Path(path_csv).with_suffix(".pkl")
+
+def df_save_csv_cached(df: pd.DataFrame, path_csv: str, csv_sep: str = ",", **csv_kwargs) -> None:
+    """
+    Saves a DataFrame to a CSV file and to its typed cache, which keeps the column types (e.g. datetimes) for the following scripts.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame to save.
+        path_csv (str): The file path to the CSV file.
+        csv_sep (str): The delimiter string used in the CSV file. Defaults to ','.
+        **csv_kwargs: Other arguments passed to DataFrame.to_csv (e.g. quoting).
+
+    Returns:
+        None
+    """
+    df.to_csv(path_csv, sep=csv_sep, index=False, **csv_kwargs)
+    df.to_pickle(df_typed_cache_path(path_csv))
+
+def df_read_csv_cached(path_csv: str, col_list: list, csv_sep: str = ",", date_columns: list = None, date_format: str = "ISO8601", schema: dict = None) -> pd.DataFrame:
+    """
+    Reads a CSV file from its typed cache if it is up to date (see df_save_csv_cached), otherwise reads the CSV file parsing the date columns with an explicit format.
+
+    Parameters:
+        path_csv (str): the file path to the CSV file to be read.
+        col_list (list): a list of column names to be extracted (None for all the columns).
+        csv_sep (str): the delimiter string used in the CSV file. Defaults to ','.
+        date_columns (list): the columns to parse as datetimes when reading the CSV file. Defaults to None.
+        date_format (str): the format of the date columns ('ISO8601' or a strftime format). Defaults to 'ISO8601'.
+        schema (dict): the schema of the file (see csv_read_options), used when reading the CSV file. Defaults to None.
+
+    Returns:
+        pd.DataFrame: a pandas DataFrame containing the data read.
+    """
+    path_cache = df_typed_cache_path(path_csv)
+    if path_cache.exists() and path_cache.stat().st_mtime >= Path(path_csv).stat().st_mtime:
+        print("Reading typed cache:", path_cache)
+        df = pd.read_pickle(path_cache)
+        if col_list is not None:
+            df = df[col_list]
+        df = df.drop_duplicates()
+        df_show_data(df)
+        return df
+
+    df = df_read_csv_data(path_csv, col_list, csv_sep, schema, date_format)
+    df = df_to_datetime(df, date_columns or [], date_format)
+
+    return df
+
 def df_show_data(df: pd.DataFrame) -> None:
     print("Data preview")
     print(df.head())
@@ -174,4 +513,50 @@ def df_remove_rows_with_substring(df:pd.DataFrame, substrings_to_remove:list, co
     # Remove the rows that match the mask
     cleaned_df = df[~mask]
     
-    return cleaned_df
\ No newline at end of file
+    return cleaned_df
+
+def df_split_partitions(df: pd.DataFrame, key_column: str, n_partitions: int) -> list:
+    """
+    Splits a DataFrame into partitions by hashing the values of a key column, so that all the rows with the same key end up in the same partition.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame to be split.
+        key_column (str): The column used as partition key (e.g. 'sessionID' or 'Class').
+        n_partitions (int): The number of partitions (empty partitions are not returned).
+
+    Returns:
+        list: A list of DataFrames, one for each non-empty partition.
+    """
+    partition_ids = pd.util.hash_pandas_object(df[key_column], index=False).to_numpy() % n_partitions
+    partitions = [df_part for _, df_part in df.groupby(partition_ids, sort=True)]
+
+    return partitions
+
+def df_apply_partitioned(df: pd.DataFrame, func, key_column: str, n_workers: int = 1, n_partitions: int = None) -> pd.DataFrame:
+    """
+    Applies a function to a DataFrame partitioned by key_column, running the partitions on a pool of processes.
+    The function must only depend on the rows of a single key (e.g. per-session steps) and must be picklable (a module-level function or a functools.partial of it).
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame to be processed.
+        func (callable): The function to apply, taking and returning a DataFrame.
+        key_column (str): The column used as partition key (e.g. 'sessionID' or 'Class').
+        n_workers (int): The number of worker processes; with 1 (or less) the function is applied to the whole DataFrame in the current process. Defaults to 1.
+        n_partitions (int): The number of partitions; defaults to n_workers.
+
+    Returns:
+        pd.DataFrame: The concatenation of the outputs of each partition.
+    """
+    if n_workers <= 1:
+        return func(df)
+
+    if n_partitions is None:
+        n_partitions = n_workers
+
+    partitions = df_split_partitions(df, key_column, n_partitions)
+    print(f"Running {len(partitions)} partitions by '{key_column}' on {n_workers} processes")
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        results = list(executor.map(func, partitions))
+
+    return pd.concat(results, ignore_index=True)